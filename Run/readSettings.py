@@ -126,6 +126,14 @@ class Settings(object):
         hydcond0 = parser.get('hydrogeologic_inputs', 'hydcond') 
         # either single value for spatially constant finf or name of file with array [m/d]
         self.finf0 = parser.get('hydrogeologic_inputs', 'finf') 
+        # MODFLOW layer arrays: INTERNAL (in the package files) or BINARY
+        # (separate OPEN/CLOSE binary files); optional, default INTERNAL
+        if parser.has_option('hydrogeologic_inputs', 'MODFLOW_array_format'):
+            self.MODFLOW_array_format = parser.get('hydrogeologic_inputs', 'MODFLOW_array_format').upper()
+        else:
+            self.MODFLOW_array_format = 'INTERNAL'
+        if self.MODFLOW_array_format not in ['INTERNAL', 'BINARY']:
+            sys.exit("Must choose INTERNAL or BINARY for 'MODFLOW_array_format'")
 
         self.START_DATE = parser.get('time', 'start_date')
         self.END_DATE = parser.get('time', 'end_date')
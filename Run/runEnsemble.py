@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Runs an ensemble of GSFLOW simulations in a bounded pool of processes
+
+USAGE: python runEnsemble.py [-j NPROCS] [-b] [-s SUMMARY] FILE [FILE ...]
+
+FILE is either a Settings File (.ini) or a parameter table (.csv) with one
+run per row and columns named as the attributes of BuildINI
+(ini_file_builder/build_ini.py); a Settings File is written for each row.
+
+Each run uses its own simulation directory (gsflow_path_simdir/proj_name);
+two runs may not share one. The run script generated by
+printGSFLOWControlfile.py is executed, with its output in out.txt in the
+control directory, or, with -b, goGSFLOW.sh (which first builds the
+inputs; its output goes to build.txt, and runGSFLOW.py writes the model
+output to out.txt in the control directory). Runs whose gsflow.log already reports normal termination are
+skipped, so an interrupted ensemble resumes where it stopped.
+
+The summary table (default: ensemble_summary.csv) gives the exit status,
+wall time and peak resident memory of each run.
+"""
+
+import os
+import sys
+import csv
+import time
+import platform
+import subprocess
+import multiprocessing
+from optparse import OptionParser
+
+from readSettings import Settings
+
+if platform.system() == 'Linux':
+    slashstr = '/'
+else:
+    slashstr = '\\'
+
+_toolkit_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# add path containing GSFLOWrunFollower.py
+sys.path.append(os.path.join(_toolkit_dir, 'visualization'))
+from GSFLOWrunFollower import run_finished
+
+SUMMARY_COLUMNS = ['settings_file', 'proj_name', 'simdir', 'status',
+                   'exit_code', 'wall_time_s', 'peak_rss_MB']
+
+
+def settings_from_table(table_fil):
+    """
+    Writes one Settings File per row of a parameter table (columns: BuildINI
+    attributes) into <table>_ini/, checks that each one loads, and returns
+    their names
+    """
+    sys.path.append(os.path.join(_toolkit_dir, 'ini_file_builder'))
+    from build_ini import BuildINI
+    inidir = os.path.splitext(table_fil)[0] + '_ini'
+    if not os.path.isdir(inidir):
+        os.makedirs(inidir)
+    inifiles = []
+    f = open(table_fil, 'r')
+    for row in csv.DictReader(f):
+        bi = BuildINI()
+        for key, value in row.items():
+            if not hasattr(bi, key):
+                sys.exit('Unknown setting in ' + table_fil + ': ' + key)
+            setattr(bi, key, value)
+        inifile = os.path.abspath(os.path.join(inidir, bi.proj_name + '.ini'))
+        bi.writeINI(inifile)
+        # fails here, not in the pool, if the file is incomplete
+        Settings(inifile)
+        inifiles.append(inifile)
+    f.close()
+    return inifiles
+
+def run_command(settings_file, build_inputs=False):
+    """
+    Command, working directory and log file name (in the control directory)
+    of one simulation
+    """
+    S = Settings(settings_file)
+    if build_inputs:
+        return ['sh', os.path.join(_toolkit_dir, 'Run', 'goGSFLOW.sh'),
+                settings_file, os.path.abspath(_toolkit_dir)], S.control_dir, \
+               'build.txt'
+    runscript = S.control_dir + slashstr + S.PROJ_CODE + '_GSFLOW'
+    if platform.system() == 'Windows':
+        return [runscript + '.bat'], S.control_dir, 'out.txt'
+    return ['sh', runscript + '.sh'], S.control_dir, 'out.txt'
+
+def _wait(proc):
+    """
+    Waits for proc; returns (exit code, peak RSS [MB] of the process and its
+    children, or None where the OS does not report it)
+    """
+    if hasattr(os, 'wait4'):
+        _pid, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) \
+                          else -os.WTERMSIG(status)
+        # ru_maxrss is in kB on Linux, bytes on Mac OS X
+        if platform.system() == 'Darwin':
+            return proc.returncode, rusage.ru_maxrss / 1024.**2
+        return proc.returncode, rusage.ru_maxrss / 1024.
+    return proc.wait(), None
+
+def run_one(args):
+    """
+    Runs one simulation unless it finished before; returns its summary row
+    """
+    settings_file, build_inputs = args
+    S = Settings(settings_file)
+    row = {'settings_file': settings_file, 'proj_name': S.PROJ_NAME,
+           'simdir': S.gsflow_simdir}
+    logfile = S.control_dir + slashstr + 'gsflow.log'
+    if run_finished(logfile):
+        row['status'] = 'skipped'
+        return row
+    if build_inputs and not os.path.isdir(S.control_dir):
+        os.makedirs(S.control_dir)
+    cmd, rundir, log = run_command(settings_file, build_inputs)
+    if not os.path.isdir(rundir):
+        # inputs not built
+        row['status'] = 'failed'
+        return row
+    out = open(rundir + slashstr + log, 'w')
+    t1 = time.time()
+    try:
+        proc = subprocess.Popen(cmd, cwd=rundir, stdout=out,
+                                stderr=subprocess.STDOUT)
+    except OSError:
+        out.close()
+        row['status'] = 'failed'
+        return row
+    exit_code, peak_rss = _wait(proc)
+    row['wall_time_s'] = '%.1f' % (time.time() - t1)
+    out.close()
+    row['exit_code'] = exit_code
+    if peak_rss is not None:
+        row['peak_rss_MB'] = '%.1f' % peak_rss
+    if exit_code == 0 and run_finished(logfile):
+        row['status'] = 'finished'
+    else:
+        row['status'] = 'failed'
+    return row
+
+def read_summary(summary_fil):
+    """
+    Rows of an earlier summary table, by settings file
+    """
+    rows = {}
+    if os.path.exists(summary_fil):
+        f = open(summary_fil, 'r')
+        for row in csv.DictReader(f):
+            rows[row['settings_file']] = row
+        f.close()
+    return rows
+
+def write_summary(summary_fil, rows):
+    f = open(summary_fil, 'w')
+    writer = csv.DictWriter(f, SUMMARY_COLUMNS)
+    writer.writerow(dict((c, c) for c in SUMMARY_COLUMNS))
+    for row in rows:
+        writer.writerow(dict((c, row.get(c, '')) for c in SUMMARY_COLUMNS))
+    f.close()
+
+def run_ensemble(settings_files, nprocs=None, build_inputs=False,
+                 summary_fil='ensemble_summary.csv'):
+    """
+    Runs all simulations with at most nprocs at a time (default: number of
+    CPUs) and writes the summary table; returns its rows
+    """
+    settings_files = [os.path.abspath(_f) for _f in settings_files]
+    simdirs = {}
+    for settings_file in settings_files:
+        simdir = Settings(settings_file).gsflow_simdir
+        if simdir in simdirs:
+            sys.exit('Runs ' + simdirs[simdir] + ' and ' + settings_file
+                     + ' share the simulation directory ' + simdir)
+        simdirs[simdir] = settings_file
+    if nprocs is None:
+        nprocs = multiprocessing.cpu_count()
+    previous = read_summary(summary_fil)
+    pool = multiprocessing.Pool(processes=max(1, nprocs))
+    try:
+        rows = pool.map(run_one, [(_f, build_inputs) for _f in settings_files],
+                        chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    # keep the statistics of runs that finished in an earlier call
+    for ii in range(len(rows)):
+        if rows[ii]['status'] == 'skipped' and \
+           rows[ii]['settings_file'] in previous:
+            rows[ii] = previous[rows[ii]['settings_file']]
+    write_summary(summary_fil, rows)
+    return rows
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [-j NPROCS] [-b] [-s SUMMARY] '
+                                'FILE [FILE ...]')
+    parser.add_option('-j', '--nprocs', type='int', default=None,
+                      help='number of simulations run at the same time')
+    parser.add_option('-b', '--build', action='store_true', default=False,
+                      help='build the inputs first (goGSFLOW.sh)')
+    parser.add_option('-s', '--summary', default='ensemble_summary.csv',
+                      help='summary table of the runs')
+    (opts, args) = parser.parse_args()
+    if len(args) == 0:
+        parser.error('no Settings Files or parameter table given')
+    settings_files = []
+    for fname in args:
+        if fname.endswith('.csv'):
+            settings_files += settings_from_table(fname)
+        else:
+            settings_files.append(fname)
+    rows = run_ensemble(settings_files, opts.nprocs, opts.build, opts.summary)
+    for row in rows:
+        print row['proj_name'] + ': ' + row['status']
@@ -27,11 +27,16 @@ elif platform.system() == 'Windows':
 model_mode = 'GSFLOW'
 cmd_str = Settings.control_dir + slashstr + Settings.PROJ_CODE + '_' + model_mode
 
+# model output goes to out.txt in the control directory, so that runs
+# started from the same working directory do not share one log
 if platform.system() == 'Linux':
-    cmd_str = cmd_str + '.sh > out.txt'
+    cmd_str = cmd_str + '.sh > ' + Settings.control_dir + slashstr + 'out.txt'
 elif platform.system() == 'Windows':
     cmd_str = cmd_str + '.bat'
 
-os.system(cmd_str)
+status = os.system(cmd_str)
+if platform.system() != 'Windows':
+    status = status >> 8 # exit code is the high byte of the wait status
+sys.exit(status)
 
 
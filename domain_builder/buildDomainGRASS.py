@@ -75,10 +75,17 @@ basin_mask          = 'basin_mask'            # Mask out non-study-basin cells
 pour_point          = 'pour_point'            # Outlet pour point
 bc_cell             = 'bc_cell'               # Grid cell for MODFLOW b.c.
 
+# Each stage below is skipped if it was already run with the same inputs and
+# settings and its outputs still exist (see stageCheckpoints.py)
+from stageCheckpoints import StageRunner, mapset_record_file
+stages = StageRunner(mapset_record_file())
+
 # Import DEM if required
 # And perform the standard starting tasks.
 # These take time, so skip if not needed
-if Settings.DEM_input != '':
+def stage_dem():
+    if Settings.DEM_input == '':
+        return
     print "Importing DEM and generating hydrologic correction"
     # Import DEM and set region
     r.in_gdal(input=Settings.DEM_input, output=DEM_original_import, overwrite=True)
@@ -109,117 +116,183 @@ if Settings.DEM_input != '':
     # Repeat is sometimes needed
     r.mapcalc(DEM+' = if(isnull('+accumulation_onmap+'),null(),'+DEM+')', overwrite=True)
     r.mapcalc(accumulation_onmap+' = if(isnull('+DEM+'),null(),'+accumulation_onmap+')', overwrite=True)
+# A blank DEM_file_path_to_import means that the DEM was imported before:
+# keep the fingerprint of that import, so the later stages stay up to date
+if Settings.DEM_input != '' or \
+   not stages.keep('dem', rasters=[DEM_original_import, DEM,
+                                   accumulation_onmap]):
+    stages.run('dem', stage_dem, 
+               settings=[Settings.DEM_input, Settings.flow_weights],
+               files=[Settings.DEM_input, Settings.flow_weights],
+               rasters=[DEM_original_import, DEM, accumulation_onmap])
 
 # Import additional raster data
-if Settings.LAND_COVER_file_path_to_import is not '':
+def stage_land_cover():
     # Raster file with land cover (0=bare soil;1=grasses; 2=shrubs; 3=trees; 4=coniferous) that provides input for parameter cov_type
     r.in_gdal(input=Settings.LAND_COVER_file_path_to_import, output=land_cover, overwrite=True)
+if Settings.LAND_COVER_file_path_to_import is not '':
+    stages.run('land_cover', stage_land_cover,
+               files=[Settings.LAND_COVER_file_path_to_import],
+               rasters=[land_cover])
 else:
     land_cover = ''
-if Settings.SOIL_file_path_to_import is not '':
+    stages.fingerprints['land_cover'] = ''
+def stage_soil():
     # Raster file with soil type (1=sand; 2=loam; 3=clay) that provides input for parameter soil_type
     r.in_gdal(input=Settings.SOIL_file_path_to_import, output=soil, overwrite=True)
+if Settings.SOIL_file_path_to_import is not '':
+    stages.run('soil', stage_soil,
+               files=[Settings.SOIL_file_path_to_import],
+               rasters=[soil])
 else:
     soil = ''
+    stages.fingerprints['soil'] = ''
 
 # Set region
 g.region(raster=DEM_original_import)
 
 # Build streams and sub-basins
-r.stream_extract(elevation=DEM, accumulation=accumulation_onmap, stream_raster=streams_all, stream_vector=streams_all, threshold=Settings.drainage_threshold, direction=draindir, d8cut=0, overwrite=True)
-r.stream_basins(direction=draindir, stream_rast=streams_all, basins=basins_all, overwrite=True)
-r.to_vect(input=basins_all, output=basins_all, type='area', flags='v', overwrite=True)
-
-# Build stream network
-v.stream_network(map=streams_all)
+def stage_streams():
+    r.stream_extract(elevation=DEM, accumulation=accumulation_onmap, stream_raster=streams_all, stream_vector=streams_all, threshold=Settings.drainage_threshold, direction=draindir, d8cut=0, overwrite=True)
+    r.stream_basins(direction=draindir, stream_rast=streams_all, basins=basins_all, overwrite=True)
+    r.to_vect(input=basins_all, output=basins_all, type='area', flags='v', overwrite=True)
+    # Build stream network
+    v.stream_network(map=streams_all)
+stages.run('streams', stage_streams, depends=['dem'],
+           settings=[Settings.drainage_threshold],
+           rasters=[streams_all, draindir, basins_all],
+           vectors=[streams_all, basins_all])
 
 # Restrict to a single basin -- default to precise selection rather than 
 # topological selection
-v.stream_inbasin(input_streams=streams_all, input_basins=basins_all, draindir=draindir, output_streams=streams_inbasin, output_basin=basins_inbasin, x_outlet=Settings.outlet_point_x, y_outlet=Settings.outlet_point_y, output_pour_point=pour_point, overwrite=True)
+def stage_inbasin():
+    v.stream_inbasin(input_streams=streams_all, input_basins=basins_all, draindir=draindir, output_streams=streams_inbasin, output_basin=basins_inbasin, x_outlet=Settings.outlet_point_x, y_outlet=Settings.outlet_point_y, output_pour_point=pour_point, overwrite=True)
+stages.run('inbasin', stage_inbasin, depends=['streams'],
+           settings=[Settings.outlet_point_x, Settings.outlet_point_y],
+           vectors=[streams_inbasin, basins_inbasin, pour_point])
 
 # GSFLOW segments: sections of stream that define subbasins
-v.gsflow_segments(input=streams_inbasin, output=segments, icalc=Settings.icalc,
-                  roughch_value=Settings.channel_Mannings_n, 
-                  roughch_raster=Settings.channel_Mannings_n_grid,
-                  roughch_points=Settings.channel_Mannings_n_vector,
-                  roughch_pt_col=Settings.channel_Mannings_n_vector_col,
-                  width1=Settings.channel_width, width2=Settings.channel_width, 
-                  width_points=Settings.channel_width_vector,
-                  width_points_col=Settings.channel_width_vector_col,
-                  fp_width_value=Settings.floodplain_width,
-                  fp_width_pts=Settings.floodplain_width_vector,
-                  fp_width_pts_col=Settings.floodplain_width_vector_col,
-                  overwrite=True)
+def stage_segments():
+    v.gsflow_segments(input=streams_inbasin, output=segments, icalc=Settings.icalc,
+                      roughch_value=Settings.channel_Mannings_n, 
+                      roughch_raster=Settings.channel_Mannings_n_grid,
+                      roughch_points=Settings.channel_Mannings_n_vector,
+                      roughch_pt_col=Settings.channel_Mannings_n_vector_col,
+                      width1=Settings.channel_width, width2=Settings.channel_width, 
+                      width_points=Settings.channel_width_vector,
+                      width_points_col=Settings.channel_width_vector_col,
+                      fp_width_value=Settings.floodplain_width,
+                      fp_width_pts=Settings.floodplain_width_vector,
+                      fp_width_pts_col=Settings.floodplain_width_vector_col,
+                      overwrite=True)
+stages.run('segments', stage_segments, depends=['inbasin'],
+           settings=[Settings.icalc, Settings.channel_Mannings_n,
+                     Settings.channel_Mannings_n_grid,
+                     Settings.channel_Mannings_n_vector,
+                     Settings.channel_Mannings_n_vector_col,
+                     Settings.channel_width, Settings.channel_width_vector,
+                     Settings.channel_width_vector_col,
+                     Settings.floodplain_width, 
+                     Settings.floodplain_width_vector,
+                     Settings.floodplain_width_vector_col],
+           vectors=[segments])
 
 # MODFLOW grid & basin mask (1s where basin exists and 0 where it doesn't)
 # Fill nulls in case of ocean
 # Any error-related NULL cells will not be part of the basin, and all cells
 # should have elevation > 0, so this hopefully will not cause any problems
-r.null(map=DEM, null=0)
-v.gsflow_grid(basin=basins_inbasin, pour_point=pour_point, raster_input=DEM, dx=Settings.MODFLOW_grid_resolution, dy=Settings.MODFLOW_grid_resolution, output=MODFLOW_grid, mask_output=basin_mask, bc_cell=bc_cell, overwrite=True)
-r.null(map=DEM, setnull=0)
+def stage_grid():
+    r.null(map=DEM, null=0)
+    v.gsflow_grid(basin=basins_inbasin, pour_point=pour_point, raster_input=DEM, dx=Settings.MODFLOW_grid_resolution, dy=Settings.MODFLOW_grid_resolution, output=MODFLOW_grid, mask_output=basin_mask, bc_cell=bc_cell, overwrite=True)
+    r.null(map=DEM, setnull=0)
+stages.run('grid', stage_grid, depends=['dem', 'inbasin'],
+           settings=[Settings.MODFLOW_grid_resolution],
+           rasters=[basin_mask], vectors=[MODFLOW_grid, bc_cell])
 
 # Hydrologically-correct DEM for MODFLOW
-r.gsflow_hydrodem(dem=DEM, grid=MODFLOW_grid, streams=streams_all, streams_modflow=streams_MODFLOW, dem_modflow=DEM_MODFLOW, overwrite=True)
+def stage_hydrodem():
+    r.gsflow_hydrodem(dem=DEM, grid=MODFLOW_grid, streams=streams_all, streams_modflow=streams_MODFLOW, dem_modflow=DEM_MODFLOW, overwrite=True)
+stages.run('hydrodem', stage_hydrodem, depends=['grid', 'streams'],
+           rasters=[streams_MODFLOW, DEM_MODFLOW])
 
 # GSFLOW reaches: intersection of segments and grid
-v.gsflow_reaches(segment_input=segments, grid_input=MODFLOW_grid, elevation=DEM, output=reaches, overwrite=True)
+def stage_reaches():
+    v.gsflow_reaches(segment_input=segments, grid_input=MODFLOW_grid, elevation=DEM, output=reaches, overwrite=True)
+stages.run('reaches', stage_reaches, depends=['segments', 'grid'],
+           vectors=[reaches])
 
 # GSFLOW HRU parameters
-r.slope_aspect(elevation=DEM, slope=slope, aspect=aspect, format='percent', zscale=0.01, overwrite=True)
+def stage_slope():
+    r.slope_aspect(elevation=DEM, slope=slope, aspect=aspect, format='percent', zscale=0.01, overwrite=True)
+stages.run('slope', stage_slope, depends=['dem'], rasters=[slope, aspect])
 
-v.gsflow_hruparams(input=basins_inbasin, elevation=DEM, output=HRUs, slope=slope, aspect=aspect, cov_type=land_cover, soil_type=soil, overwrite=True)
+def stage_hruparams():
+    v.gsflow_hruparams(input=basins_inbasin, elevation=DEM, output=HRUs, slope=slope, aspect=aspect, cov_type=land_cover, soil_type=soil, overwrite=True)
+stages.run('hruparams', stage_hruparams, 
+           depends=['inbasin', 'slope', 'land_cover', 'soil'],
+           vectors=[HRUs])
 
 # GSFLOW gravity reservoirs
-v.gsflow_gravres(hru_input=HRUs, grid_input=MODFLOW_grid, output=gravity_reservoirs, overwrite=True)
+def stage_gravres():
+    v.gsflow_gravres(hru_input=HRUs, grid_input=MODFLOW_grid, output=gravity_reservoirs, overwrite=True)
+stages.run('gravres', stage_gravres, depends=['hruparams', 'grid'],
+           vectors=[gravity_reservoirs])
+
+def stage_export():
+    # Export DEM with MODFLOW resolution
+    # Also export basin mask -- 1s where basin exists and 0 where it doesn't
+    # And make sure it is in an appropriate folder
+    if os.getcwd() != Settings.GIS_output_rootdir:
+        try:
+            os.makedirs(Settings.GIS_output_rootdir)
+        except:
+            pass
+    os.chdir(Settings.GIS_output_rootdir)
+    g.region(raster=DEM_MODFLOW)
+    r.out_ascii(input=DEM_MODFLOW, output='DEM.asc', null_value=0, overwrite=True)
+    r.out_ascii(input=basin_mask, output=basin_mask+'.asc', null_value=0, overwrite=True)
+    g.region(raster=DEM)
+
+    # Export tables and discharge point
+    v.gsflow_export(reaches_input=reaches,
+                    segments_input=segments,
+                    gravres_input=gravity_reservoirs,
+                    hru_input=HRUs,
+                    pour_point_input=pour_point,
+                    bc_cell_input=bc_cell,
+                    reaches_output=reaches,
+                    segments_output=segments,
+                    gravres_output=gravity_reservoirs,
+                    hru_output=HRUs,
+                    pour_point_boundary_output=pour_point,
+                    overwrite=True)
+                    
+    # Generate a vector of the full basin area
+    # "value" column is empty
+    v.dissolve(input=basins_inbasin, output=basin, column='label', overwrite=True)
 
-# Export DEM with MODFLOW resolution
-# Also export basin mask -- 1s where basin exists and 0 where it doesn't
-# And make sure it is in an appropriate folder
-if os.getcwd() != Settings.GIS_output_rootdir:
+    # Export shapefiles of all vector files
     try:
-        os.makedirs(Settings.GIS_output_rootdir)
+        os.mkdir('shapefiles')
     except:
         pass
-os.chdir(Settings.GIS_output_rootdir)
-g.region(raster=DEM_MODFLOW)
-r.out_ascii(input=DEM_MODFLOW, output='DEM.asc', null_value=0, overwrite=True)
-r.out_ascii(input=basin_mask, output=basin_mask+'.asc', null_value=0, overwrite=True)
-g.region(raster=DEM)
-
-# Export tables and discharge point
-v.gsflow_export(reaches_input=reaches,
-                segments_input=segments,
-                gravres_input=gravity_reservoirs,
-                hru_input=HRUs,
-                pour_point_input=pour_point,
-                bc_cell_input=bc_cell,
-                reaches_output=reaches,
-                segments_output=segments,
-                gravres_output=gravity_reservoirs,
-                hru_output=HRUs,
-                pour_point_boundary_output=pour_point,
-                overwrite=True)
-                
-# Generate a vector of the full basin area
-# "value" column is empty
-v.dissolve(input=basins_inbasin, output=basin, column='label', overwrite=True)
-
-# Export shapefiles of all vector files
-try:
-    os.mkdir('shapefiles')
-except:
-    pass
-os.chdir('shapefiles')
-for _vector_file in [HRUs, gravity_reservoirs, MODFLOW_grid, basin]:
-    v.out_ogr(input=_vector_file, output=_vector_file, type='area', format='ESRI_Shapefile', quiet=True, overwrite=True)
-for _vector_file in [segments, reaches]:
-    v.out_ogr(input=_vector_file, output=_vector_file, type='line', format='ESRI_Shapefile', quiet=True, overwrite=True)
-for _vector_file in [pour_point, bc_cell]:
-    v.out_ogr(input=_vector_file, output=_vector_file, type='point', format='ESRI_Shapefile', quiet=True, overwrite=True)
-#os.chdir('..')
-#os.chdir('..')
-os.chdir(startdir)
+    os.chdir('shapefiles')
+    for _vector_file in [HRUs, gravity_reservoirs, MODFLOW_grid, basin]:
+        v.out_ogr(input=_vector_file, output=_vector_file, type='area', format='ESRI_Shapefile', quiet=True, overwrite=True)
+    for _vector_file in [segments, reaches]:
+        v.out_ogr(input=_vector_file, output=_vector_file, type='line', format='ESRI_Shapefile', quiet=True, overwrite=True)
+    for _vector_file in [pour_point, bc_cell]:
+        v.out_ogr(input=_vector_file, output=_vector_file, type='point', format='ESRI_Shapefile', quiet=True, overwrite=True)
+    #os.chdir('..')
+    #os.chdir('..')
+    os.chdir(startdir)
+stages.run('export', stage_export,
+           depends=['inbasin', 'segments', 'grid', 'hydrodem', 'reaches',
+                    'hruparams', 'gravres'],
+           settings=[Settings.GIS_output_rootdir],
+           output_files=[os.path.join(Settings.GIS_output_rootdir, _f) for _f
+                         in ['DEM.asc', basin_mask+'.asc', 
+                             HRUs+'.txt', gravity_reservoirs+'.txt']])
 
 print ""
 print "Done."
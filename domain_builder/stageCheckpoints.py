@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Checkpointed stages for buildDomainGRASS.py
+
+Each stage of the domain build records a fingerprint of what it depends
+on: its settings values, the size and modification time of the files it
+imports, and the fingerprints of the stages whose outputs it reads. A stage
+is skipped when its recorded fingerprint matches and all of its output maps
+(and files) still exist. Changing a setting therefore reruns only the
+stages downstream of it.
+
+The fingerprints are kept in a JSON file in the GRASS mapset that holds the
+maps, so they follow the maps and not the working directory.
+"""
+
+import os
+import json
+import hashlib
+
+
+def _file_stamp(fname):
+    if fname == '' or not os.path.exists(fname):
+        return [fname, None, None]
+    st = os.stat(fname)
+    return [fname, st.st_size, st.st_mtime]
+
+def mapset_record_file(fname='gsflow_stages.json'):
+    """
+    Path of the fingerprint record in the current GRASS mapset
+    """
+    from grass import script as gscript
+    env = gscript.gisenv()
+    return os.path.join(env['GISDBASE'], env['LOCATION_NAME'],
+                        env['MAPSET'], fname)
+
+def grass_maps_exist(rasters=(), vectors=()):
+    """
+    True if all of the raster and vector maps are in the current mapset
+    """
+    if len(rasters) + len(vectors) == 0:
+        return True
+    from grass import script as gscript
+    for name in rasters:
+        if not gscript.find_file(name, element='cell', mapset='.')['name']:
+            return False
+    for name in vectors:
+        if not gscript.find_file(name, element='vector', mapset='.')['name']:
+            return False
+    return True
+
+
+class StageRunner(object):
+    """
+    Runs stages in order, skipping those whose fingerprint is unchanged and
+    whose outputs exist
+    """
+
+    def __init__(self, record_file, force=False):
+        self.record_file = record_file
+        self.force = force
+        self.fingerprints = {}
+        self._record = {}
+        if os.path.exists(record_file):
+            try:
+                f = open(record_file, 'r')
+                self._record = json.load(f)
+                f.close()
+            except ValueError:
+                # unreadable record: run everything again
+                self._record = {}
+
+    def fingerprint(self, name, depends=(), settings=(), files=()):
+        """
+        Fingerprint of a stage: its name, settings values, input file stamps
+        and the fingerprints of the stages it depends on
+        """
+        key = {'name': name,
+               'depends': [[_d, self.fingerprints[_d]] for _d in depends],
+               'settings': [str(_s) for _s in settings],
+               'files': [_file_stamp(_f) for _f in files]}
+        return hashlib.md5(json.dumps(key, sort_keys=True)
+                           .encode('utf-8')).hexdigest()
+
+    def run(self, name, func, depends=(), settings=(), files=(),
+            rasters=(), vectors=(), output_files=()):
+        """
+        Runs func() unless stage `name` is up to date: same fingerprint as
+        recorded and all output rasters, vectors and files exist. Returns
+        True if the stage was run.
+        """
+        fp = self.fingerprint(name, depends, settings, files)
+        self.fingerprints[name] = fp
+        if not self.force and self._record.get(name) == fp \
+           and grass_maps_exist(rasters, vectors) \
+           and all(os.path.exists(_f) for _f in output_files):
+            print 'Skipping stage "' + name + '": up to date'
+            return False
+        print 'Running stage "' + name + '"'
+        # Forget the old fingerprint first, so an interrupted stage reruns
+        self._record.pop(name, None)
+        self._save()
+        func()
+        self._record[name] = fp
+        self._save()
+        return True
+
+    def keep(self, name, rasters=(), vectors=()):
+        """
+        Takes the recorded fingerprint of stage `name` without running it,
+        for a stage whose outputs were made before (e.g., an import whose
+        input is no longer given). Returns False if there is no record or
+        an output map is missing.
+        """
+        if self.force or name not in self._record \
+           or not grass_maps_exist(rasters, vectors):
+            return False
+        print 'Keeping stage "' + name + '": already built'
+        self.fingerprints[name] = self._record[name]
+        return True
+
+    def _save(self):
+        tmp = self.record_file + '.tmp'
+        f = open(tmp, 'w')
+        json.dump(self._record, f, indent=1, sort_keys=True)
+        f.close()
+        if os.path.exists(self.record_file):
+            os.remove(self.record_file)
+        os.rename(tmp, self.record_file)
@@ -239,6 +239,11 @@ def main():
         columns_in_order = ['hru_area', 'hru_aspect', 'hru_elev', 'hru_lat', 
                             'hru_slope', 'hru_segment', 'hru_strmseg_down_id',
                             'cov_type', 'soil_type']
+        # Area fractions of each land cover and soil class, if computed
+        _hru_columns = gscript.vector_db_select(HRUs, layer=1)['columns']
+        columns_in_order += [col for col in _hru_columns 
+                             if col.startswith('cov_type_frac_')
+                             or col.startswith('soil_type_frac_')]
         outcols = get_columns_in_order(HRUs, columns_in_order)
         outarray = np.array(outcols).transpose()
         outtable = np.vstack((columns_in_order, outarray))
@@ -52,6 +52,17 @@
 #%  guidependency: layer,column
 #%end
 
+#%option G_OPT_R_INPUT
+#%  key: resolution_raster
+#%  label: Raster (e.g., DEM) whose cells set the resolution for the -r flag
+#%  required: no
+#%end
+
+#%flag
+#%  key: r
+#%  description: Build from rasterized HRUs and grid (no v.overlay): output is points
+#%end
+
 ##################
 # IMPORT MODULES #
 ##################
@@ -66,6 +77,7 @@ from grass.pygrass.gis import region
 from grass.pygrass import vector # Change to "v"?
 from grass.script import vector_db_select
 from grass.pygrass.vector import Vector, VectorTopo
+from grass.pygrass.vector.geometry import Point
 from grass.pygrass.raster import RasterRow
 from grass.pygrass import utils
 from grass import script as gscript
@@ -74,6 +86,73 @@ from grass import script as gscript
 # MAIN MODULE #
 ###############
 
+def overlap_areas(hru_raster, cell_raster, area_raster):
+    """
+    Area [m2] shared by each (HRU id, MODFLOW cell id) pair of two id 
+    rasters, in the current region (cell areas from area_raster, made by
+    r.cell.area), and the area-weighted mean x and y of
+    each pair. Returns (hru_ids, cell_ids, areas, x, y) for all pairs with
+    overlap; id 0 stands for cells outside all HRUs or outside the grid, so
+    that the areas of each HRU and grid cell add up to their full area.
+    """
+    reg = gscript.region()
+    _x = reg['w'] + (np.arange(reg['cols']) + 0.5) * reg['ewres']
+    _hru = RasterRow(hru_raster)
+    _hru.open('r')
+    _cell = RasterRow(cell_raster)
+    _cell.open('r')
+    _area = RasterRow(area_raster)
+    _area.open('r')
+    # Ids of each pair packed in one integer key
+    ncell_ids = int(gscript.raster_info(cell_raster)['max']) + 1
+    keys = []
+    areas = []
+    xsums = []
+    ysums = []
+    for i in range(reg['rows']):
+        _hru_row = np.array(_hru[i], dtype=np.int64)
+        _cell_row = np.array(_cell[i], dtype=np.int64)
+        _hru_row[_hru_row < 0] = 0 # CELL null
+        _cell_row[_cell_row < 0] = 0
+        _valid = (_hru_row > 0) + (_cell_row > 0)
+        if not _valid.any():
+            continue
+        _keys, _inverse = np.unique(_hru_row[_valid] * ncell_ids 
+                                    + _cell_row[_valid], return_inverse=True)
+        _areas = np.array(_area[i], dtype=float)[_valid]
+        _y = reg['n'] - (i + 0.5) * reg['nsres']
+        keys.append(_keys)
+        areas.append(np.bincount(_inverse, weights=_areas))
+        xsums.append(np.bincount(_inverse, weights=_x[_valid] * _areas))
+        ysums.append(areas[-1] * _y)
+    _hru.close()
+    _cell.close()
+    _area.close()
+    # Merge the pairs of all rows
+    keys, _inverse = np.unique(np.hstack(keys), return_inverse=True)
+    areas = np.bincount(_inverse, weights=np.hstack(areas))
+    x = np.bincount(_inverse, weights=np.hstack(xsums)) / areas
+    y = np.bincount(_inverse, weights=np.hstack(ysums)) / areas
+    return keys // ncell_ids, keys % ncell_ids, areas, x, y
+
+def gravity_reservoir_table(hru_ids, cell_ids, areas, threshold=0.001):
+    """
+    Percent of the HRU and of the MODFLOW cell covered by each gravity
+    reservoir ((HRU id, cell id) pair), from the pair areas. Pairs with id 0
+    (outside the HRUs or grid) count towards the areas of the HRUs and cells
+    and are then dropped, as are pairs covering no more than threshold [%] 
+    of their cell.
+    Returns (hru_ids, hru_pct, cell_ids, cell_pct, mask of pairs kept)
+    """
+    _hrus, _hru_inverse = np.unique(hru_ids, return_inverse=True)
+    _cells, _cell_inverse = np.unique(cell_ids, return_inverse=True)
+    hru_pct = 100. * areas / np.bincount(_hru_inverse, weights=areas)\
+                                                        [_hru_inverse]
+    cell_pct = 100. * areas / np.bincount(_cell_inverse, weights=areas)\
+                                                        [_cell_inverse]
+    keep = (cell_pct > threshold) * (hru_ids > 0) * (cell_ids > 0)
+    return hru_ids[keep], hru_pct[keep], cell_ids[keep], cell_pct[keep], keep
+
 def main():
     """
     Build gravity reservoirs in GSFLOW: combines MODFLOW grid and HRU sub-basins
@@ -104,6 +183,47 @@ def main():
     v.to_db(map=basins, option='area', units='meters', columns=col)
     """
 
+    if flags['r']:
+        # Rasterize HRUs and grid cells by id and add up the area of each
+        # (HRU, cell) pair: no polygons are built
+        gscript.use_temp_region()
+        if options['resolution_raster'] != '':
+            g.region(raster=options['resolution_raster'])
+        v.to_rast(input=HRUs, output='tmp_gvr_hru', use='attr', 
+                  attribute_column='id', type='area', overwrite=True, quiet=True)
+        v.to_rast(input=grid, output='tmp_gvr_cell', use='attr', 
+                  attribute_column='id', type='area', overwrite=True, quiet=True)
+        r.cell_area(output='tmp_gvr_area', units='m2', overwrite=True, 
+                    quiet=True)
+        hru_ids, cell_ids, areas, x, y = overlap_areas('tmp_gvr_hru', 
+                                                       'tmp_gvr_cell',
+                                                       'tmp_gvr_area')
+        g.remove(type='raster', name='tmp_gvr_hru,tmp_gvr_cell,tmp_gvr_area', 
+                 flags='f', quiet=True)
+        gscript.del_temp_region()
+        gvr_hru_id, gvr_hru_pct, gvr_cell_id, gvr_cell_pct, keep = \
+                          gravity_reservoir_table(hru_ids, cell_ids, areas)
+        # One point per gravity reservoir, at its area-weighted center
+        gvr = Vector(gravity_reservoirs)
+        _cols = [(u'cat',          'INTEGER PRIMARY KEY'),
+                 (u'gvr_hru_id',   'INTEGER'),
+                 (u'gvr_cell_id',  'INTEGER'),
+                 (u'area_m2',      'DOUBLE PRECISION'),
+                 (u'gvr_hru_pct',  'DOUBLE PRECISION'),
+                 (u'gvr_cell_pct', 'DOUBLE PRECISION')]
+        gvr.open('w', tab_name=gravity_reservoirs, tab_cols=_cols, 
+                 overwrite=gscript.overwrite())
+        areas = areas[keep]
+        x = x[keep]
+        y = y[keep]
+        for i in range(len(gvr_hru_id)):
+            gvr.write(Point(x[i], y[i]), cat=i+1, 
+                      attrs=(int(gvr_hru_id[i]), int(gvr_cell_id[i]), 
+                             areas[i], gvr_hru_pct[i], gvr_cell_pct[i]))
+        gvr.table.conn.commit()
+        gvr.close()
+        return
+
     # Create gravity reservoirs -- overlay cells=grid and HRUs
     v.overlay(ainput=HRUs, binput=grid, atype='area', btype='area', operator='and', output=gravity_reservoirs, overwrite=gscript.overwrite())
     v.db_dropcolumn(map=gravity_reservoirs, columns='a_cat,a_label,b_cat', quiet=True)
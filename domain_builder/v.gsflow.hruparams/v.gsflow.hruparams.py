@@ -113,6 +113,107 @@ def create_iterator(vect):
     return _n_cats
 
 
+def _read_row(rast, i):
+    """
+    Row i of an open RasterRow as floats, with NaN for null cells
+    """
+    _row = np.array(rast[i], dtype=float)
+    if rast.mtype == 'CELL':
+        _row[_row == -2147483648] = np.nan # CELL null
+    return _row
+
+def zonal_statistics(zones, nzones, continuous=[], circular=[], 
+                     categorical=[], cell_area=None):
+    """
+    Statistics of rasters over integer zones (e.g., rasterized HRU cats), 
+    from a single row-by-row sweep through all rasters in the current region.
+    Cells with a null zone or value, or a zone >= nzones, are skipped. Returns a dict keyed by
+    raster name:
+      continuous: (sum, count) for each zone 0...nzones-1
+      circular (angles in degrees): (sum of sines, sum of cosines, count)
+      categorical (integer classes >= 0): [zone x class] area [m2], from
+                  the cell area raster cell_area (made by r.cell.area)
+    """
+    nrows = region.Region().rows
+    if len(categorical) > 0:
+        _cell_area = RasterRow(cell_area)
+        _cell_area.open('r')
+    sums = {}
+    for name in continuous:
+        sums[name] = [np.zeros(nzones), np.zeros(nzones)]
+    for name in circular:
+        sums[name] = [np.zeros(nzones), np.zeros(nzones), np.zeros(nzones)]
+    nclasses = {}
+    for name in categorical:
+        nclasses[name] = int(gscript.raster_info(name)['max']) + 1
+        sums[name] = np.zeros(nzones * nclasses[name])
+    _zones = RasterRow(zones)
+    _zones.open('r')
+    _rasters = {}
+    for name in sums:
+        _rasters[name] = RasterRow(name)
+        _rasters[name].open('r')
+    for i in range(nrows):
+        _z = _read_row(_zones, i)
+        _inzone = np.isfinite(_z)
+        # skip zones outside 0...nzones-1 (e.g., cats without a table row)
+        _inzone[_inzone] = (_z[_inzone] >= 0) & (_z[_inzone] < nzones)
+        _z = _z[_inzone].astype(int)
+        if len(categorical) > 0:
+            _areas = np.array(_cell_area[i], dtype=float)[_inzone]
+        for name in sums:
+            _values = _read_row(_rasters[name], i)[_inzone]
+            _valid = np.isfinite(_values)
+            _zv = _z[_valid]
+            _values = _values[_valid]
+            if name in nclasses:
+                _classes = _values.astype(int)
+                _ok = _classes >= 0
+                sums[name] += np.bincount(_zv[_ok] * nclasses[name] 
+                                          + _classes[_ok],
+                                          weights=_areas[_valid][_ok],
+                                          minlength=len(sums[name]))
+            elif name in circular:
+                _angles = np.radians(_values)
+                sums[name][0] += np.bincount(_zv, weights=np.sin(_angles),
+                                             minlength=nzones)
+                sums[name][1] += np.bincount(_zv, weights=np.cos(_angles),
+                                             minlength=nzones)
+                sums[name][2] += np.bincount(_zv, minlength=nzones)
+            else:
+                sums[name][0] += np.bincount(_zv, weights=_values,
+                                             minlength=nzones)
+                sums[name][1] += np.bincount(_zv, minlength=nzones)
+    _zones.close()
+    if len(categorical) > 0:
+        _cell_area.close()
+    for name in _rasters:
+        _rasters[name].close()
+    for name in nclasses:
+        sums[name] = sums[name].reshape(nzones, nclasses[name])
+    return sums
+
+def majority(class_areas, default):
+    """
+    Class covering the largest area of each zone ([zone x class] areas);
+    default where the zone has no cells
+    """
+    out = np.argmax(class_areas, axis=1)
+    out[np.sum(class_areas, axis=1) == 0] = default
+    return out
+
+def class_fractions(class_areas):
+    """
+    Fraction of the area of each zone in each class ([zone x class] areas);
+    NaN where the zone has no cells
+    """
+    _total = np.sum(class_areas, axis=1)
+    out = np.nan * np.ones(class_areas.shape)
+    out[_total > 0] = class_areas[_total > 0] / \
+                      np.expand_dims(_total[_total > 0], 1)
+    return out
+
+
 def main():
     """
     Adds GSFLOW parameters to a set of HRU sub-basins
@@ -240,45 +341,89 @@ def main():
     v.to_db(map=HRU, option='area', columns='hru_area_m2', units='meters', quiet=True)
 
     # GET MEAN VALUES FOR THESE NEXT ONES, ACROSS THE BASIN
-
-    # SLOPE (and aspect) 
+    # (and the majority land cover and soil classes), all from one sweep
+    # through the rasters over the rasterized HRUs
+    v.to_rast(input=HRU, output='tmp_hru_zones', use='cat', type='area',
+              overwrite=True, quiet=True)
+    categorical = []
+    if land_cover != '':
+        categorical.append(land_cover)
+    if soil != '':
+        categorical.append(soil)
+    nzones = np.max(cats) + 1 # zone = cat
+    r.cell_area(output='tmp_hru_cell_area', units='m2', overwrite=True,
+                quiet=True)
+    stats = zonal_statistics('tmp_hru_zones', nzones, 
+                             continuous=[slope, elevation],
+                             circular=[aspect],
+                             categorical=categorical,
+                             cell_area='tmp_hru_cell_area')
+    g.remove(type='raster', name='tmp_hru_zones,tmp_hru_cell_area', flags='f',
+             quiet=True)
+
+    def _mean(name):
+        _sum, _count = stats[name]
+        _out = np.nan * np.ones(nzones)
+        _out[_count > 0] = _sum[_count > 0] / _count[_count > 0]
+        return _out
+
+    # SLOPE and ELEVATION
     #####################
-    v.rast_stats(map=HRU, raster=slope, method='average', column_prefix='tmp', flags='c', quiet=True)
-    v.db_update(map=HRU, column='hru_slope', query_column='tmp_average', quiet=True)
+    hru_slope = _mean(slope)
+    hru_elev = _mean(elevation)
 
     # ASPECT
     #########
-    v.db_dropcolumn(map=HRU, columns='tmp_average', quiet=True)
     # Dealing with conversion from degrees (no good average) to something I can
     # average -- x- and y-vectors
     # Geographic coordinates, so sin=x, cos=y.... not that it matters so long 
     # as I am consistent in how I return to degrees
-    r.mapcalc('aspect_x = sin(' + aspect + ')', overwrite=gscript.overwrite(), quiet=True)
-    r.mapcalc('aspect_y = cos(' + aspect + ')', overwrite=gscript.overwrite(), quiet=True)
-    #grass.run_command('v.db.addcolumn', map=HRU, columns='aspect_x_sum double precision, aspect_y_sum double precision, ncells_in_hru integer')
-    v.rast_stats(map=HRU, raster='aspect_x', method='sum', column_prefix='aspect_x', flags='c', quiet=True)
-    v.rast_stats(map=HRU, raster='aspect_y', method='sum', column_prefix='aspect_y', flags='c', quiet=True)
+    _aspect_x_sum, _aspect_y_sum, _count = stats[aspect]
+    hru_aspect = np.arctan2(_aspect_y_sum, _aspect_x_sum) * 180. / np.pi
+    hru_aspect[hru_aspect < 0] += 360 # all positive
+    hru_aspect[_count == 0] = np.nan
+
+    # LAND USE/COVER and SOIL: class covering most of each HRU, and the
+    # fraction of the HRU in each class that occurs in the HRUs
+    # (<cov_type/soil_type>_frac_<class>)
+    #########################
+    columns = ['hru_slope', 'hru_elev', 'hru_aspect']
+    values = [hru_slope, hru_elev, hru_aspect]
+    for _column, _raster in (('cov_type', land_cover), ('soil_type', soil)):
+        if _raster == '':
+            continue
+        columns.append(_column)
+        values.append(majority(stats[_raster], default=1))
+        _fractions = class_fractions(stats[_raster])
+        _frac_columns = []
+        for k in np.where(np.sum(stats[_raster], axis=0) > 0)[0]:
+            _frac_columns.append(_column+'_frac_'+str(k))
+            columns.append(_frac_columns[-1])
+            values.append(_fractions[:,k])
+        # (none if the raster has no cells in the HRUs)
+        if len(_frac_columns) > 0:
+            v.db_addcolumn(map=HRU, columns=' double precision,'
+                           .join(_frac_columns)+' double precision',
+                           quiet=True)
+
+    # All columns to the database table at once (NaN -> NULL)
+    values_cats = []
+    for cat in cats:
+        _row = []
+        for _values in values:
+            _value = _values[cat].item()
+            if _value != _value: # NaN
+                _value = None
+            _row.append(_value)
+        values_cats.append(tuple(_row) + (int(cat),))
     hru = VectorTopo(HRU)
     hru.open('rw')
     cur = hru.table.conn.cursor()
-    cur.execute("SELECT cat,aspect_x_sum,aspect_y_sum FROM %s" %hru.name)
-    _arr = np.array(cur.fetchall()).astype(float)
-    _cat = _arr[:,0]
-    _aspect_x_sum = _arr[:,1]
-    _aspect_y_sum = _arr[:,2]
-    aspect_angle = np.arctan2(_aspect_y_sum, _aspect_x_sum) * 180. / np.pi
-    aspect_angle[aspect_angle < 0] += 360 # all positive
-    aspect_angle_cat = np.vstack((aspect_angle, _cat)).transpose()
-    cur.executemany("update "+ HRU +" set hru_aspect=? where cat=?", aspect_angle_cat)
+    cur.executemany("update "+HRU+" set "+"=?, ".join(columns)
+                    +"=? where cat=?", values_cats)
     hru.table.conn.commit()
     hru.close()
 
-    # ELEVATION
-    ############
-    v.rast_stats(map=HRU, raster=elevation, method='average', column_prefix='tmp', flags='c', quiet=True)
-    v.db_update(map=HRU, column='hru_elev', query_column='tmp_average', quiet=True)
-    v.db_dropcolumn(map=HRU, columns='tmp_average', quiet=True)
-
     # CENTROIDS 
     ############
 
@@ -290,90 +435,54 @@ def main():
     # From looking at map, lots of extra centroids on area boundaries, and removing
     # small areas (though threshold hard to guess) gets rid of these
 
+    # One pass over the areas: the centroid (and its cat) and the size of
+    # each area; areas without a centroid are skipped
     hru = VectorTopo(HRU)
     hru.open('rw')
     hru_cats = []
     hru_coords = []
-    for hru_i in hru:
-        if type(hru_i) is vector.geometry.Centroid:
-            hru_cats.append(hru_i.cat)
-            hru_coords.append(hru_i.coords())
+    hru_areas = []
+    for _area in hru.viter('areas'):
+        _centroid = _area.centroid()
+        if _centroid is None or _centroid.cat is None:
+            continue
+        hru_cats.append(_centroid.cat)
+        hru_coords.append(_centroid.coords())
+        hru_areas.append(_area.area())
     hru_cats = np.array(hru_cats)
     hru_coords = np.array(hru_coords)
-    hru.rewind()
-    
-    hru_area_ids = []
-    for coor in hru_coords:
-        _area = hru.find_by_point.area(Point(coor[0], coor[1]))
-        hru_area_ids.append(_area)
-    hru_area_ids = np.array(hru_area_ids)
-    hru.rewind()
-
-    hru_areas = []
-    for _area_id in hru_area_ids:
-        hru_areas.append(_area_id.area())
     hru_areas = np.array(hru_areas)
-    hru.rewind()
-      
-    allcats = sorted(list(set(list(hru_cats))))
-    
-    # Now create weighted mean
-    hru_centroid_locations = []
-    for cat in allcats:
-        hrus_with_cat = hru_cats[hru_cats == cat]
-        if len(hrus_with_cat) == 1:
-            hru_centroid_locations.append((hru_coords[hru_cats == cat]).squeeze())
-        else:
-            _centroids = hru_coords[hru_cats == cat]
-            #print _centroids
-            _areas = hru_areas[hru_cats == cat]
-            #print _areas
-            _x = np.average(_centroids[:,0], weights=_areas)
-            _y = np.average(_centroids[:,1], weights=_areas)
-            #print _x, _y
-            hru_centroid_locations.append(np.array([_x, _y]))
-          
-    # Now upload weighted mean to database table
-    # allcats and hru_centroid_locations are co-indexed
-    index__cats = create_iterator(HRU)
-    cur = hru.table.conn.cursor()
+
+    # Now create area-weighted mean of the centroids that share a cat
+    allcats, _inverse = np.unique(hru_cats, return_inverse=True)
+    _area_sum = np.bincount(_inverse, weights=hru_areas)
+    _x = np.bincount(_inverse, weights=hru_coords[:,0]*hru_areas) / _area_sum
+    _y = np.bincount(_inverse, weights=hru_coords[:,1]*hru_areas) / _area_sum
+    hru_centroid_locations = np.vstack((_x, _y)).transpose()
+
+    # (un)Project all centroids to lat/lon with a single m.proj call
+    _proj_in = gscript.tempfile()
+    np.savetxt(_proj_in, hru_centroid_locations, fmt='%.6f', delimiter='|')
+    _centroids_ll = gscript.read_command('m.proj', input=_proj_in,
+                                         separator='pipe', flags='od')
+    gscript.try_remove(_proj_in)
+    _lonlat = np.array([_line.split('|')[:2] for _line in
+                        _centroids_ll.strip().splitlines()]).astype(float)
+
+    # Now upload to database table: allcats and hru_centroid_locations are
+    # co-indexed
+    xy_cats = []
     for i in range(len(allcats)):
-        # meters
-        cur.execute('update '+HRU
-                    +' set hru_x='+str(hru_centroid_locations[i][0])
-                    +' where cat='+str(allcats[i]))
-        cur.execute('update '+HRU
-                    +' set hru_y='+str(hru_centroid_locations[i][1])
-                    +' where cat='+str(allcats[i]))
-        # feet
-        cur.execute('update '+HRU
-                    +' set hru_xlong='+str(hru_centroid_locations[i][0]*3.28084)
-                    +' where cat='+str(allcats[i]))
-        cur.execute('update '+HRU
-                    +' set hru_ylat='+str(hru_centroid_locations[i][1]*3.28084)
-                    +' where cat='+str(allcats[i]))
-        # (un)Project to lat/lon
-        _centroid_ll = gscript.parse_command('m.proj',
-                                             coordinates=
-                                             list(hru_centroid_locations[i]),
-                                             flags='od').keys()[0]
-        _lon, _lat, _z = _centroid_ll.split('|')
-        cur.execute('update '+HRU
-                    +' set hru_lon='+_lon
-                    +' where cat='+str(allcats[i]))
-        cur.execute('update '+HRU
-                    +' set hru_lat='+_lat
-                    +' where cat='+str(allcats[i]))
-
-    # feet -- not working.
-    # Probably an issue with index__cats -- maybe fix later, if needed
-    # But currently not a major speed issue
-    """
-    cur.executemany("update "+HRU+" set hru_xlong=?*3.28084 where hru_x=?", 
-                    index__cats)
-    cur.executemany("update "+HRU+" set hru_ylat=?*3.28084 where hru_y=?", 
-                    index__cats)
-    """                    
+        xy_cats.append( (hru_centroid_locations[i][0], # meters
+                         hru_centroid_locations[i][1],
+                         hru_centroid_locations[i][0]*3.28084, # feet
+                         hru_centroid_locations[i][1]*3.28084,
+                         _lonlat[i][0],
+                         _lonlat[i][1],
+                         int(allcats[i])) )
+    cur = hru.table.conn.cursor()
+    cur.executemany('update '+HRU+' set hru_x=?, hru_y=?, hru_xlong=?, '
+                    +'hru_ylat=?, hru_lon=?, hru_lat=? where cat=?', xy_cats)
 
     cur.close()
     hru.table.conn.commit()
@@ -386,26 +495,6 @@ def main():
     # Segment number = HRU ID number
     v.db_update(map=HRU, column='hru_segment', query_column='id', quiet=True)
 
-    # LAND USE/COVER
-    ############
-    if land_cover != '':
-        # NEED TO FIX THIS!!!!
-        #v.rast_stats(map=HRU, raster=land_cover, method='average', column_prefix='tmp', flags='c', quiet=True)
-        #v.db_update(map=HRU, column='cov_type', query_column='tmp_average', quiet=True)
-        #v.db_dropcolumn(map=HRU, columns='tmp_average', quiet=True)
-        v.db_update(map=HRU, column='cov_type', value=1, quiet=True)
-        v.what_rast(map=HRU, type='centroid', raster=land_cover, column='cov_type', quiet=True)
-
-    # SOIL
-    ############
-    if soil != '':
-        # NEED TO FIX THIS!!!!
-        #v.rast_stats(map=HRU, raster=soil, method='average', column_prefix='tmp', flags='c', quiet=True)
-        #v.db_update(map=HRU, column='soil_type', query_column='tmp_average', quiet=True)
-        #v.db_dropcolumn(map=HRU, columns='tmp_average', quiet=True)
-        v.db_update(map=HRU, column='soil_type', value=1, quiet=True)
-        v.what_rast(map=HRU, type='centroid', raster=soil, column='soil_type', quiet=True)
-
 
 if __name__ == "__main__":
     main()
@@ -332,45 +332,62 @@ def main():
     reach_y2s = colValues[:,colNames == 'yr2'].astype(float).squeeze()
     segment_ids__reach = colValues[:,colNames == 'segment_id'].astype(float).squeeze()
 
-    for segment_id in segment_ids:
-        reach_order_cats = []
-        downstream_directed = []
-        ssel = segment_ids == segment_id
-        rsel = segment_ids__reach == segment_id # selector
-        # Find first segment: x1y1 first here, but not necessarily later
-        downstream_directed.append(1)
-        _x_match = reach_x1s[rsel] == segment_x1s[ssel]
-        _y_match = reach_y1s[rsel] == segment_y1s[ssel]
-        _i_match = _x_match * _y_match
-        x1y1 = True # false if x2y2
-        # Find cat
-        _cat = int(reach_cats[rsel][_x_match * _y_match])
-        reach_order_cats.append(_cat)
-        # Get end of reach = start of next one
-        reach_x_end = float(reach_x2s[reach_cats == _cat])
-        reach_y_end = float(reach_y2s[reach_cats == _cat])
-        while _i_match.any():
-            _x_match = reach_x1s[rsel] == reach_x_end
-            _y_match = reach_y1s[rsel] == reach_y_end
-            _i_match = _x_match * _y_match
-            if _i_match.any():
-                _cat = int(reach_cats[rsel][_x_match * _y_match])
-                reach_x_end = float(reach_x2s[reach_cats == _cat])
-                reach_y_end = float(reach_y2s[reach_cats == _cat])
-                reach_order_cats.append(_cat)
-        print len(reach_order_cats), len(reach_cats[rsel])
-          
-        # Reach order to database table
-        reach_number__reach_order_cats = []
-        for i in range(len(reach_order_cats)):
-            reach_number__reach_order_cats.append( (i+1, reach_order_cats[i]) )
-        reachesTopo = VectorTopo(reaches)
-        reachesTopo.open('rw')
-        cur = reachesTopo.table.conn.cursor()
-        cur.executemany("update "+reaches+" set IREACH=? where cat=?", 
-                        reach_number__reach_order_cats)
-        reachesTopo.table.conn.commit()
-        reachesTopo.close()
+    # Index the reaches by segment and (snapped) starting coordinates: the
+    # end of each reach is the start of the next one in the same segment, so
+    # the whole network is ordered in one pass through this hash.
+    # Coordinates are snapped to bins of _tol; a point near a bin edge may
+    # fall in the neighboring bin, so those are looked up too.
+    _tol = 1E-3 # [m] for projected coordinates; absorbs float noise
+    def _snap(x):
+        return np.floor(x / _tol + 0.5).astype(np.int64)
+    _neighbors = [(0, 0)] + [(_dx, _dy) for _dx in (-1, 0, 1)
+                             for _dy in (-1, 0, 1) if (_dx, _dy) != (0, 0)]
+    def _pop_start(segment_id, qx, qy):
+        # index of the reach of this segment that starts at (qx, qy), or None
+        for _dx, _dy in _neighbors:
+            _key = (segment_id, qx + _dx, qy + _dy)
+            if _key in reach_by_start:
+                # (pop: each reach is used once, so loops cannot recur)
+                return reach_by_start.pop(_key)
+        return None
+    reach_x1s_q = _snap(reach_x1s)
+    reach_y1s_q = _snap(reach_y1s)
+    reach_x2s_q = _snap(reach_x2s)
+    reach_y2s_q = _snap(reach_y2s)
+    reach_by_start = {}
+    for i in range(len(reach_cats)):
+        reach_by_start[(segment_ids__reach[i], reach_x1s_q[i], 
+                        reach_y1s_q[i])] = i
+    # Number of reaches in each segment (to check the ordering)
+    nreaches_in_segment = {}
+    for segment_id in segment_ids__reach:
+        nreaches_in_segment[segment_id] = \
+                             nreaches_in_segment.get(segment_id, 0) + 1
+
+    reach_number__reach_order_cats = []
+    segment_x1s_q = _snap(segment_x1s)
+    segment_y1s_q = _snap(segment_y1s)
+    for j in range(len(segment_ids)):
+        # First reach starts at the segment's x1y1; then follow the chain
+        i = _pop_start(segment_ids[j], segment_x1s_q[j], segment_y1s_q[j])
+        _n = 0
+        while i is not None:
+            _n += 1
+            reach_number__reach_order_cats.append( (_n, int(reach_cats[i])) )
+            i = _pop_start(segment_ids__reach[i], reach_x2s_q[i],
+                           reach_y2s_q[i])
+        if _n != nreaches_in_segment.get(segment_ids[j], 0):
+            gscript.warning('Could not order all reaches of segment '
+                            +str(int(segment_ids[j])))
+
+    # Reach order to database table, in a single transaction
+    reachesTopo = VectorTopo(reaches)
+    reachesTopo.open('rw')
+    cur = reachesTopo.table.conn.cursor()
+    cur.executemany("update "+reaches+" set IREACH=? where cat=?", 
+                    reach_number__reach_order_cats)
+    reachesTopo.table.conn.commit()
+    reachesTopo.close()
       
 
     # TOP AND BOTTOM ARE OUT OF ORDER: SOME SEGS ARE BACKWARDS. UGH!!!!
@@ -382,32 +399,53 @@ def main():
     # Compute slope and starting elevations from the elevations at the start and 
     # end of the reaches and the length of each reach]
     
-    gscript.message('Obtaining elevation values from raster: may take time.')
+    gscript.message('Obtaining elevation values from raster.')
     v.db_addcolumn(map=reaches, columns='zr1 double precision, zr2 double precision')
-    zr1 = []
-    zr2 = []
-    for i in range(len(reach_cats)):
-        _x = reach_x1s[i]
-        _y = reach_y1s[i]
-        print _x, _y
-        _z = float(gscript.parse_command('r.what', map=elevation, coordinates=str(_x)+','+str(_y)).keys()[0].split('|')[-1])
-        zr1.append(_z)
-        _x = reach_x2s[i]
-        _y = reach_y2s[i]
-        _z = float(gscript.parse_command('r.what', map=elevation, coordinates=str(_x)+','+str(_y)).keys()[0].split('|')[-1])
-        zr2.append(_z)
-
-    zr1_cats = []
-    zr2_cats = []
+    # Read the DEM rows that hold reach endpoints once (in this region) and
+    # look up all endpoints at the same time, instead of one r.what per point
+    reg = gscript.region()
+    def _rowcol(_x, _y):
+        _row = np.floor((reg['n'] - _y) / reg['nsres']).astype(int)
+        _col = np.floor((_x - reg['w']) / reg['ewres']).astype(int)
+        # Points on the south or east edge belong to the last row / column
+        _row[_y == reg['s']] = reg['rows'] - 1
+        _col[_x == reg['e']] = reg['cols'] - 1
+        _inside = (_row >= 0) * (_row < reg['rows']) * \
+                  (_col >= 0) * (_col < reg['cols'])
+        return _row, _col, _inside
+    rc1 = _rowcol(reach_x1s, reach_y1s)
+    rc2 = _rowcol(reach_x2s, reach_y2s)
+    dem_row_ids = np.unique(np.hstack((rc1[0][rc1[2]], rc2[0][rc2[2]])))
+    dem = RasterRow(elevation)
+    dem.open('r')
+    dem_rows = np.nan * np.ones((len(dem_row_ids), reg['cols']))
+    for j in range(len(dem_row_ids)):
+        dem_rows[j] = dem[int(dem_row_ids[j])]
+    if dem.mtype == 'CELL':
+        dem_rows[dem_rows == -2147483648] = np.nan # CELL null
+    dem.close()
+    def _sample(rc):
+        _row, _col, _inside = rc
+        _z = np.nan * np.ones(len(_row))
+        _z[_inside] = dem_rows[np.searchsorted(dem_row_ids, _row[_inside]),
+                               _col[_inside]]
+        return _z
+    zr1 = _sample(rc1)
+    zr2 = _sample(rc2)
+    if np.isnan(zr1).any() or np.isnan(zr2).any():
+        gscript.warning('Some reach endpoints have no elevation value')
+
+    # NaN (null or outside the DEM) -> NULL in the table
+    zr_cats = []
     for i in range(len(reach_cats)):
-        zr1_cats.append( (zr1[i], reach_cats[i]) )
-        zr2_cats.append( (zr2[i], reach_cats[i]) )
+        zr_cats.append( (None if np.isnan(zr1[i]) else float(zr1[i]),
+                         None if np.isnan(zr2[i]) else float(zr2[i]),
+                         int(reach_cats[i])) )
 
     reachesTopo = VectorTopo(reaches)
     reachesTopo.open('rw')
     cur = reachesTopo.table.conn.cursor()
-    cur.executemany("update "+reaches+" set zr1=? where cat=?", zr1_cats)
-    cur.executemany("update "+reaches+" set zr2=? where cat=?", zr2_cats)
+    cur.executemany("update "+reaches+" set zr1=?, zr2=? where cat=?", zr_cats)
     reachesTopo.table.conn.commit()
     reachesTopo.close()
 
@@ -51,8 +51,9 @@
 
 #%option
 #%  key: cat
-#%  label: Farthest downstream segment category
+#%  label: Farthest downstream segment category (several: one basin each)
 #%  required: no
+#%  multiple: yes
 #%  guidependency: layer,column
 #%end
 
@@ -116,11 +117,67 @@ from grass.pygrass.vector.geometry import Point
 # MAIN MODULE #
 ###############
 
-def find_upstream_segments(cats, tostream, cat):
+def upstream_csr(cats, tostream):
     """
-    Find segments immediately upstream of the given one
+    Reverse adjacency of the network in compressed sparse row form: the
+    segments immediately upstream of segment i (indices into cats) are
+    indices[indptr[i]:indptr[i+1]]
     """
-    pass
+    cats = np.asarray(cats)
+    tostream = np.asarray(tostream)
+    index_of_cat = dict(zip(cats.tolist(), range(len(cats))))
+    # Index of the downstream segment (-1: exits the map or unknown cat)
+    down = np.array([index_of_cat.get(_cat, -1) for _cat in tostream.tolist()],
+                    dtype=int)
+    _has_down = np.nonzero(down >= 0)[0]
+    order = np.argsort(down[_has_down], kind='mergesort')
+    indices = _has_down[order]
+    indptr = np.zeros(len(cats)+1, dtype=int)
+    indptr[1:] = np.cumsum(np.bincount(down[_has_down], minlength=len(cats)))
+    return indptr, indices
+
+def find_upstream_segments(cats, tostream, outlet_cats):
+    """
+    Find all segments upstream of (and including) each outlet segment, with
+    one breadth-first walk up the network for all outlets together.
+    Returns a dict: outlet cat -> array of the cats in its basin. Basins of
+    outlets that lie upstream of another outlet are nested inside it.
+    """
+    cats = np.asarray(cats)
+    indptr, indices = upstream_csr(cats, tostream)
+    index_of_cat = dict(zip(cats.tolist(), range(len(cats))))
+    outlet_cats = [int(_cat) for _cat in outlet_cats]
+    # Walk up from every outlet at once; each segment is labeled with the
+    # nearest outlet downstream of it, and the walk stops at other outlets
+    label = -np.ones(len(cats), dtype=int)
+    frontier = []
+    for k in range(len(outlet_cats)):
+        i = index_of_cat[outlet_cats[k]]
+        label[i] = k
+        frontier.append(i)
+    # Outlets directly upstream of each outlet (nesting)
+    nested = [[] for k in range(len(outlet_cats))]
+    while len(frontier) > 0:
+        new_frontier = []
+        for i in frontier:
+            for j in indices[indptr[i]:indptr[i+1]]:
+                if label[j] < 0:
+                    label[j] = label[i]
+                    new_frontier.append(j)
+                elif label[j] != label[i]:
+                    nested[label[i]].append(label[j])
+        frontier = new_frontier
+    members = [cats[label == k] for k in range(len(outlet_cats))]
+    basins = {}
+    for k in range(len(outlet_cats)):
+        _parts = [members[k]]
+        _stack = list(nested[k])
+        while len(_stack) > 0:
+            _k = _stack.pop()
+            _parts.append(members[_k])
+            _stack += nested[_k]
+        basins[outlet_cats[k]] = np.sort(np.hstack(_parts))
+    return basins
     
 
 def main():
@@ -135,8 +192,8 @@ def main():
     streams = options['input_streams']
     basins = options['input_basins']
     downstream_cat = options['cat']
-    x_outlet = float(options['x_outlet'])
-    y_outlet = float(options['y_outlet'])
+    x_outlet = options['x_outlet']
+    y_outlet = options['y_outlet']
     output_basins = options['output_basin']
     output_streams = options['output_streams']
     output_pour_point = options['output_pour_point']
@@ -151,6 +208,9 @@ def main():
         pass
     else:
         gscript.fatal('You must set either "cat" or "x_outlet" and "y_outlet".')
+    if x_outlet != '':
+        x_outlet = float(x_outlet)
+        y_outlet = float(y_outlet)
 
 
     # NEED TO ADD IF-STATEMENT HERE TO AVOID AUTOMATIC OVERWRITING!!!!!!!!!!!
@@ -186,29 +246,27 @@ def main():
         cats = colValues[:,colNames == 'cat'].astype(int).squeeze() # = "fromstream"
 
         # Find network
-        basincats = [downstream_cat] # start here
-        most_upstream_cats = [downstream_cat] # all of those for which new cats must be sought
-        while True:
-            if len(most_upstream_cats) == 0:
-                break
-            tmp = list(most_upstream_cats) # copy to a temp file: old values
-            most_upstream_cats = [] # Ready to accept new values
-            for ucat in tmp:
-                most_upstream_cats += list(cats[tostream == int(ucat)])
-                basincats += most_upstream_cats
-                
-        basincats = list(set(list(basincats)))
-
-        basincats_str = ','.join(map(str, basincats))
-        
-        # Many basins out -- need to use overwrite flag in future!
-        #SQL_OR = 'rnum = ' + ' OR rnum = '.join(map(str, basincats))
-        #SQL_OR = 'cat = ' + ' OR cat = '.join(map(str, basincats))
-        SQL_LIST =  'cat IN (' + ', '.join(map(str, basincats)) + ')'
-        if len(basins) > 0:
-            v.extract(input=basins, output=output_basins, where=SQL_LIST, overwrite=gscript.overwrite(), quiet=True)
-        if len(streams) > 0:
-            v.extract(input=streams, output=output_streams, cats=basincats_str, overwrite=gscript.overwrite(), quiet=True)
+        downstream_cats = [int(_cat) for _cat in str(downstream_cat).split(',')]
+        basins_by_outlet = find_upstream_segments(cats, tostream,
+                                                  downstream_cats)
+        # One output basin per outlet: suffixed with the outlet cat if
+        # several are requested
+        for _cat in downstream_cats:
+            basincats = basins_by_outlet[_cat]
+            if len(downstream_cats) > 1:
+                _suffix = '_'+str(_cat)
+            else:
+                _suffix = ''
+            basincats_str = ','.join(map(str, basincats))
+            
+            # Many basins out -- need to use overwrite flag in future!
+            #SQL_OR = 'rnum = ' + ' OR rnum = '.join(map(str, basincats))
+            #SQL_OR = 'cat = ' + ' OR cat = '.join(map(str, basincats))
+            SQL_LIST =  'cat IN (' + ', '.join(map(str, basincats)) + ')'
+            if len(basins) > 0:
+                v.extract(input=basins, output=output_basins+_suffix, where=SQL_LIST, overwrite=gscript.overwrite(), quiet=True)
+            if len(streams) > 0:
+                v.extract(input=streams, output=output_streams+_suffix, cats=basincats_str, overwrite=gscript.overwrite(), quiet=True)
 
     else:
         # Have coordinates and will limit the area that way.
@@ -228,20 +286,23 @@ def main():
         except:
             pass
         if snapflag or (downstream_cat != ''):
-            _pp = gscript.vector_db_select(map=streams, columns='x2,y2', where='cat='+str(downstream_cat))
-            _xy = np.squeeze(_pp['values'].values())
-            _x = float(_xy[0])
-            _y = float(_xy[1])
+            # One point per outlet
+            _xys = []
+            for _cat in downstream_cats:
+                _pp = gscript.vector_db_select(map=streams, columns='x2,y2', where='cat='+str(_cat))
+                _xy = np.squeeze(_pp['values'].values())
+                _xys.append( (float(_xy[0]), float(_xy[1])) )
         else:
-            _x = x_outlet
-            _y = y_outlet
+            _xys = [(x_outlet, y_outlet)]
         pptmp = vector.Vector(output_pour_point)
         _cols = [(u'cat',       'INTEGER PRIMARY KEY'),
                  (u'x',         'DOUBLE PRECISION'),
                  (u'y',         'DOUBLE PRECISION')]
         pptmp.open('w', tab_name=output_pour_point, tab_cols=_cols)
-        point0 = Point(_x,_y)
-        pptmp.write(point0, cat=1, attrs=(str(_x), str(_y)), )
+        for i in range(len(_xys)):
+            _x, _y = _xys[i]
+            point0 = Point(_x,_y)
+            pptmp.write(point0, cat=i+1, attrs=(str(_x), str(_y)), )
         pptmp.table.conn.commit()
         pptmp.build()
         pptmp.close()
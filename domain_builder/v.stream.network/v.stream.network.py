@@ -78,6 +78,19 @@
 #%  required : no
 #%end
 
+#%option
+#%  key: snap
+#%  type: double
+#%  description: Tolerance for matching segment endpoints (0 = exact match)
+#%  answer: 0
+#%  required : no
+#%end
+
+#%flag
+#%  key: c
+#%  description: Check network: confluences with >2 inflows, disconnected pieces
+#%end
+
 ##################
 # IMPORT MODULES #
 ##################
@@ -112,6 +125,7 @@ def main():
     y1 = options['upstream_northing_column']
     x2 = options['downstream_easting_column']
     y2 = options['downstream_northing_column']
+    snap = float(options['snap'])
 
     streamsTopo = VectorTopo(streams)
     #streamsTopo.build()
@@ -169,31 +183,67 @@ def main():
     v.to_db(map=streams, option='end', columns=x2+','+y2)
 
     # 4. Read in and save the start and end coordinate points
-    colNames = np.array(vector_db_select(streams)['columns'])
-    colValues = np.array(vector_db_select(streams)['values'].values())
+    streams_db = vector_db_select(streams)
+    colNames = np.array(streams_db['columns'])
+    colValues = np.array(streams_db['values'].values())
     cats = colValues[:,colNames == 'cat'].astype(int).squeeze() # river number
-    xy1 = colValues[:,(colNames == 'x1') + (colNames == 'y1')].astype(float) # upstream
-    xy2 = colValues[:,(colNames == 'x2') + (colNames == 'y2')].astype(float) # downstream
+    xy1 = colValues[:,[list(colNames).index(x1), list(colNames).index(y1)]].astype(float) # upstream
+    xy2 = colValues[:,[list(colNames).index(x2), list(colNames).index(y2)]].astype(float) # downstream
 
-    # 5. Build river network
-    tocat = []
+    # 5. Build river network: index the segment starts by their coordinates
+    # (binned by the snapping tolerance) so that each segment end finds its
+    # downstream segment in one lookup
+    tocat = np.zeros(len(cats), dtype=int)
+    if snap > 0:
+        key1 = np.round(xy1 / snap).astype(np.int64)
+        key2 = np.round(xy2 / snap).astype(np.int64)
+    else:
+        key1 = xy1
+        key2 = xy2
+    start_index = {}
     for i in range(len(cats)):
-        tosegment_mask = np.prod(xy1 == xy2[i], axis=1)
-        if np.sum(tosegment_mask) == 0:
-            tocat.append(0)
-        else:
-            tocat.append(cats[tosegment_mask.nonzero()[0][0]])
-    tocat = np.asarray(tocat).astype(int)
+        start_index.setdefault(tuple(key1[i]), []).append(i)
+    if snap > 0:
+        # Points within the tolerance may fall in a neighboring bin
+        neighbors = [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)]
+    else:
+        neighbors = [(0, 0)]
+    for i in range(len(cats)):
+        best = None
+        for di, dj in neighbors:
+            for j in start_index.get((key2[i][0] + di, key2[i][1] + dj), []):
+                if j == i:
+                    continue
+                dist = np.hypot(*(xy1[j] - xy2[i]))
+                if dist <= snap and (best is None or dist < best[0]):
+                    best = (dist, j)
+        if best is not None:
+            tocat[i] = cats[best[1]]
+
+    # 6. Optional checks on the network
+    if flags['c']:
+        inflows = {}
+        for _tocat in tocat[tocat != 0]:
+            inflows[_tocat] = inflows.get(_tocat, 0) + 1
+        for _cat in sorted(inflows):
+            if inflows[_cat] > 2:
+                gscript.warning('Segment '+str(_cat)+' has '
+                                +str(inflows[_cat])+' inflowing segments')
+        # Each outlet (tostream = 0) drains its own piece of the network
+        noutlets = np.sum(tocat == 0)
+        if noutlets > 1:
+            gscript.warning('Network has '+str(noutlets)
+                            +' disconnected pieces; outlet cats: '
+                            +','.join(str(c) for c in cats[tocat == 0]))
 
     # This gives us a set of downstream-facing adjacencies.
-    # We will update the database with it.
+    # We will update the database with it, in a single transaction.
     streamsTopo.build()
     streamsTopo.open('rw')
     cur = streamsTopo.table.conn.cursor()
-    # Default to 0 if no stream flows to it
-    cur.execute("update "+streams+" set tostream=0")
-    for i in range(len(tocat)):
-        cur.execute("update "+streams+" set tostream="+str(tocat[i])+" where cat="+str(cats[i]))
+    # 0 if the stream exits the map
+    cur.executemany("update "+streams+" set tostream=? where cat=?",
+                    zip(tocat.tolist(), cats.tolist()))
     streamsTopo.table.conn.commit()
     #streamsTopo.build()
     streamsTopo.close()
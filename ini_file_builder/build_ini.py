@@ -8,8 +8,14 @@ class BuildINI(object):
         self.gsflow_ver='1.2.0'
         self.gsflow_path_simdir='/home/awickert/GSFLOW2018/'
         
-        # [GRASS_core]
+        # [elevation_inputs]
         self.DEM_file_path_to_import=''
+
+        # [land-surface_inputs]
+        self.LAND_COVER_file_path_to_import=''
+        self.SOIL_file_path_to_import=''
+
+        # [GRASS_core]
         self.gisdb='/PATH/TO/YOUR/HOME/DIRECTORY/PROBBALY/grassdata'
         self.version='74'
 
@@ -55,6 +61,7 @@ class BuildINI(object):
         self.fl_create_hydcond='0'
         self.hydcond='1E-5,1'
         self.finf='0.0002'
+        self.MODFLOW_array_format='INTERNAL'
 
     def writeINI(self, filename):
         
@@ -69,8 +76,14 @@ class BuildINI(object):
         writeline("gsflow_ver="+self.gsflow_ver)
         writeline("gsflow_path_simdir="+self.gsflow_path_simdir)
         writeline("")
-        writeline("[GRASS_core]")
+        writeline("[elevation_inputs]")
         writeline("DEM_file_path_to_import="+self.DEM_file_path_to_import)
+        writeline("")
+        writeline("[land-surface_inputs]")
+        writeline("LAND_COVER_file_path_to_import="+self.LAND_COVER_file_path_to_import)
+        writeline("SOIL_file_path_to_import="+self.SOIL_file_path_to_import)
+        writeline("")
+        writeline("[GRASS_core]")
         writeline("gisdb="+self.gisdb)
         writeline("version="+self.version)
         writeline("")
@@ -116,5 +129,7 @@ class BuildINI(object):
         writeline("fl_create_hydcond="+self.fl_create_hydcond)
         writeline("hydcond="+self.hydcond)
         writeline("finf="+self.finf)
+        writeline("MODFLOW_array_format="+self.MODFLOW_array_format)
+        f.close()
 
     
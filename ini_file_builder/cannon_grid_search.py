@@ -1,40 +1,25 @@
 import os
+import sys
 import numpy as np
-import time
 from build_ini import BuildINI
+from domain_sweep import run_sweep
+
+# add path containing GSFLOWcsvCache.py
+sys.path.append(os.path.join('..', 'visualization'))
+from GSFLOWcsvCache import read_gsflow_csv
 
 bi = BuildINI()
 bi.DEM_input = ''
 bi.outlet_point_x = '523962.029643,'
 bi.outlet_point_y = '4933492.52548'
 
-inifile = os.getcwd() + '/test.ini'
-
 drainage_thresholds = np.linspace(10E6, 100E6, 8)
 MODFLOW_grid_sizes = np.linspace(1000, 10000, 8)
 
-outlist = []
-for da_thresh in drainage_thresholds:
-    for modflow_gs in MODFLOW_grid_sizes:
-        bi.threshold_drainage_area_meters2 = str(da_thresh)
-        bi.MODFLOW_grid_resolution_meters = str(modflow_gs)
-        bi.proj_name = 'gridTestCannon_' + 'D' + str(da_thresh) + '_M' + str(modflow_gs)
-        bi.writeINI(inifile)
-        
-        print modflow_gs, da_thresh
-        
-        t1 = time.time()
-        os.system('python /home/awickert/models/GSFLOW-GRASS/domain_builder/buildDomainGRASS.py ' + inifile)
-        t2 = time.time()
-        dt_domain = t2-t1
-        
-        t1 = time.time()
-        os.system('sh /home/awickert/models/GSFLOW-GRASS/Run/goGSFLOW.sh ' + inifile)
-        t2 = time.time()
-        dt_input_run = t2-t1
-        
-        outlist.append([bi.MODFLOW_grid_resolution_meters, bi.threshold_drainage_area_meters2, dt_domain, dt_input_run, bi.proj_name])
-        
+# Build (and run) all combinations: streams and HRUs are built once per
+# drainage threshold, and the thresholds run in parallel GRASS mapsets
+outlist = run_sweep(bi, drainage_thresholds, MODFLOW_grid_sizes, 'gridTestCannon_',
+                    '/home/awickert/models/GSFLOW-GRASS')
 #np.savetxt('outlist.txt', outlist, '%s')
 
 
@@ -91,7 +76,7 @@ plt.show()
 Qarray = []
 for runname in runnames:
     try:
-        Q = np.genfromtxt('/home/awickert/GSFLOW2018/'+runname+'/outputs/PRMS_GSFLOW/gsflow.csv', delimiter=',',skip_header=1)[:,6]
+        Q = read_gsflow_csv('/home/awickert/GSFLOW2018/'+runname+'/outputs/PRMS_GSFLOW/gsflow.csv')[0].iloc[:,5].values # gsflow.csv column 6 (Date column is dropped)
     except:
         Q = np.nan*np.zeros(2004)
     Qarray.append(Q)
@@ -1,7 +1,12 @@
 import os
+import sys
 import numpy as np
-import time
 from build_ini import BuildINI
+from domain_sweep import run_sweep
+
+# add path containing GSFLOWcsvCache.py
+sys.path.append(os.path.join('..', 'visualization'))
+from GSFLOWcsvCache import read_gsflow_csv
 
 bi = BuildINI()
 bi.DEM_input = ''
@@ -9,35 +14,17 @@ bi.outlet_point_x = '523962.029643,'
 bi.outlet_point_y = '4933492.52548'
 bi.gsflow_path_simdir = '/home/awickert/Dropbox/GSFLOW2018_cannonBig'
 
-inifile = os.getcwd() + '/test.ini'
-
 # Main-text example is 10E6, 1000
 
 drainage_thresholds = np.array([1E6, 5E6, 10E6, 20E6, 30E6, 50E6, 75E6, 100E6])
 MODFLOW_grid_sizes = np.array([100, 500, 1000, 2000, 3000, 5000, 7500, 10000])
 
-outlist = []
-for da_thresh in drainage_thresholds:
-    for modflow_gs in MODFLOW_grid_sizes:
-        bi.threshold_drainage_area_meters2 = str(da_thresh)
-        bi.MODFLOW_grid_resolution_meters = str(modflow_gs)
-        bi.proj_name = 'gridTestCannon_big_' + 'D' + str(da_thresh) + '_M' + str(modflow_gs)
-        bi.writeINI(inifile)
-        
-        print modflow_gs, da_thresh
-        
-        t1 = time.time()
-        os.system('python /home/awickert/models/GSFLOW-GRASS/domain_builder/buildDomainGRASS.py ' + inifile)
-        t2 = time.time()
-        dt_domain = t2-t1
-        
-        t1 = time.time()
-        os.system('sh /home/awickert/models/GSFLOW-GRASS/Run/goGSFLOW.sh ' + inifile)
-        t2 = time.time()
-        dt_input_run = t2-t1
-        
-        outlist.append([bi.MODFLOW_grid_resolution_meters, bi.threshold_drainage_area_meters2, dt_domain, dt_input_run, bi.proj_name])
-        
+# Build (and run) all combinations: streams and HRUs are built once per
+# drainage threshold, and the thresholds run in parallel GRASS mapsets
+outlist = run_sweep(bi, drainage_thresholds, MODFLOW_grid_sizes, 'gridTestCannon_big_',
+                    '/home/awickert/models/GSFLOW-GRASS')
+# Project name of the last run names the output files
+bi.proj_name = outlist[-1][-1]
 np.savetxt('outlist_'+bi.proj_name.split('_')[0]+'.txt', outlist, '%s')
 
 
@@ -92,7 +79,7 @@ plt.show()
 Qarray = []
 for runname in runnames:
     try:
-        Q = np.genfromtxt('/home/awickert/GSFLOW2018/'+runname+'/outputs/PRMS_GSFLOW/gsflow.csv', delimiter=',',skip_header=1)[:,6]
+        Q = read_gsflow_csv('/home/awickert/GSFLOW2018/'+runname+'/outputs/PRMS_GSFLOW/gsflow.csv')[0].iloc[:,5].values # gsflow.csv column 6 (Date column is dropped)
     except:
         Q = np.nan*np.zeros(2004)
     Qarray.append(Q)
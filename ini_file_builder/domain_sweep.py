@@ -0,0 +1,141 @@
+"""
+Parameter sweep over drainage thresholds and MODFLOW grid sizes that shares
+the upstream domain-building stages between runs
+
+Each drainage threshold is one branch, built in its own GRASS mapset (a
+copy of the DEM maps in the current mapset). In a branch, the grid sizes
+are built one after the other with buildDomainGRASS.py: its stage
+checkpoints (domain_builder/stageCheckpoints.py) then build the streams,
+basins, segments and HRUs once per threshold and only the grid-dependent
+stages for each grid size. Branches are independent and run in parallel.
+
+Must be started from within a GRASS session whose current mapset holds the
+DEM products of buildDomainGRASS.py (DEM_original_import, DEM and
+accumulation_onmap), as left by a first run with a DEM_file_path_to_import.
+"""
+
+import os
+import copy
+import time
+import tempfile
+import subprocess
+import multiprocessing.pool
+from grass import script as gscript
+
+# DEM products shared by all branches
+DEM_MAPS = ['DEM_original_import', 'DEM', 'accumulation_onmap']
+
+# time recorded for a failed (or skipped) step
+NaN = float('nan')
+
+
+def _branch_env(mapset):
+    """
+    Environment for GRASS commands in a (new) mapset of the current location
+    """
+    gisenv = gscript.gisenv()
+    fd, gisrc = tempfile.mkstemp(prefix='gisrc_' + mapset + '_')
+    f = os.fdopen(fd, 'w')
+    f.write('GISDBASE: ' + gisenv['GISDBASE'] + '\n')
+    f.write('LOCATION_NAME: ' + gisenv['LOCATION_NAME'] + '\n')
+    f.write('MAPSET: ' + gisenv['MAPSET'] + '\n')
+    f.write('GUI: text\n')
+    f.close()
+    env = os.environ.copy()
+    env['GISRC'] = gisrc
+    gscript.run_command('g.mapset', flags='c', mapset=mapset, env=env,
+                        quiet=True)
+    return env
+
+def _run_branch(args):
+    """
+    Builds (and optionally runs) all grid sizes of one drainage threshold in
+    its own mapset; returns one outlist row per grid size
+    """
+    bi, da_thresh, MODFLOW_grid_sizes, proj_prefix, mapset, inidir, \
+        toolkit_dir, run_models = args
+    base_mapset = gscript.gisenv()['MAPSET']
+    env = _branch_env(mapset)
+    for name in DEM_MAPS:
+        gscript.run_command('g.copy', raster=(name+'@'+base_mapset, name),
+                            overwrite=True, quiet=True, env=env)
+    out = []
+    failed = False
+    for modflow_gs in MODFLOW_grid_sizes:
+        bi = copy.copy(bi)
+        bi.DEM_file_path_to_import = '' # DEM maps copied above
+        bi.threshold_drainage_area_meters2 = str(da_thresh)
+        bi.MODFLOW_grid_resolution_meters = str(modflow_gs)
+        bi.proj_name = proj_prefix + 'D' + str(da_thresh) + '_M' + \
+                       str(modflow_gs)
+        inifile = os.path.join(inidir, bi.proj_name + '.ini')
+        bi.writeINI(inifile)
+
+        print modflow_gs, da_thresh
+
+        # After a failed build, the rest of the branch is not built: its
+        # stages would start from incomplete maps
+        dt_domain = dt_input_run = NaN
+        if not failed:
+            t1 = time.time()
+            status = subprocess.call(['python', os.path.join(toolkit_dir,
+                                      'domain_builder', 'buildDomainGRASS.py'),
+                                      inifile], env=env)
+            if status == 0:
+                dt_domain = time.time() - t1
+            else:
+                failed = True
+                gscript.warning('Domain build failed for ' + bi.proj_name)
+
+        if run_models and not failed:
+            t1 = time.time()
+            status = subprocess.call(['sh', os.path.join(toolkit_dir, 'Run',
+                                      'goGSFLOW.sh'), inifile, toolkit_dir])
+            if status == 0:
+                dt_input_run = time.time() - t1
+            else:
+                gscript.warning('Input build or GSFLOW run failed for '
+                                + bi.proj_name)
+        elif not failed:
+            dt_input_run = 0.
+
+        out.append([bi.MODFLOW_grid_resolution_meters,
+                    bi.threshold_drainage_area_meters2, dt_domain,
+                    dt_input_run, bi.proj_name])
+    os.remove(env['GISRC'])
+    return out
+
+def run_sweep(bi, drainage_thresholds, MODFLOW_grid_sizes, proj_prefix,
+              toolkit_dir, inidir=None, nworkers=None, run_models=True):
+    """
+    Builds the domain for every (drainage threshold, MODFLOW grid size)
+    combination, starting from the settings in BuildINI bi, and runs GSFLOW
+    for each if run_models. nworkers branches (default: number of CPUs) run
+    at the same time, each in the mapset <proj_prefix>D<i>.
+
+    Returns the list of [grid size, threshold, domain-building time,
+    input-building and run time, project name], thresholds varying
+    slowest (as in nested loops over thresholds and then grid sizes).
+    The time of a step that failed, or was not done because the domain
+    build failed earlier in its branch, is NaN.
+    """
+    if inidir is None:
+        inidir = os.getcwd()
+    if nworkers is None:
+        nworkers = multiprocessing.cpu_count()
+    tasks = []
+    for ii in range(len(drainage_thresholds)):
+        mapset = (proj_prefix + 'D' + str(ii)).replace('.', '_')
+        tasks.append((bi, drainage_thresholds[ii], MODFLOW_grid_sizes,
+                      proj_prefix, mapset, inidir, toolkit_dir, run_models))
+    # Threads are enough: all of the work is in the child processes
+    pool = multiprocessing.pool.ThreadPool(max(1, min(nworkers, len(tasks))))
+    try:
+        branches = pool.map(_run_branch, tasks)
+    finally:
+        pool.close()
+        pool.join()
+    outlist = []
+    for branch in branches:
+        outlist += branch
+    return outlist
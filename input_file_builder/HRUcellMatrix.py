@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Sparse mapping between PRMS HRUs and MODFLOW grid cells
+
+Built once from the gravity-reservoir table (gvr_hru_id, gvr_hru_pct,
+gvr_cell_id, gvr_cell_pct) and the HRU areas, and saved as the parts of a
+SciPy CSR matrix [nhru x ncell] of shared areas [m2] in one .npz file.
+Fields are then moved between PRMS (HRU) and MODFLOW (cell) space with one
+sparse matrix-vector product each:
+
+    hru_to_grid: area-weighted mean over each cell (HRU-free parts count 0)
+    grid_to_hru: area-weighted mean over each HRU
+
+Cell ids are those of v.gsflow.grid: ncol * (row - 1) + col, from 1.
+"""
+
+import numpy as np
+from scipy import sparse
+
+ACRE_M2 = 4046.8564224
+
+
+class HRUcellMatrix(object):
+    """
+    Shared areas of HRUs and MODFLOW cells: areas[h, c] [m2], with the full
+    area of each HRU (hru_area) and cell (cell_area), all indexed from 0
+    (HRU id - 1, cell id - 1)
+    """
+
+    def __init__(self, areas, hru_area, cell_area, nrow, ncol):
+        self.areas = sparse.csr_matrix(areas)
+        self.hru_area = np.asarray(hru_area, dtype=float)
+        self.cell_area = np.asarray(cell_area, dtype=float)
+        self.nrow = int(nrow)
+        self.ncol = int(ncol)
+        # area fractions of each HRU in each cell, and of each cell in each
+        # HRU (transposed, for cell -> HRU products)
+        self._hru_frac = sparse.diags(_inverse(self.hru_area)).dot(self.areas)
+        self._cell_frac = sparse.diags(_inverse(self.cell_area)).dot(
+                                       self.areas.T.tocsr())
+
+    @property
+    def nhru(self):
+        return self.areas.shape[0]
+
+    @property
+    def ncell(self):
+        return self.areas.shape[1]
+
+    def hru_to_grid(self, hru_values):
+        """
+        Field on the HRUs (nhru) -> [nrow x ncol] grid field
+        """
+        out = self._cell_frac.dot(np.asarray(hru_values, dtype=float))
+        return out.reshape(self.nrow, self.ncol)
+
+    def grid_to_hru(self, grid_values):
+        """
+        Field on the grid ([nrow x ncol] or ncell) -> HRU field (nhru)
+        """
+        grid_values = np.asarray(grid_values, dtype=float).ravel()
+        return self._hru_frac.dot(grid_values)
+
+    def save(self, fname):
+        np.savez(fname, data=self.areas.data, indices=self.areas.indices,
+                 indptr=self.areas.indptr, shape=self.areas.shape,
+                 hru_area=self.hru_area, cell_area=self.cell_area,
+                 grid_shape=np.array([self.nrow, self.ncol]))
+
+
+def _inverse(values):
+    out = np.zeros(len(values))
+    out[values > 0] = 1. / values[values > 0]
+    return out
+
+def from_gvr_table(gvrdata, hru_area_acres, nrow, ncol):
+    """
+    HRUcellMatrix from the gravity-reservoir table (e.g., the DataFrame of
+    gravity_reservoirs.txt) and the HRU areas [acres] in HRU id order
+    """
+    hru_ids = np.asarray(gvrdata['gvr_hru_id'], dtype=int)
+    cell_ids = np.asarray(gvrdata['gvr_cell_id'], dtype=int)
+    hru_frac = np.asarray(gvrdata['gvr_hru_pct'], dtype=float) / 100.
+    cell_frac = np.asarray(gvrdata['gvr_cell_pct'], dtype=float) / 100.
+    hru_area = np.asarray(hru_area_acres, dtype=float) * ACRE_M2
+    shared = hru_frac * hru_area[hru_ids - 1]
+    # full cell areas, from any reservoir in each cell
+    cell_area = np.zeros(nrow * ncol)
+    _ok = cell_frac > 0
+    cell_area[cell_ids[_ok] - 1] = shared[_ok] / cell_frac[_ok]
+    areas = sparse.csr_matrix((shared, (hru_ids - 1, cell_ids - 1)),
+                              shape=(len(hru_area), nrow * ncol))
+    return HRUcellMatrix(areas, hru_area, cell_area, nrow, ncol)
+
+def load(fname):
+    """
+    HRUcellMatrix saved with HRUcellMatrix.save
+    """
+    npz = np.load(fname)
+    try:
+        areas = sparse.csr_matrix((npz['data'], npz['indices'], npz['indptr']),
+                                  shape=tuple(npz['shape']))
+        nrow, ncol = npz['grid_shape']
+        out = HRUcellMatrix(areas, npz['hru_area'], npz['cell_area'],
+                            nrow, ncol)
+    finally:
+        npz.close()
+    return out
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory MODFLOW model passed between the package writers of
+printMODFLOWInputs.py
+
+The grid geometry, layer elevations, IBOUND and initial heads, and the
+stress periods are set up once (from DEM.asc, or from an existing .dis
+file) and handed to each writer, so that no writer re-reads DEM.asc or the
+package files written before it. Layer arrays are written in the package
+files (array_format 'INTERNAL') or to separate MODFLOW binary array files
+('BINARY'), see array_location.
+"""
+
+import platform
+import numpy as np
+from readASCIIgrid import read_grid_file
+from readMODFLOWinputs import read_dis
+
+if platform.system() == 'Linux':
+    slashstr = '/'
+else:
+    slashstr = '\\'
+
+
+class ModflowModel(object):
+    """
+    MODFLOW model written as <GSFLOW_indir>/<infile_pre>.<package>:
+
+    NSEW [north, south, east, west] (None if not known), NROW, NCOL, NLAY,
+    DELR, DELC [m] (uniform grid), TOP [NROW x NCOL], BOTM [NROW x NCOL x
+    NLAY]; PERLEN, NSTP, TSMULT and SsTr ('ss' or 'tr') of each stress
+    period; IBOUND and STRT [NROW x NCOL x NLAY] and HNOFLO, set by
+    write_ba6_MOD3_2
+
+    array_format: 'INTERNAL' or 'BINARY' (OPEN/CLOSE files in GSFLOW_indir,
+    named in the package files by GSFLOW_indir_rel, the input directory as
+    seen from where MODFLOW runs, or by their absolute path if it is None)
+    """
+
+    def __init__(self, GSFLOW_indir, infile_pre, TOP, BOTM, DELR, DELC,
+                 PERLEN, NSTP, TSMULT, SsTr, NSEW=None, ITMUNI=4, LENUNI=2):
+        self.GSFLOW_indir = GSFLOW_indir
+        self.infile_pre = infile_pre
+        self.TOP = np.asarray(TOP, dtype=float)
+        self.BOTM = np.asarray(BOTM, dtype=float)
+        self.NROW, self.NCOL, self.NLAY = self.BOTM.shape
+        self.DELR = float(DELR)
+        self.DELC = float(DELC)
+        self.NSEW = NSEW
+        self.ITMUNI = ITMUNI
+        self.LENUNI = LENUNI
+        self.LAYCBD = np.zeros((1,self.NLAY), int) # no confining beds
+        self.PERLEN = list(PERLEN)
+        self.NSTP = list(NSTP)
+        self.TSMULT = list(TSMULT)
+        self.SsTr = [s.lower() for s in SsTr]
+        # basic package, from write_ba6_MOD3_2
+        self.IBOUND = None
+        self.STRT = None
+        self.HNOFLO = None
+        # where layer arrays are written
+        self.array_format = 'INTERNAL'
+        self.GSFLOW_indir_rel = None
+
+    @property
+    def NPER(self):
+        return len(self.PERLEN)
+
+    @property
+    def transient(self):
+        return 'tr' in self.SsTr
+
+    def active(self):
+        """
+        IBOUND of layer 1 [NROW x NCOL] (write_ba6_MOD3_2 must have run)
+        """
+        if self.IBOUND is None:
+            raise ValueError('IBOUND not set: write the .ba6 file first')
+        return self.IBOUND[:,:,0]
+
+    def array_location(self, tag):
+        """
+        (LOCAT, FMTIN, ext_fil) of MOD_data_write2file for the array tag
+        (e.g., 'upw_HK_1', part of the binary file name)
+        """
+        if self.array_format.upper() == 'INTERNAL':
+            return 'INTERNAL', '(FREE)', None
+        if self.array_format.upper() != 'BINARY':
+            raise ValueError('array_format must be INTERNAL or BINARY')
+        fname = self.infile_pre + '_' + tag + '.bin'
+        ext_fil_0 = self.GSFLOW_indir + slashstr + fname
+        if self.GSFLOW_indir_rel is None:
+            ext_fil_rel = ext_fil_0
+        else:
+            ext_fil_rel = self.GSFLOW_indir_rel + fname
+        return 'OPEN/CLOSE', '(BINARY)', (ext_fil_0, ext_fil_rel)
+
+
+def from_DEM(GSFLOW_indir, infile_pre, surfz_fil, NLAY, DZ, perlen_tr):
+    """
+    ModflowModel with TOP from the DEM grid (surfz_fil), layers of uniform
+    thickness DZ [NLAY] below it, and 2 stress periods: a 1-day steady
+    state and a perlen_tr-day transient one with daily time steps (to
+    correspond with PRMS)
+    """
+    sdata, TOP = read_grid_file(surfz_fil)
+    NSEW = [sdata['north'], sdata['south'], sdata['east'], sdata['west']]
+    NROW = sdata['rows']
+    NCOL = sdata['cols']
+    DELR = float(NSEW[2]-NSEW[3])/NCOL # width of column [m]
+    DELC = float(NSEW[0]-NSEW[1])/NROW # height of row [m]
+    BOTM = np.zeros((NROW, NCOL, NLAY), float)
+    BOTM[:,:,0] = TOP-DZ[0]
+    for ilay in range(1,NLAY):
+        BOTM[:,:,ilay] = BOTM[:,:,ilay-1]-DZ[ilay]
+    PERLEN = [1, int(perlen_tr)]
+    return ModflowModel(GSFLOW_indir, infile_pre, TOP, BOTM, DELR, DELC,
+                        PERLEN, NSTP=PERLEN, TSMULT=[1, 1],
+                        SsTr=['ss', 'tr'], NSEW=NSEW)
+
+def from_dis(GSFLOW_indir, infile_pre, dis_fil):
+    """
+    ModflowModel from an existing .dis file
+    """
+    dis = read_dis(dis_fil)
+    return ModflowModel(GSFLOW_indir, infile_pre, dis.TOP, dis.BOTM,
+                        dis.DELR[0], dis.DELC[0], dis.PERLEN, dis.NSTP,
+                        dis.TSMULT, dis.SsTr, ITMUNI=dis.ITMUNI,
+                        LENUNI=dis.LENUNI)
@@ -23,6 +23,7 @@ sys.path.append('..' + slashstr + 'Run')
 
 # Read in user-specified settings
 from readSettings import Settings
+from readASCIIgrid import read_grid_file_header, read_grid
 # Set input file
 if len(sys.argv) < 2:
     settings_input_file = 'settings.ini'
@@ -65,18 +66,7 @@ if len(Settings.hydcond0) == 1:
 if fl_runscript == 1:
     surfz_fil = Settings.GISinput_dir + slashstr + 'DEM.asc'
     NLAY = Settings.NLAY
-    f = open(surfz_fil, 'r')
-    sdata = {}
-    for i in range(6):
-        line = f.readline()
-        line = line.rstrip() # remove newline characters
-        key, value = line.split(': ')
-        try:
-          value = int(value)
-        except:
-          value = float(value)
-        sdata[key] = value
-    f.close()
+    sdata = read_grid_file_header(surfz_fil)
         
     NSEW = [sdata['north'], sdata['south'], sdata['east'], sdata['west']]
     NROW = sdata['rows'] 
@@ -86,7 +76,7 @@ if fl_runscript == 1:
     DELR = (NSEW[2]-NSEW[3])/NCOL # width of column [m]
     DELC = (NSEW[0]-NSEW[1])/NROW # height of row [m]
     
-    TOP = np.genfromtxt(surfz_fil, skip_header=6, delimiter=' ', dtype=float)
+    TOP = read_grid(surfz_fil)
     
     hydcond = np.ones([NROW, NCOL, NLAY]) * hydcond_default # default
     
@@ -25,6 +25,10 @@ sys.path.append('..' + slashstr + 'Run')
 
 # Read in user-specified settings
 from readSettings import Settings
+from readASCIIgrid import read_grid
+from readMODFLOWinputs import read_layered_arrays
+from writeMODFLOWarrays import MOD_data_write2file, lazy_field
+import ModflowModel
 # Set input file
 if len(sys.argv) < 2:
     settings_input_file = 'settings.ini'
@@ -37,7 +41,7 @@ Settings = Settings(settings_input_file)
 
 
 
-def write_nam_MOD_f2_NWT(GSFLOW_indir, GSFLOW_indir_rel, GSFLOW_outdir_rel, infile_pre, fil_res_in, sw_2005_NWT):
+def write_nam_MOD_f2_NWT(model, GSFLOW_indir_rel, GSFLOW_outdir_rel, fil_res_in, sw_2005_NWT):
 # v2 - allows for restart option (init)
 # _NWT: from Leila's email, her work from spring 2017, incorporates
 # MODFLOW-NWT.
@@ -54,6 +58,9 @@ def write_nam_MOD_f2_NWT(GSFLOW_indir, GSFLOW_indir_rel, GSFLOW_outdir_rel, infi
 # GSFLOW_outdir = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/GSFLOW/outputs/MODFLOW/'
 # infile_pre = 'test2lay_py'
 
+    GSFLOW_indir = model.GSFLOW_indir
+    infile_pre = model.infile_pre
+
     # - write to this file (within indir)
     fil_nam = infile_pre + '.nam'
     
@@ -105,7 +112,7 @@ def write_nam_MOD_f2_NWT(GSFLOW_indir, GSFLOW_indir_rel, GSFLOW_outdir_rel, infi
 # v1 - 11/30/16 start to include GIS data for Chimborazo's Gavilan Machay
 #      watershed; topo.asc for surface elevation (fill in bottom elevation
 #      based on uniform thickness of single aquifer)
-def write_dis_MOD2_f(GSFLOW_indir, infile_pre, surfz_fil, NLAY, DZ, perlen_tr):
+def write_dis_MOD2_f(model):
 
 # # ==== TO RUN AS SCRIPT ===================================================
 #     # - directories
@@ -135,6 +142,9 @@ def write_dis_MOD2_f(GSFLOW_indir, infile_pre, surfz_fil, NLAY, DZ, perlen_tr):
 ##  =========================================================================
 
 
+    GSFLOW_indir = model.GSFLOW_indir
+    infile_pre = model.infile_pre
+
     # - write to this file
     # GSFLOW_indir = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/GSFLOW/inputs/MODFLOW/';
     dis_fil = infile_pre + '.dis'
@@ -163,39 +173,34 @@ def write_dis_MOD2_f(GSFLOW_indir, infile_pre, surfz_fil, NLAY, DZ, perlen_tr):
     # DZ = 10; # [NLAYx1] ***temporary: constant 10m thick single aquifer (consider 2-layer?)
     # DZ = [5; 5]; # [NLAYx1] ***temporary: constant 10m thick single aquifer (consider 2-layer?)
     
-    # - time discretization
-    PERLEN = [1, perlen_tr];  # 2 periods: 1-day steady-state and multi-day transient
+    # - time discretization (ModflowModel.from_DEM: 1-day steady-state and
+    # multi-day transient periods)
+    PERLEN = model.PERLEN
     
     comment1 = '# test file for Gavilan Machay'
     comment2 = '# test file'
     
     # - The following will be assumed:
-    LAYCBD = np.zeros((1,NLAY), int); # no confining layer below layer
-    ITMUNI = 4; # [d]
-    LENUNI = 2; # [m]
-    NPER = 2; # 1 SS then 1 transient
-    NSTP = PERLEN 
-    TSMULT = 1  # must have daily time step to correspond with PRMS
-    SsTr_flag = ['ss', 'tr']
+    LAYCBD = model.LAYCBD # no confining layer below layer
+    ITMUNI = model.ITMUNI # [d]
+    LENUNI = model.LENUNI # [m]
+    NPER = model.NPER # 1 SS then 1 transient
+    NSTP = model.NSTP
+    TSMULT = model.TSMULT # must have daily time step to correspond with PRMS
+    SsTr_flag = model.SsTr
     
     ## ------------------------------------------------------------------------
-    # -- Read in data from files
-    sdata = read_grid_file_header(surfz_fil)
-        
-    NSEW = [sdata['north'], sdata['south'], sdata['east'], sdata['west']]
-    NROW = sdata['rows'] 
-    NCOL = sdata['cols']
+    # -- Grid from the model
+    NLAY = model.NLAY
+    NROW = model.NROW
+    NCOL = model.NCOL
 
     # - space discretization
-    DELR = (NSEW[2]-NSEW[3])/NCOL # width of column [m]
-    DELC = (NSEW[0]-NSEW[1])/NROW # height of row [m]
-    
-    TOP = np.genfromtxt(surfz_fil, skip_header=6, delimiter=' ', dtype=float)
+    DELR = model.DELR # width of column [m]
+    DELC = model.DELC # height of row [m]
     
-    BOTM = np.zeros((NROW, NCOL, NLAY), float)
-    BOTM[:,:,0] = TOP-DZ[0];
-    for ilay in range(1,NLAY):
-        BOTM[:,:,ilay] = BOTM[:,:,ilay-1]-DZ[ilay]
+    TOP = model.TOP
+    BOTM = model.BOTM
 
     # -- Discretization file:
     dis_fil_0 = GSFLOW_indir + slashstr + dis_fil
@@ -212,17 +217,18 @@ def write_dis_MOD2_f(GSFLOW_indir, infile_pre, surfz_fil, NLAY, DZ, perlen_tr):
 #    fobj.write('CONSTANT %7.3f   DELC\n' % (DELC))
     fobj.write('CONSTANT %g   DELR\n' % (DELR))
     fobj.write('CONSTANT %g   DELC\n' % (DELC))
-    fobj.write('INTERNAL  1.0  (FREE)  0                          TOP ELEVATION OF LAYER 1 \n');
-    np.savetxt(fobj, TOP, delimiter=' ', fmt='%10g')
+    LOCAT, FMTIN, ext_fil = model.array_location('dis_TOP')
+    MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', TOP, 
+                        'TOP ELEVATION OF LAYER 1', fmt='%10g', FMTIN=FMTIN, ext_fil=ext_fil)
     
     for ii in range(NLAY):
-        fobj.write('INTERNAL  1.0  (FREE)  0                          BOTM ELEVATION OF LAYER %d \n' 
-        % (ii+1))
-        np.savetxt(fobj, BOTM[:,:,ii], delimiter=' ', fmt='%10g')        
+        LOCAT, FMTIN, ext_fil = model.array_location('dis_BOTM_%d' % (ii+1))
+        MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', BOTM[:,:,ii], 
+                            'BOTM ELEVATION OF LAYER %d' % (ii+1), fmt='%10g', FMTIN=FMTIN, ext_fil=ext_fil)
 
     for ii in range(NPER):
         fobj.write(' %g %d %g %s        PERLEN, NSTP, TSMULT, Ss/Tr (stress period %4d)\n' 
-        % (PERLEN[ii], NSTP[ii], TSMULT, SsTr_flag[ii], ii+1))
+        % (PERLEN[ii], NSTP[ii], TSMULT[ii], SsTr_flag[ii], ii+1))
 
     fobj.close()
     
@@ -274,7 +280,7 @@ def write_dis_MOD2_f(GSFLOW_indir, infile_pre, surfz_fil, NLAY, DZ, perlen_tr):
 # (had to be careful of numerical convergence problems; set constant head for 
 # outer boundary to avoid these.  Later resolved with NWT by Leila)
 
-def write_ba6_MOD3_2(GSFLOW_indir, infile_pre, mask_fil, dischargept_fil, dis_fil):
+def write_ba6_MOD3_2(model, mask_fil, dischargept_fil):
 
 #    # ==== TO RUN AS SCRIPT ===================================================
 #    # - directories
@@ -303,6 +309,9 @@ def write_ba6_MOD3_2(GSFLOW_indir, infile_pre, mask_fil, dischargept_fil, dis_fi
 #    numerical convergence for AGU2016 poster.  Maybe resolved with MODFLOW-NWT?
 #    # =========================================================================
     
+    GSFLOW_indir = model.GSFLOW_indir
+    infile_pre = model.infile_pre
+
     # - write to this file
     # GSFLOW_dir = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/GSFLOW/inputs/MODFLOW/';
     ba6_file = infile_pre + '.ba6'
@@ -315,11 +324,7 @@ def write_ba6_MOD3_2(GSFLOW_indir, infile_pre, mask_fil, dischargept_fil, dis_fi
     # -- IBOUND(NROW,NCOL,NLAY): <0 const head, 0 no flow, >0 variable head
     # use basin mask (set IBOUND>0 within watershed, =0 outside watershed, <0 at discharge point and 2 neighboring pixels)
     # mask_fil = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/Data/GIS/basinmask_dischargept.asc';
-    sdata = read_grid_file_header(mask_fil)
-    NSEW = [sdata['north'], sdata['south'], sdata['east'], sdata['west']]
-    NROW = sdata['rows'] 
-    NCOL = sdata['cols']
-    IBOUND = np.genfromtxt(mask_fil, skip_header=6, skip_footer=0, delimiter=' ', dtype=float)
+    IBOUND = read_grid(mask_fil)
 
 #    f = open(dischargept_fil, 'r')
 #    last_line = f.readlines()
@@ -374,37 +379,14 @@ def write_ba6_MOD3_2(GSFLOW_indir, infile_pre, mask_fil, dischargept_fil, dis_fi
     
     
     # -- init head: base on TOP and BOTM
-#    dis_file = GSFLOW_indir + slashstr + infile_pre + '.dis'
-    # dis_file = '/home/gcng/Shortcuts/AndesWaterResources/GSFLOW/inputs/MODFLOW/test2lay.dis'
-    f = open(dis_fil, 'r')
-    for i in range(3): # first 2 lines are comments
-        line = f.readline().rstrip()
-    line = line.split()
-    NLAY = int(line[0]) 
-    NROW = int(line[1]) 
-    NCOL = int(line[2]) 
-    NPER = int(line[3]) 
-    ITMUNI = int(line[4]) 
-    LENUNI = int(line[5])    
+    NLAY = model.NLAY
+    NROW = model.NROW
+    NCOL = model.NCOL
 
     print(NROW, NCOL)
 
-    line = f.readline().rstrip()
-    LAYCBD = np.array(line.split(), float)
-    
-    line = f.readline().rstrip()
-    line = line.split()
-    DELR = float(line[1])
-    line = f.readline().rstrip()
-    line = line.split()
-    DELC = float(line[1])
-    f.close()    
-    
-    TOP = np.genfromtxt(dis_fil, skip_header=7, max_rows=NROW, dtype=float)
-    BOTM = np.zeros((NROW, NCOL, NLAY),float);
-    for ii in range(NLAY):
-        BOTM[:,:,ii] = np.genfromtxt(dis_fil, skip_header=7+(ii+1)*(NROW+1), \
-        max_rows=NROW, dtype=float)
+    TOP = model.TOP
+    BOTM = model.BOTM
 
    
 #    # - make discharge point and neighboring cells constant head (similar to Sagehen example)
@@ -467,6 +449,10 @@ def write_ba6_MOD3_2(GSFLOW_indir, infile_pre, mask_fil, dischargept_fil, dis_fi
     # - assumed values
     HNOFLO = -999.99
     
+    model.IBOUND = IBOUND
+    model.STRT = initHead
+    model.HNOFLO = HNOFLO
+    
     
     ## ------------------------------------------------------------------------
     # -- Write ba6 file
@@ -477,13 +463,15 @@ def write_ba6_MOD3_2(GSFLOW_indir, infile_pre, mask_fil, dischargept_fil, dis_fi
     fobj.write('FREE\n')
     
     for ilay in range(NLAY):
-        fobj.write('INTERNAL          1 (FREE)  3         IBOUND for layer %d \n' % (ilay+1))
-        np.savetxt(fobj, IBOUND[:,:,ii], delimiter=' ', fmt='%4d')      
+        LOCAT, FMTIN, ext_fil = model.array_location('ba6_IBOUND_%d' % (ilay+1))
+        MOD_data_write2file(fobj, LOCAT, 1, 3, 'INT', IBOUND[:,:,ilay], 
+                            'IBOUND for layer %d' % (ilay+1), fmt='%4d', FMTIN=FMTIN, ext_fil=ext_fil)
     
     fobj.write('    %f  HNOFLO\n' % (HNOFLO));
     for ilay in range(NLAY):
-        fobj.write('INTERNAL          1 (FREE)  3         init head for layer %d \n' % (ilay+1))
-        np.savetxt(fobj, initHead[:,:,ii], delimiter=' ', fmt='%7g')      
+        LOCAT, FMTIN, ext_fil = model.array_location('ba6_STRT_%d' % (ilay+1))
+        MOD_data_write2file(fobj, LOCAT, 1.0, 3, 'REAL', initHead[:,:,ilay], 
+                            'init head for layer %d' % (ilay+1), fmt='%7g', FMTIN=FMTIN, ext_fil=ext_fil)
 
     fobj.close()
     
@@ -514,7 +502,7 @@ def write_ba6_MOD3_2(GSFLOW_indir, infile_pre, mask_fil, dischargept_fil, dis_fi
 
 # based on write_lpf_MOD2_f2_2.m
 
-def write_lpf_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
+def write_lpf_MOD2_f2_2(model):
     
 #    # =========== TO RUN AS SCRIPT ===========================================
 #    # - directories
@@ -554,24 +542,15 @@ def write_lpf_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
     # - write to this file
     # GSFLOW_dir = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/GSFLOW/inputs/MODFLOW/';
     # lpf_file = 'test.lpf';
+    GSFLOW_indir = model.GSFLOW_indir
+    infile_pre = model.infile_pre
     lpf_file = infile_pre + '.lpf'
     
-    # - domain dimensions, maybe already in surfz_fil and botm_fil{}?
-    # NLAY = 2;
-    # surfz_fil = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/Data/GIS/topo.asc';
-    sdata = read_grid_file_header(surfz_fil)
-        
-    NSEW = [sdata['north'], sdata['south'], sdata['east'], sdata['west']]
-    NROW = sdata['rows'] 
-    NCOL = sdata['cols']
+    # - domain dimensions
+    NLAY = model.NLAY
+    NROW = model.NROW
+    NCOL = model.NCOL
     print((NROW, NCOL))
-
-    # - space discretization
-    DELR = (NSEW[2]-NSEW[3])/NCOL # width of column [m]
-    DELC = (NSEW[0]-NSEW[1])/NROW # height of row [m]
-    
-    # - set TOP to surface elevation [m]
-    TOP = np.genfromtxt(surfz_fil, skip_header=6, delimiter=' ', dtype=float)
         
     
     ## get strm_buffer info (pixels around streams, for hyd cond)
@@ -580,19 +559,16 @@ def write_lpf_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
     
     # -- Base hydcond, Ss (all layers), and Sy (top layer only) on data from files
     # (temp place-holder)
-    hydcond = np.ones((NROW,NCOL,NLAY))
 #    print "hydcond0", hydcond0
     try:
        float(Settings.hydcond0[0])
-       for lay_i in range(Settings.NLAY):
-           hydcond[:,:,lay_i] = float(Settings.hydcond0[lay_i]) * hydcond[:,:,lay_i]
+       # uniform in each layer (written as CONSTANT)
+       hydcond = lazy_field([float(Settings.hydcond0[lay_i]) for lay_i in range(NLAY)], (NROW,NCOL,NLAY))
     except ValueError:
-       for ii in range(NLAY):
-            hydcond[:,:,ii] = np.genfromtxt(Settings.hydcond0, skip_header=1+ii*(NROW+1), \
-            max_rows=NROW, dtype=float)
+       hydcond = read_layered_arrays(Settings.hydcond0[0], NROW, NCOL, NLAY)
            
-    Ss = 2e-6*np.ones((NROW,NCOL,NLAY),float) # constant 2e-6 /m for Sagehen
-    Sy = 0.15*np.ones((NROW,NCOL,NLAY),float) # 0.08-0.15 in Sagehen (lower Sy under ridges for volcanic rocks)
+    Ss = lazy_field(2e-6, (NROW,NCOL,NLAY)) # constant 2e-6 /m for Sagehen
+    Sy = lazy_field(0.15, (NROW,NCOL,NLAY)) # 0.08-0.15 in Sagehen (lower Sy under ridges for volcanic rocks)
     WETDRY = Sy # = Sy in Sagehen (lower Sy under ridges for volcanic rocks)
         
 #    hydcond[:,:,0] = 0.01#K;
@@ -651,21 +627,26 @@ def write_lpf_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
     # -- Write HKSAT and Ss, Sy (if Tr) in .lpf file
     # loop thru layers (different entry for each layer)
     for ilay in range(NLAY):
-        fobj.write('INTERNAL   1.000E-00 (FREE)    0            HY layer  %d\n' % (ilay+1))
-        np.savetxt(fobj, hydcond[:,:,ilay], delimiter=' ', fmt=' %4.2e')      
+        LOCAT, FMTIN, ext_fil = model.array_location('lpf_HY_%d' % (ilay+1))
+        MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', hydcond[:,:,ilay], 
+                            'HY layer  %d' % (ilay+1), fmt=' %4.2e', FMTIN=FMTIN, ext_fil=ext_fil)
 
-        fobj.write('INTERNAL   1.000E-00 (FREE)    0            VKA layer  %d\n' % (ilay+1))
-        np.savetxt(fobj, VKA[:,:,ilay], delimiter=' ', fmt=' %4.2e')      
+        LOCAT, FMTIN, ext_fil = model.array_location('lpf_VKA_%d' % (ilay+1))
+        MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', VKA[:,:,ilay], 
+                            'VKA layer  %d' % (ilay+1), fmt=' %4.2e', FMTIN=FMTIN, ext_fil=ext_fil)
     
         if fl_Tr:
-            fobj.write('INTERNAL   1.000E-00 (FREE)    0            Ss layer  %d\n' % (ilay+1))
-            np.savetxt(fobj, Ss[:,:,ilay], delimiter=' ', fmt=' %4.2e')      
+            LOCAT, FMTIN, ext_fil = model.array_location('lpf_Ss_%d' % (ilay+1))
+            MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', Ss[:,:,ilay], 
+                                'Ss layer  %d' % (ilay+1), fmt=' %4.2e', FMTIN=FMTIN, ext_fil=ext_fil)
             if laytyp[ilay] > 0: # convertible, i.e. unconfined
-                fobj.write('INTERNAL   1.000E-00 (FREE)    0            Sy layer  %d\n' % (ilay+1))
-                np.savetxt(fobj, Sy[:,:,ilay], delimiter=' ', fmt=' %4.2e')      
+                LOCAT, FMTIN, ext_fil = model.array_location('lpf_Sy_%d' % (ilay+1))
+                MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', Sy[:,:,ilay], 
+                                    'Sy layer  %d' % (ilay+1), fmt=' %4.2e', FMTIN=FMTIN, ext_fil=ext_fil)
                 if laywet[ilay] > 0:
-                    fobj.write('INTERNAL   1.000E-00 (FREE)    0            WETDRY layer  %d\n' % (ilay+1))
-                    np.savetxt(fobj, WETDRY[:,:,ilay], delimiter=' ', fmt=' %4.2f')      
+                    LOCAT, FMTIN, ext_fil = model.array_location('lpf_WETDRY_%d' % (ilay+1))
+                    MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', WETDRY[:,:,ilay], 
+                                        'WETDRY layer  %d' % (ilay+1), fmt=' %4.2f', FMTIN=FMTIN, ext_fil=ext_fil)
     
     fobj.write('\n')
     fobj.close()
@@ -694,7 +675,7 @@ def write_lpf_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
 # made to Leila's script.)
 
 
-def write_upw_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
+def write_upw_MOD2_f2_2(model):
     
 #    # =========== TO RUN AS SCRIPT ===========================================
 #    # - directories
@@ -734,23 +715,14 @@ def write_upw_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
     # - write to this file
     # GSFLOW_dir = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/GSFLOW/inputs/MODFLOW/';
     # upw_file = 'test.upw';
+    GSFLOW_indir = model.GSFLOW_indir
+    infile_pre = model.infile_pre
     upw_fil = infile_pre + '.upw'
     
-    # - domain dimensions, maybe already in surfz_fil and botm_fil{}?
-    # NLAY = 2;
-    # surfz_fil = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/Data/GIS/topo.asc';
-    sdata = read_grid_file_header(surfz_fil)
-        
-    NSEW = [sdata['north'], sdata['south'], sdata['east'], sdata['west']]
-    NROW = sdata['rows'] 
-    NCOL = sdata['cols']
-
-    # - space discretization
-    DELR = (NSEW[2]-NSEW[3])/NCOL # width of column [m]
-    DELC = (NSEW[0]-NSEW[1])/NROW # height of row [m]
-    
-    # - set TOP to surface elevation [m]
-    TOP = np.genfromtxt(surfz_fil, skip_header=6, delimiter=' ', dtype=float)
+    # - domain dimensions
+    NLAY = model.NLAY
+    NROW = model.NROW
+    NCOL = model.NCOL
         
     
     ## get strm_buffer info (pixels around streams, for hyd cond)
@@ -758,19 +730,19 @@ def write_upw_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
 
     
     # -- Base hydcond, Ss (all layers), and Sy (top layer only) on data from files
-    hydcond = np.ones((NROW,NCOL,NLAY))
 #    print "hydcond0", Settings.hydcond0
     try:
        float(Settings.hydcond0[0])
-       for lay_i in range(Settings.NLAY):
-           hydcond[:,:,lay_i] = float(Settings.hydcond0[lay_i]) * hydcond[:,:,lay_i]
+       # uniform in each layer (written as CONSTANT)
+       hydcond = lazy_field([float(Settings.hydcond0[lay_i]) for lay_i in range(NLAY)], (NROW,NCOL,NLAY))
     except ValueError:
+       hydcond = np.ones((NROW,NCOL,NLAY))
        for ii in range(NLAY):
-            hydcond[:,:,ii] = np.genfromtxt(Settings.hydcond0[ii], skip_header=1+ii*(NROW+1), \
-            max_rows=NROW, dtype=float)
+            hydcond[:,:,ii] = read_layered_arrays(Settings.hydcond0[ii], \
+            NROW, NCOL, ii+1)[:,:,ii]
            
-    Ss = 2e-6*np.ones((NROW,NCOL,NLAY),float) # constant 2e-6 /m for Sagehen
-    Sy = 0.15*np.ones((NROW,NCOL,NLAY),float) # 0.08-0.15 in Sagehen (lower Sy under ridges for volcanic rocks)
+    Ss = lazy_field(2e-6, (NROW,NCOL,NLAY)) # constant 2e-6 /m for Sagehen
+    Sy = lazy_field(0.15, (NROW,NCOL,NLAY)) # 0.08-0.15 in Sagehen (lower Sy under ridges for volcanic rocks)
     WETDRY = Sy # = Sy in Sagehen (lower Sy under ridges for volcanic rocks)
     
     
@@ -830,18 +802,22 @@ def write_upw_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
     # -- Write HKSAT and Ss, Sy (if Tr) in .lpf file
     # loop thru layers (different entry for each layer)
     for ilay in range(NLAY):
-        fobj.write('INTERNAL   1.000E-00 (FREE)    0            HY layer  %d\n' % (ilay+1))
-        np.savetxt(fobj, hydcond[:,:,ilay], delimiter=' ', fmt=' %4.2e')      
+        LOCAT, FMTIN, ext_fil = model.array_location('upw_HY_%d' % (ilay+1))
+        MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', hydcond[:,:,ilay], 
+                            'HY layer  %d' % (ilay+1), fmt=' %4.2e', FMTIN=FMTIN, ext_fil=ext_fil)
 
-        fobj.write('INTERNAL   1.000E-00 (FREE)    0            VKA layer  %d\n' % (ilay+1))
-        np.savetxt(fobj, VKA[:,:,ilay], delimiter=' ', fmt=' %4.2e')      
+        LOCAT, FMTIN, ext_fil = model.array_location('upw_VKA_%d' % (ilay+1))
+        MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', VKA[:,:,ilay], 
+                            'VKA layer  %d' % (ilay+1), fmt=' %4.2e', FMTIN=FMTIN, ext_fil=ext_fil)
     
         if fl_Tr:
-            fobj.write('INTERNAL   1.000E-00 (FREE)    0            Ss layer  %d\n' % (ilay+1))
-            np.savetxt(fobj, Ss[:,:,ilay], delimiter=' ', fmt=' %4.2e')      
+            LOCAT, FMTIN, ext_fil = model.array_location('upw_Ss_%d' % (ilay+1))
+            MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', Ss[:,:,ilay], 
+                                'Ss layer  %d' % (ilay+1), fmt=' %4.2e', FMTIN=FMTIN, ext_fil=ext_fil)
             if laytyp[ilay] > 0: # convertible, i.e. unconfined
-                fobj.write('INTERNAL   1.000E-00 (FREE)    0            Sy layer  %d\n' % (ilay+1))
-                np.savetxt(fobj, Sy[:,:,ilay], delimiter=' ', fmt=' %4.2e')      
+                LOCAT, FMTIN, ext_fil = model.array_location('upw_Sy_%d' % (ilay+1))
+                MOD_data_write2file(fobj, LOCAT, 1.0, 0, 'REAL', Sy[:,:,ilay], 
+                                    'Sy layer  %d' % (ilay+1), fmt=' %4.2e', FMTIN=FMTIN, ext_fil=ext_fil)
                 # Editing Leila's file: laywet should always be 0 for UPW
 #                if laywet[ilay] > 0:
 #                    fobj.write('INTERNAL   1.000E-00 (FREE)    0            WETDRY layer  %d\n' % (ilay+1))
@@ -869,7 +845,7 @@ def write_upw_MOD2_f2_2(GSFLOW_indir, infile_pre, surfz_fil, NLAY):
 #%%
 
 # based on write_OC_PCG_MOD_f.m
-def write_OC_PCG_MOD_f(GSFLOW_indir, infile_pre, perlen_tr):
+def write_OC_PCG_MOD_f(model):
 
 #    # =========== TO RUN AS SCRIPT ===========================================
 #    # - directories
@@ -881,14 +857,16 @@ def write_OC_PCG_MOD_f(GSFLOW_indir, infile_pre, perlen_tr):
 #    slashstr = '/'
 #    # ========================================================================
 
+    GSFLOW_indir = model.GSFLOW_indir
+    infile_pre = model.infile_pre
+
     # - write to this file
     fil_pcg = infile_pre + '.pcg'
     fil_oc = infile_pre + '.oc'
     
-    # -- shoud match .dis
-    NPER = 2 # 1 SS then 1 transient
-    PERLEN = [1, int(perlen_tr)]  # 2 periods: 1-day steady-state and multi-day transient
-    NSTP = PERLEN
+    # -- matches .dis
+    NPER = model.NPER # 1 SS then 1 transient
+    NSTP = model.NSTP
     
     # -- pcg and oc files are not changed with this script
     # fil_pcg_0 = fullfile(MODtest_dir0, fil_pcg);
@@ -935,11 +913,27 @@ def write_OC_PCG_MOD_f(GSFLOW_indir, infile_pre, perlen_tr):
 
 #%%
 
+def SFR_column_str(data, names, fmt, rows):
+    """
+    fmt % (values of columns names) for the rows of data where rows (bool
+    array) is True, '' for the others; object array of strings that can be
+    concatenated with +
+    """
+    out = np.empty(len(rows), dtype=object)
+    out[:] = ''
+    if rows.any():
+        if len(names) == 0:
+            out[rows] = fmt
+        else:
+            values = np.asarray(data[names].values)[rows]
+            out[rows] = [fmt % tuple(v) for v in values.tolist()]
+    return out
+
 # based on make_sfr2_f_Mannings
 #
-def make_sfr2_f_Mannings(GSFLOW_indir, infile_pre, reach_fil, dis_fil, segment_fil_all, GSFLOW_ver):
+def make_sfr2_f_Mannings(model, reach_fil, segment_fil_all, GSFLOW_ver):
 
-# Note: assume .dis file already created!! (reads in TOP for setting STRTOP)
+# Note: uses the model's TOP and BOTM for setting STRTOP
 
 #     # ======== TO RUN AS SCRIPT ===============================================
 #     GSFLOW_indir = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/GSFLOW/inputs/MODFLOW/'
@@ -956,6 +950,8 @@ def make_sfr2_f_Mannings(GSFLOW_indir, infile_pre, reach_fil, dis_fil, segment_f
     
     ##
     
+    GSFLOW_indir = model.GSFLOW_indir
+    infile_pre = model.infile_pre
     sfr_file = infile_pre + '.sfr'
     
     # -- Refer to GSFLOW manual p.202, SFR1 manual, and SFR2 manual
@@ -986,7 +982,7 @@ def make_sfr2_f_Mannings(GSFLOW_indir, infile_pre, reach_fil, dis_fil, segment_f
     # items 
     reach_data_all = pd.read_csv(reach_fil)       # used to write item 2: assumes 
     
-    NPER = 2       # used for item 3
+    NPER = model.NPER       # used for item 3
     
     # items 4a: # NSEG ICALC  OUTSEG  IUPSEG  IPRIOR  NSTRPTS  FLOW  RUNOFF  ETSW  PPTSW  ROUGHCH  ROUGHBK  CDPTH  FDPTH  AWDTH  BWDTH
     segment_data_4A = pd.read_csv(segment_fil_all[0]);   # used to write items 4a
@@ -1002,83 +998,30 @@ def make_sfr2_f_Mannings(GSFLOW_indir, infile_pre, reach_fil, dis_fil, segment_f
     if fl_nstrm < 0: 
         nstrm = -nstrm
 
-    # sort rows according to increasing segment numbers
-    reach_data_all = reach_data_all.sort_values(by='ISEG', ascending=1)
+    # sort rows according to increasing segment, then reach numbers
+    reach_data_all = reach_data_all.sort_values(by=['ISEG', 'IREACH'], kind='mergesort')
+    reach_data_all = reach_data_all.reset_index(drop=True)
     #nss = max(reach_data_all['ISEG'])
     nss = segment_data_4A.shape[0]
 
-
-    # sort rows according to increasing reach numbers
-    colhead = reach_data_all.columns.get_values()
-    ind_IREACH = np.array(np.where(colhead == 'IREACH'))
-    for ii in range(nss):
-        ind1 = (np.array(np.where(reach_data_all['ISEG'] == ii+1))).astype(int)
-        if ind1.size > 1:
-            ind1 = np.squeeze(ind1)
-            ind2 = np.array(reach_data_all['IREACH'])[ind1].argsort().astype(int)
-#        a = np.array(reach_data_all.iloc[ind1[ind2]])
-#        reach_data_all.iloc[ind1] = a
-            reach_data_all.iloc[ind1] = np.array(reach_data_all.iloc[ind1[ind2]])
-        else:
-            ind1 = np.ones((1,))* ind1[0]
-            ind1 = ind1.astype(int)
-
-        # renumber IREACH to start at 1 for each segment
-        print ind1
-        reach_data_all['IREACH'].iloc[ind1] = range(1,len(ind1)+1)
+    # renumber IREACH to start at 1 for each segment
+    reach_data_all['IREACH'] = reach_data_all.groupby('ISEG').cumcount() + 1
             
     # -- make sure STRTOP is within 1st layer 
-    # - read in TOP and BOTM from .dis file
-#    dis_file = GSFLOW_indir + slashstr + infile_pre + '.dis'
-#    dis_file = '/home/gcng/Shortcuts/AndesWaterResources/GSFLOW/inputs/MODFLOW/test2lay.dis'
-    f = open(dis_fil, 'r')
-    for i in range(3): # first 2 lines are comments
-        line = f.readline().rstrip()
-    line = line.split()
-    NLAY = int(line[0]) 
-    NROW = int(line[1]) 
-    NCOL = int(line[2]) 
-    NPER = int(line[3]) 
-    ITMUNI = int(line[4]) 
-    LENUNI = int(line[5])    
-
-    line = f.readline().rstrip()
-    LAYCBD = np.array(line.split(), float)
-    
-    line = f.readline().rstrip()
-    line = line.split()
-    DELR = float(line[1])
-    line = f.readline().rstrip()
-    line = line.split()
-    DELC = float(line[1])
-    f.close()    
-    
-    TOP = np.genfromtxt(dis_fil, skip_header=7, max_rows=NROW, dtype=float)
-    BOTM = np.zeros((NROW, NCOL, NLAY),float);
-    for ii in range(NLAY):
-        BOTM[:,:,ii] = np.genfromtxt(dis_fil, skip_header=7+(ii+1)*(NROW+1), \
-        max_rows=NROW, dtype=float)
-
+    TOP = model.TOP
+    BOTM = model.BOTM
 
-    # TOP for cells corresponding to reaches
-    TOP_RCH = []
-    for ii in range(abs(nstrm)): 
-        ind_i = int(reach_data_all.loc[reach_data_all.index[ii],'IRCH'])
-        ind_j = int(reach_data_all.loc[reach_data_all.index[ii],'JRCH'])
-        TOP_RCH.append(TOP[ind_i-1,ind_j-1])
-
-    # BOTM for cells corresponding to reaches
-    BOTM_RCH = []
-    for ii in range(abs(nstrm)): 
-        ind_i = int(reach_data_all.loc[reach_data_all.index[ii],'IRCH'])
-        ind_j = int(reach_data_all.loc[reach_data_all.index[ii],'JRCH'])
-        ind_k = int(reach_data_all.loc[reach_data_all.index[ii],'KRCH'])
-        BOTM_RCH.append(BOTM[ind_i-1, ind_j-1, ind_k-1])
+    # TOP and BOTM for cells corresponding to reaches
+    IRCH = reach_data_all['IRCH'].values.astype(int)
+    JRCH = reach_data_all['JRCH'].values.astype(int)
+    KRCH = reach_data_all['KRCH'].values.astype(int)
+    TOP_RCH = TOP[IRCH-1, JRCH-1]
+    BOTM_RCH = BOTM[IRCH-1, JRCH-1, KRCH-1]
     
     # - change STRTOP to be just below TOP
     print 'Setting STRTOP (stream top) to be just below (2m) corresponding grid TOP'
     STRTOP = np.array(TOP_RCH) - 2 # 2 m below TOP
-    if any(STRTOP-reach_data_all['STRTHICK'] < BOTM_RCH):
+    if np.any(STRTOP-reach_data_all['STRTHICK'].values < BOTM_RCH):
         print 'Error! STRTOP is below BOTM of the corresponding layer! Exiting...'
         quit()
     reach_data_all.loc[:,'STRTOP'] = np.array(STRTOP) 
@@ -1136,8 +1079,7 @@ def make_sfr2_f_Mannings(GSFLOW_indir, infile_pre, reach_fil, dis_fil, segment_f
 #     end
         
     # -- threshold slope at minimum 0.001
-    ind = np.where(reach_data_all['SLOPE'] < 0.001)
-    reach_data_all.loc[reach_data_all.index[ind],'SLOPE'] = 0.001
+    reach_data_all.loc[reach_data_all['SLOPE'] < 0.001, 'SLOPE'] = 0.001
 
 #    print 'setting various streambed properties (overwriting values in ' + reach_fil + ')'
 #
@@ -1249,101 +1191,79 @@ def make_sfr2_f_Mannings(GSFLOW_indir, infile_pre, reach_fil, dis_fil, segment_f
         # write item 3 to the file
         np.savetxt(fobj, stress_periods[iper,:][np.newaxis], fmt='  %5d')
         
-        itmp = stress_periods[iper,0]        
+        itmp = int(stress_periods[iper,0])
         if itmp > 0:
-            # segment_data_4A
+            # items 4a, 4b and 4c of all segments, built column by column:
+            # each field is formatted for the segments that have it
+            seg_4a = segment_data_4A.iloc[:itmp]
+            icalc = seg_4a['ICALC'].values
+            all_seg = np.ones(itmp, bool)
             
-            for iitmp in range(int(itmp)):   # start loop over itmp (num_segments)
-                dummy4a = segment_data_4A.iloc[iitmp,:]
-                # write item 4a to the file
-
-                fobj.write('    %5d  %5d  %5d  %5d' % (dummy4a['NSEG'], dummy4a['ICALC'], dummy4a['OUTSEG'], dummy4a['IUPSEG']))
-                
-                if dummy4a['IUPSEG'] > 0:
-                    fobj.write('  %5d' % (dummy4a['IPRIOR']))
-                
-                if dummy4a['ICALC'] == 4:
-                    fobj.write('  %5d' % (dummy4a['NSTRPTS']))
-                
-                fobj.write('  %8.3f  %8.3f  %8.3f  %8.3f' % (dummy4a['FLOW'], dummy4a['RUNOFF'], dummy4a['ETSW'], dummy4a['PPTSW']))
-                
-                if (dummy4a['ICALC'] == 1) or (dummy4a['ICALC'] == 2):
-                    fobj.write('  %8.3f' % (dummy4a['ROUGHCH']))
-               
-                if dummy4a['ICALC'] == 2:
-                    fobj.write('  %8.3f' % (dummy4a['ROUGHBK']))
-                
-                if dummy4a['ICALC'] == 3:
-                    fobj.write('  %8.3f  %8.3f  %8.3f  %8.3f' % (dummy4a['CDPTH'], dummy4a['FDPTH'], dummy4a['AWDTH'], dummy4a['BWDTH']))
-                
-                fobj.write('\n')
+            # item 4a
+            item_4a = (SFR_column_str(seg_4a, ['NSEG', 'ICALC', 'OUTSEG', 'IUPSEG'], '    %5d  %5d  %5d  %5d', all_seg)
+                       + SFR_column_str(seg_4a, ['IPRIOR'], '  %5d', seg_4a['IUPSEG'].values > 0)
+                       + SFR_column_str(seg_4a, ['NSTRPTS'], '  %5d', icalc == 4)
+                       + SFR_column_str(seg_4a, ['FLOW', 'RUNOFF', 'ETSW', 'PPTSW'], '  %8.3f  %8.3f  %8.3f  %8.3f', all_seg)
+                       + SFR_column_str(seg_4a, ['ROUGHCH'], '  %8.3f', (icalc == 1) | (icalc == 2))
+                       + SFR_column_str(seg_4a, ['ROUGHBK'], '  %8.3f', icalc == 2)
+                       + SFR_column_str(seg_4a, ['CDPTH', 'FDPTH', 'AWDTH', 'BWDTH'], '  %8.3f  %8.3f  %8.3f  %8.3f', icalc == 3)
+                       + '\n')
+            
+            # items 4b and 4c
+            items = [item_4a]
+            for i in range(2):   # start loop through 4b and 4c
+                if i == 0: 
+                    seg_4bc = segment_data_4B.iloc[:itmp]
+                else:
+                    seg_4bc = segment_data_4C.iloc[:itmp]
+                n = str(i+1)
+                item_4bc = np.empty(itmp, dtype=object)
+                item_4bc[:] = ''
                 
-                # write items 4b and 4c to the file
-                for i in range(2):   # start loop through 4a and 4b
-                    if i == 0: 
-                        dummy4bc = segment_data_4B.iloc[iitmp,:]
-                    else:
-                        dummy4bc = segment_data_4C.iloc[iitmp,:]                     
+                if any(isfropt == np.array([0, 4, 5])):
+                    rows = icalc <= 0
+                    item_4bc += SFR_column_str(seg_4bc, ['HCOND'+n, 'THICKM'+n, 'ELEVUPDN'+n, 'WIDTH'+n, 'DEPTH'+n], 
+                                               '      %8.3f  %8.3f  %8.3f  %8.3f  %8.3f', rows)
                     
-                    fl_no_4bc = 0
-                    if (any(isfropt == np.array([0, 4, 5])) and (dummy4a['ICALC'] <= 0)):
-                        fmt = '      %8.3f  %8.3f  %8.3f  %8.3f  %8.3f'
-                        fobj.write(fmt % (dummy4bc['HCOND'+str(i+1)], dummy4bc['THICKM'+str(i+1)], 
-                                                   dummy4bc['ELEVUPDN'+str(i+1)], dummy4bc['WIDTH'+str(i+1)], 
-                                                            dummy4bc['DEPTH'+str(i+1)]))
-                    elif (any(isfropt == np.array([0, 4, 5])) and (dummy4a['ICALC'] == 1)):
-                        if i == 0:
-                            fobj.write('    %8.3f' % (dummy4bc['HCOND'+str(i+1)]))
-                        
-                        if (iper+1 == 1):   # only for the first period
-                            fmt = '  %8.3f  %8.3f  %8.3f'
-                            fobj.write(fmt % (dummy4bc['THICKM'+str(i+1)], 
-                                                       dummy4bc['ELEVUPDN'+str(i+1)], dummy4bc['WIDTH'+str(i+1)]))
-                            
-                            if ((isfropt == 4) or (isfropt == 5)):
-                                fmt = '  %8.3f  %8.3f  %8.3f'
-                                fobj.write(fmt % (dummy4bc['THTS'+str(i+1)], 
-                                                           dummy4bc['THTI'+str(i+1)], dummy4bc['EPS'+str(i+1)]))
-                            
-                            if (isfropt == 5):
-                                fobj.write('  %8.3f' % (dummy4bc['UHC'+str(i+1)]))
-                            
-                        elif ((iper+1 > 1) and (isfropt == 0)):
-                            fmt = '  %8.3f  %8.3f  %8.3f'
-                            fobj.write(fmt % (dummy4bc['THICKM'+str(i+1)], 
-                                                       dummy4bc['ELEVUPDN'+str(i+1)], dummy4bc['WIDTH'+str(i+1)]))
-                        
-                    elif (any(isfropt == np.array([0, 4, 5])) and (dummy4a['ICALC'] >= 2)):
-                        fobj.write('    %8.3f' % (dummy4bc['HCOND'+str(i+1)]))
-                        
-                        if not (any(isfropt == np.array([4, 5])) and (iper+1 > 1) 
-                        and (dummy4a['ICALC'] == 2)):
-                            fobj.write('  %8.3f  %8.3f' % (dummy4bc['THICKM'+str(i+1)], dummy4bc['ELEVUPDN'+str(i+1)]))
-                            
-                        if (any(isfropt == np.array([4, 5])) and (iper+1 == 1) 
-                        and (dummy4a['ICALC'] == 2)):
-                                fmt = '  %8.3f  %8.3f  %8.3f'
-                                fobj.write(fmt % (dummy4bc['THTS'+str(i+1)], 
-                                                           dummy4bc['THTI'+str(i+1)], dummy4bc['EPS'+str(i+1)]))
-                                
-                                if (isfropt == 5):
-                                    fobj.write('  %8.3f' % (dummy4bc['UHC'+str(i+1)]))                        
-                    elif ((isfropt == 1) and (dummy4a['ICALC'] <= 1)):
-                        fobj.write('    %8.3f' % (dummy4bc['WIDTH'+str(i+1)]))
-                        
-                        if (icalc <= 0):
-                            fobj.write('  %8.3f' % (dummy4bc['DEPTH'+str(i+1)]))
-                        
-                    elif (any(isfropt == np.array([2, 3])) and (dummy4a['ICALC'] <= 1)):
-                        if (iper+1 == 1):
-                            fobj.write('    %8.3f' % (dummy4bc['WIDTH'+str(i+1)]))
-                            
-                            if (dummy4a['ICALC'] <= 0):
-                                fobj.write('  %8.3f' % (dummy4bc['DEPTH'+str(i+1)]))
+                    rows = icalc == 1
+                    if i == 0:
+                        item_4bc += SFR_column_str(seg_4bc, ['HCOND'+n], '    %8.3f', rows)
+                    if (iper+1 == 1):   # only for the first period
+                        item_4bc += SFR_column_str(seg_4bc, ['THICKM'+n, 'ELEVUPDN'+n, 'WIDTH'+n], '  %8.3f  %8.3f  %8.3f', rows)
+                        if ((isfropt == 4) or (isfropt == 5)):
+                            item_4bc += SFR_column_str(seg_4bc, ['THTS'+n, 'THTI'+n, 'EPS'+n], '  %8.3f  %8.3f  %8.3f', rows)
+                        if (isfropt == 5):
+                            item_4bc += SFR_column_str(seg_4bc, ['UHC'+n], '  %8.3f', rows)
+                    elif ((iper+1 > 1) and (isfropt == 0)):
+                        item_4bc += SFR_column_str(seg_4bc, ['THICKM'+n, 'ELEVUPDN'+n, 'WIDTH'+n], '  %8.3f  %8.3f  %8.3f', rows)
+                    
+                    rows = icalc >= 2
+                    item_4bc += SFR_column_str(seg_4bc, ['HCOND'+n], '    %8.3f', rows)
+                    if (any(isfropt == np.array([4, 5])) and (iper+1 > 1)):
+                        item_4bc += SFR_column_str(seg_4bc, ['THICKM'+n, 'ELEVUPDN'+n], '  %8.3f  %8.3f', rows & (icalc != 2))
                     else:
-                        fl_no_4bc = 1
-                    if fl_no_4bc == 0:
-                        fobj.write('\n')
+                        item_4bc += SFR_column_str(seg_4bc, ['THICKM'+n, 'ELEVUPDN'+n], '  %8.3f  %8.3f', rows)
+                    if (any(isfropt == np.array([4, 5])) and (iper+1 == 1)):
+                        item_4bc += SFR_column_str(seg_4bc, ['THTS'+n, 'THTI'+n, 'EPS'+n], '  %8.3f  %8.3f  %8.3f', rows & (icalc == 2))
+                        if (isfropt == 5):
+                            item_4bc += SFR_column_str(seg_4bc, ['UHC'+n], '  %8.3f', rows & (icalc == 2))
+                    written = all_seg
+                elif (isfropt == 1):
+                    written = icalc <= 1
+                    item_4bc += SFR_column_str(seg_4bc, ['WIDTH'+n], '    %8.3f', written)
+                    item_4bc += SFR_column_str(seg_4bc, ['DEPTH'+n], '  %8.3f', icalc <= 0)
+                elif any(isfropt == np.array([2, 3])):
+                    written = icalc <= 1
+                    if (iper+1 == 1):
+                        item_4bc += SFR_column_str(seg_4bc, ['WIDTH'+n], '    %8.3f', written)
+                        item_4bc += SFR_column_str(seg_4bc, ['DEPTH'+n], '  %8.3f', icalc <= 0)
+                else:
+                    written = ~all_seg
+                item_4bc += SFR_column_str(seg_4bc, [], '\n', written)
+                items.append(item_4bc)
+            
+            # 4a, 4b, 4c of segment 1, then of segment 2, ...
+            fobj.write(''.join(items[0] + items[1] + items[2]))
    
     fobj.close()
     
@@ -1351,21 +1271,7 @@ def make_sfr2_f_Mannings(GSFLOW_indir, infile_pre, reach_fil, dis_fil, segment_f
     
 #%%
 
-def MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment):
-    if data_type == 'INT':
-        CNSTNT0 = str(int(CNSTNT))
-        fmt0 = '%7d'
-    elif data_type == 'REAL':
-        CNSTNT0 = str(float(CNSTNT))
-        fmt0 = '%7e'
-    if np.array(data).size == 1:
-        str0 = 'CONSTANT     ' + fmt0 + ' %s \n'
-        fobj.write(str0 % (data, comment))
-    else:
-        fobj.write('INTERNAL  %10s%20s%10s %s \n' % (CNSTNT0, '(FREE)', '-1', comment))
-        np.savetxt(fobj, data, delimiter=' ', fmt=fmt0)
-
-def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil):
+def make_uzf3_f_2(model, dischargept_fil):
 
 #    print 'UZF: Had to play around alot with finf (infiltration) to get convergence!!'
 
@@ -1403,22 +1309,21 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
     
     # - write to this file
     # GSFLOW_indir = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/GSFLOW/inputs/MODFLOW/';
+    GSFLOW_indir = model.GSFLOW_indir
+    infile_pre = model.infile_pre
     uz_file = infile_pre + '.uzf'
     
-    # surfz_fil = '/home/gcng/workspace/ProjectFiles/AndesWaterResources/Data/GIS/topo.asc';
-    sdata = read_grid_file_header(surfz_fil)
-        
-    NSEW = [sdata['north'], sdata['south'], sdata['east'], sdata['west']]
-    NROW = sdata['rows'] 
-    NCOL = sdata['cols']
+    NROW = model.NROW
+    NCOL = model.NCOL
     
-    # - set TOP to surface elevation [m]
-    TOP = np.genfromtxt(surfz_fil, skip_header=6, delimiter=' ', dtype=float)
+    # - set TOP to surface elevation [m] (copy: masked below)
+    TOP = model.TOP.copy()
     
-    IBOUND = np.genfromtxt(ba6_fil, skip_header=3, max_rows=NROW, dtype=float)
+    # (from write_ba6_MOD3_2)
+    IBOUND = model.active()
 
     
-    NPER = 2
+    NPER = model.NPER
     # **** ASSUMES PER 1 IS SS, PER 2 IS TR ****
     
     #Item 1:
@@ -1448,10 +1353,11 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
         quit()        
 #        irunbnd = importdata('./data/irunbnd.dat'); # [NROW,NCOL] only for IRUNFLG>0, stream seg to which gw discharge is routed
     # vks = importdata('./data/vks.dat'); # [NROW,NCOL] saturated K, no needed if using value in LPF (IUZFOPT=2), [m/d]
-    vks = np.copy(iuzfbnd) * 4.
+    # (uniform: only used where iuzfbnd > 0, written as CONSTANT)
+    vks = lazy_field(4., (NROW,NCOL))
     # Ok to have following parameters as SCALAR (constant for all gridcells) or as ARRAY (NROWxNCOL)
     eps = 3.5  #Brooks-Corey epsilon of the unsaturated zone.
-    thts = np.copy(iuzfbnd) * 0.35    #Saturated water content of the unsaturated zone
+    thts = lazy_field(0.35, (NROW,NCOL))    #Saturated water content of the unsaturated zone
 #    eps = 4  #Brooks-Corey epsilon of the unsaturated zone.
 #    thts = np.copy(iuzfbnd) * 0.18    #Saturated water content of the unsaturated zone
     if NUZGAG > 0:
@@ -1518,15 +1424,12 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
 #    finf[:] = 8.8e-4    
 
 #    finf = np.ones((NROW,NCOL))
-    finf = np.copy(iuzfbnd)
     
     try:
        float(Settings.finf0)
-       finf = float(Settings.finf0) * finf
+       finf = lazy_field(float(Settings.finf0), (NROW,NCOL)) # (only used where iuzfbnd > 0)
     except ValueError:
-       for ii in range(NLAY):
-            finf[:,:,ii] = np.genfromtxt(Settings.finf0, skip_header=1+ii*(NROW+1), \
-            max_rows=NROW, dtype=float)
+       finf = read_layered_arrays(Settings.finf0, NROW, NCOL, 1)[:,:,0]
     
     
     # # testing: 
@@ -1558,7 +1461,7 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
     if IETFLG>0:
         NUZF2 = -1*ones((NPER,1)) # use ET from below soil-zone
         NUZF3 = np.array([[1], -1*np.ones((NPER-1,1))]) # only specify extdp for first stress periods
-        extdp = 15.0*np.ones((NROW,NCOL))   #array of ET extiction zone~altitude of the soil-zone base;specified at least for 1st stress period; only for IETFLG>0
+        extdp = lazy_field(15.0, (NROW,NCOL))   #array of ET extiction zone~altitude of the soil-zone base;specified at least for 1st stress period; only for IETFLG>0
         NUZF4 = np.array([[1], -1*np.ones((NPER-1,1))]) # only specify extwc for first stress periods
 #        extwc = thts*0.9*np.ones((NROW,NCOL)) #array of Extinction water content; EXTWC must be between (THTS-Sy) and THTS; only for IETFLG>0 and 
         extwc = thts*0.9 #array of Extinction water content; EXTWC must be between (THTS-Sy) and THTS; only for IETFLG>0 and 
@@ -1583,8 +1486,8 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
     comment = '     NUZTOP  IUZFOPT  IRUNFLG  IETFLG  IUZFCB1  IUZFCB2  NTRAIL2  NSETS2  NUZGAG  SURFDEP\n'
     fobj.write(comment)
 
-    # Generally use these settings
-    LOCAT = 'INTERNAL'
+    # Generally use these settings (arrays INTERNAL or OPEN/CLOSE binary
+    # files, from model.array_location)
     CNSTNT = 1
     IPRN = -1
     
@@ -1596,32 +1499,37 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
     comment = '#IUZFBND--AREAL EXTENT OF THE ACTIVE MODEL'
     data = iuzfbnd
     data_type = 'INT'
-    MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment)
+    LOCAT, FMTIN, ext_fil = model.array_location('uzf_IUZFBND')
+    MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment, FMTIN=FMTIN, ext_fil=ext_fil)
         
     # write item 3 [IRUNBND (NCOL, NROW)] - U2DINT
     if (IRUNFLG > 0):
         comment = '#IRUNBND--STREAM SEGMENTS OR LAKE NUMBERS'
         data = irunbnd
         data_type = 'INT'
-        MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment)
+        LOCAT, FMTIN, ext_fil = model.array_location('uzf_IRUNBND')
+        MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment, FMTIN=FMTIN, ext_fil=ext_fil)
     
     # write item 4 [VKS (NCOL, NROW)] - U2DREL
     if (IUZFOPT == 1):
         comment = '#VKS--VERTICAL HYDRAULIC CONDUCTIVITY OF THE UNSATURATED ZONE'
         data = vks
         data_type = 'REAL'
-        MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment)
+        LOCAT, FMTIN, ext_fil = model.array_location('uzf_VKS')
+        MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment, FMTIN=FMTIN, ext_fil=ext_fil)
     
     # write items 5, 6, 7
     comment = '#EPS--BROOKS/COREY EPSILON'
     data = eps
     data_type = 'REAL'
-    MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment)
+    LOCAT, FMTIN, ext_fil = model.array_location('uzf_EPS')
+    MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment, FMTIN=FMTIN, ext_fil=ext_fil)
     
     comment = '#THTS--SATURATED WATER CONTENT'
     data = thts
     data_type = 'REAL'
-    MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment)
+    LOCAT, FMTIN, ext_fil = model.array_location('uzf_THTS')
+    MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment, FMTIN=FMTIN, ext_fil=ext_fil)
     
 #    comment = '#THTI--INITIAL WATER CONTENT'
 #    data = thti
@@ -1649,7 +1557,8 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
             comment = '#FINF--STRESS PERIOD ' + str(int(iper+1))
             data = finf
             data_type = 'REAL'
-            MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment)    
+            LOCAT, FMTIN, ext_fil = model.array_location('uzf_FINF_%d' % (iper+1))
+            MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment, FMTIN=FMTIN, ext_fil=ext_fil)
         
         # ---------------------------------------------------------------------
         
@@ -1674,7 +1583,8 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
                 comment = '#EXTDP FOR STRESS PERIOD ' + str(int(iper+1))
                 data = extdp
                 data_type = 'REAL'
-                MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment)    
+                LOCAT, FMTIN, ext_fil = model.array_location('uzf_EXTDP_%d' % (iper+1))
+                MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment, FMTIN=FMTIN, ext_fil=ext_fil)
             
             # -----------------------------------------------------------------
             
@@ -1688,7 +1598,8 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
                 comment = '#EXTWC FOR STRESS PERIOD ' + str(int(iper+1))
                 data = extwc
                 data_type = 'REAL'
-                MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment)    
+                LOCAT, FMTIN, ext_fil = model.array_location('uzf_EXTWC_%d' % (iper+1))
+                MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment, FMTIN=FMTIN, ext_fil=ext_fil)
     
     fobj.close()
     
@@ -1698,7 +1609,7 @@ def make_uzf3_f_2(GSFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil)
 # Based on Leila's script NWT_write.m
 # Adapted into function
 
-def NWT_write_file(GSFLOW_indir, infile_pre):
+def NWT_write_file(model):
 
 # -------------------------------------------------------------------------
 # input variables
@@ -1760,7 +1671,7 @@ def NWT_write_file(GSFLOW_indir, infile_pre):
     hclosexmd = 1e-4;
     mxiterxmd = 50;
     
-    nwt_file_0 = GSFLOW_indir + slashstr + infile_pre + '.nwt'
+    nwt_file_0 = model.GSFLOW_indir + slashstr + model.infile_pre + '.nwt'
     
     headings = ['NWT Input File', 'Test Problem 3 for MODFLOW-NWT']
     
@@ -1805,22 +1716,6 @@ def NWT_write_file(GSFLOW_indir, infile_pre):
 
 
 
-# function for parsing ASCII grid header in GIS data files
-def read_grid_file_header(fname):
-    f = open(fname, 'r')
-    sdata = {}
-    for i in range(6):
-        line = f.readline()
-        line = line.rstrip() # remove newline characters
-        key, value = line.split(': ')
-        try:
-          value = int(value)
-        except:
-          value = float(value)
-        sdata[key] = value
-    f.close()
-
-    return sdata
     # -------------------------------------------------------------------------
     # End of the script
 
@@ -1873,24 +1768,29 @@ segment_fil_all = [GIS_indir + 'segments_4A_INFORMATION.txt',
 
 
 ## 
-dis_fil = write_dis_MOD2_f(MODFLOW_indir, infile_pre, surfz_fil, NLAY, DZ, perlen_tr);
-ba6_fil = write_ba6_MOD3_2(MODFLOW_indir, infile_pre, mask_fil, dischargept_fil, dis_fil); # list this below write_dis_MOD2_f
+# grid, layers and stress periods, shared by all package writers
+model = ModflowModel.from_DEM(MODFLOW_indir, infile_pre, surfz_fil, NLAY, DZ, perlen_tr)
+model.array_format = Settings.MODFLOW_array_format
+model.GSFLOW_indir_rel = MODFLOW_indir_rel
+
+dis_fil = write_dis_MOD2_f(model);
+ba6_fil = write_ba6_MOD3_2(model, mask_fil, dischargept_fil); # sets model.IBOUND
 
 # flow algorithm
 if sw_2005_NWT == 1:
-    lpf_fil = write_lpf_MOD2_f2_2(MODFLOW_indir, infile_pre, surfz_fil, NLAY);
+    lpf_fil = write_lpf_MOD2_f2_2(model);
 elif sw_2005_NWT == 2:
     # MODFLOW-NWT files
-    upw_fil = write_upw_MOD2_f2_2(MODFLOW_indir, infile_pre, surfz_fil, NLAY);
-    nwt_fil = NWT_write_file(MODFLOW_indir, infile_pre);
+    upw_fil = write_upw_MOD2_f2_2(model);
+    nwt_fil = NWT_write_file(model);
 
 # unsat zone and streamflow input files
-uzf_fil = make_uzf3_f_2(MODFLOW_indir, infile_pre, surfz_fil, dischargept_fil, ba6_fil); # list this below write_ba6_MOD3_2
-sfr_fil = make_sfr2_f_Mannings(MODFLOW_indir, infile_pre, reach_fil, dis_fil, segment_fil_all, Settings.GSFLOW_ver); # list this below write_dis_MOD2_f
+uzf_fil = make_uzf3_f_2(model, dischargept_fil); # list this below write_ba6_MOD3_2
+sfr_fil = make_sfr2_f_Mannings(model, reach_fil, segment_fil_all, Settings.GSFLOW_ver);
 
 # Write PCG file (only used for MODFLOW-2005, but this function also creates OC file)
-write_OC_PCG_MOD_f(MODFLOW_indir, infile_pre, perlen_tr);
+write_OC_PCG_MOD_f(model);
 
 # Write namefile
-nam_fil = write_nam_MOD_f2_NWT(MODFLOW_indir, MODFLOW_indir_rel, MODFLOW_outdir_rel, infile_pre, fil_res_in, sw_2005_NWT);
+nam_fil = write_nam_MOD_f2_NWT(model, MODFLOW_indir_rel, MODFLOW_outdir_rel, fil_res_in, sw_2005_NWT);
 
@@ -24,6 +24,8 @@ sys.path.append('..' + slashstr + 'Run')
 
 # Read in user-specified settings
 from readSettings import Settings
+import HRUcellMatrix
+from readASCIIgrid import read_grid_file_header
 # Set input file
 if len(sys.argv) < 2:
     settings_input_file = 'settings.ini'
@@ -34,24 +36,15 @@ else:
 Settings = Settings(settings_input_file)
 
 
-# From MODFLOWLib
-
-# function for parsing ASCII grid header in GIS data files
-def read_grid_file_header(fname):
-    f = open(fname, 'r')
-    sdata = {}
-    for i in range(6):
-        line = f.readline()
-        line = line.rstrip() # remove newline characters
-        key, value = line.split(': ')
-        try:
-          value = int(value)
-        except:
-          value = float(value)
-        sdata[key] = value
-    f.close()
-
-    return sdata
+# area fraction of each HRU in each class of a categorical parameter
+# (columns <par>_frac_<class> from v.gsflow.hruparams, for the classes that
+# occur): returns {class: [nhru] fractions}, empty if not in the HRU file
+def read_class_fractions(HRUdata, par):
+    fractions = {}
+    for col in HRUdata.columns:
+        if col.startswith(par + '_frac_'):
+            fractions[int(col.split('_')[-1])] = np.array(HRUdata[col], float)
+    return fractions
 
 
 # note on order of parameter values when there are 2 dimensions: 
@@ -119,8 +112,18 @@ HRUdata = pd.read_csv(HRUfil)
 reachdata = pd.read_csv(reachfil)
 gvrdata = pd.read_csv(gvrfil)
 
+# area fractions of the land cover classes in each HRU (for covden_sum and
+# covden_win)
+cov_type_frac = read_class_fractions(HRUdata, 'cov_type')
+
 griddata = read_grid_file_header(GISgridfil)
 
+# sparse HRU <-> MODFLOW cell area matrix, for moving fields between PRMS and
+# MODFLOW space in post-processing (HRUcellMatrix.load)
+HRUcellfil = Settings.GISinput_dir + slashstr + 'HRU_cell_matrix.npz'
+HRUcellMatrix.from_gvr_table(gvrdata, HRUdata['hru_area'], griddata['rows'],
+                             griddata['cols']).save(HRUcellfil)
+
 
 # 2 lines available for comments
 title_str1 = Settings.PROJ_CODE
@@ -511,14 +514,20 @@ par_name.append('covden_sum') # summer veg cover density [0.0 to 1.0] (for canop
 par_dim_name.append('nhru')
 par_type.append(2) # 1=int, 2=single prec, 3=double prec, 4=char str
 ind = np.squeeze(np.where(np.array(dim_name) == par_dim_name[-1]))
-par_value.append(0.8*np.ones((dim_value[ind],1)))  
+# 0.8 over the vegetated part of each HRU: bare soil (cov_type 0) area
+# fraction from the HRU file, if given
+covden = 0.8*np.ones((dim_value[ind],1))
+if 0 in cov_type_frac:
+    bare_frac = np.nan_to_num(cov_type_frac[0]).reshape(-1,1)
+    covden = covden * (1. - bare_frac)
+par_value.append(covden)  
 
 # *** CHANGE FOR SPECIFIC SITE
 par_name.append('covden_win') # winter veg cover density
 par_dim_name.append('nhru')
 par_type.append(2) # 1=int, 2=single prec, 3=double prec, 4=char str
 ind = np.squeeze(np.where(np.array(dim_name) == par_dim_name[-1]))
-par_value.append(0.8*np.ones((dim_value[ind],1)))  
+par_value.append(covden.copy())  
 
 par_name.append('snow_intcp') # snow interception storage capacity
 par_dim_name.append('nhru')
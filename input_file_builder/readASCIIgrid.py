@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Reads the ASCII grids of the GIS input directory (DEM.asc, basin_mask.asc)
+
+Both header styles are accepted: GRASS r.out.ascii ("north: 4000", ...,
+"rows: 50", "cols: 50") and ESRI ("ncols 50", "nrows 50", "xllcorner 0",
+"yllcorner 0", "cellsize 100", "NODATA_value -9999"). ESRI headers are
+also given the GRASS keys (north, south, east, west, rows, cols), so callers
+can use those for either style.
+
+The values are parsed in one pass with numpy's C tokenizer and kept in a
+process-level cache keyed by file path, size and modification time, so each
+grid is parsed once per run however many writers use it. Callers get their
+own copy of the cached array.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+# path -> (stamp, header, number of header lines, values)
+_cache = {}
+
+# optional GRASS header keys after rows and cols
+_GRASS_TAIL_KEYS = ['null', 'type', 'multiplier']
+
+
+def _is_number(s):
+    try:
+        float(s)
+    except ValueError:
+        return False
+    return True
+
+def _value(s):
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+def _add_grass_keys(sdata):
+    """
+    north, south, east, west, rows, cols from an ESRI header
+    """
+    if 'ncols' not in sdata or 'nrows' not in sdata:
+        return sdata
+    sdata['cols'] = sdata['ncols']
+    sdata['rows'] = sdata['nrows']
+    dx = sdata.get('dx', sdata.get('cellsize'))
+    dy = sdata.get('dy', sdata.get('cellsize'))
+    if 'xllcorner' in sdata:
+        sdata['west'] = sdata['xllcorner']
+    elif 'xllcenter' in sdata:
+        sdata['west'] = sdata['xllcenter'] - dx / 2.
+    if 'yllcorner' in sdata:
+        sdata['south'] = sdata['yllcorner']
+    elif 'yllcenter' in sdata:
+        sdata['south'] = sdata['yllcenter'] - dy / 2.
+    if 'west' in sdata:
+        sdata['east'] = sdata['west'] + dx * sdata['ncols']
+    if 'south' in sdata:
+        sdata['north'] = sdata['south'] + dy * sdata['nrows']
+    return sdata
+
+def _read_header(f):
+    """
+    Header of an open grid file; returns (header, number of header lines)
+    """
+    sdata = {}
+    nheader = 0
+    while True:
+        pos = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        line = line.strip()
+        if line == '':
+            nheader += 1
+            continue
+        first = line.split(None, 1)[0]
+        if _is_number(first) or first.startswith('*'):
+            # first row of values (which may start with a '*' null)
+            f.seek(pos)
+            break
+        if ':' in line:
+            key, value = line.split(':', 1)
+        else:
+            parts = line.split(None, 1)
+            if len(parts) < 2:
+                f.seek(pos)
+                break
+            key, value = parts
+        key = key.strip()
+        if 'rows' in sdata and 'cols' in sdata \
+           and key not in _GRASS_TAIL_KEYS:
+            # GRASS header ends after rows and cols
+            f.seek(pos)
+            break
+        if key.lower() in ['ncols', 'nrows', 'xllcorner', 'yllcorner',
+                           'xllcenter', 'yllcenter', 'cellsize', 'dx', 'dy',
+                           'nodata_value']:
+            key = key.lower()
+        value = value.strip()
+        sdata[key] = _value(value) if _is_number(value) else value
+        nheader += 1
+    return _add_grass_keys(sdata), nheader
+
+def _stamp(fname):
+    st = os.stat(fname)
+    return (st.st_size, st.st_mtime)
+
+def _parse(fname):
+    f = open(fname, 'r')
+    try:
+        sdata, nheader = _read_header(f)
+        text = f.read()
+    finally:
+        f.close()
+    nrow = sdata['rows']
+    ncol = sdata['cols']
+    try:
+        values = np.fromstring(text, dtype=float, sep=' ')
+    except ValueError:
+        values = np.zeros(0)
+    if values.size != nrow * ncol:
+        # non-numeric tokens (e.g., GRASS '*' nulls) stop np.fromstring;
+        # those are read as NaN by the pandas C parser
+        values = pd.read_csv(fname, skiprows=nheader, header=None,
+                             sep=r'\s+', engine='c',
+                             na_values=['*']).values
+    if values.size != nrow * ncol:
+        raise ValueError(fname + ': ' + str(values.size) + ' values for a '
+                         + str(nrow) + ' x ' + str(ncol) + ' grid')
+    return sdata, nheader, values.reshape(nrow, ncol).astype(float)
+
+def _cached(fname):
+    path = os.path.abspath(fname)
+    stamp = _stamp(path)
+    entry = _cache.get(path)
+    if entry is None or entry[0] != stamp:
+        entry = (stamp,) + _parse(path)
+        _cache[path] = entry
+    return entry
+
+def read_grid_file_header(fname):
+    """
+    Header of an ASCII grid file as a dict (e.g., sdata['rows'])
+    """
+    path = os.path.abspath(fname)
+    entry = _cache.get(path)
+    if entry is not None and entry[0] == _stamp(path):
+        return dict(entry[1])
+    f = open(fname, 'r')
+    try:
+        sdata, _nheader = _read_header(f)
+    finally:
+        f.close()
+    return sdata
+
+def read_grid(fname):
+    """
+    Values of an ASCII grid file, [rows x cols] float array
+    """
+    return _cached(fname)[3].copy()
+
+def read_grid_file(fname):
+    """
+    (header, values) of an ASCII grid file
+    """
+    entry = _cached(fname)
+    return dict(entry[1]), entry[3].copy()
+
+def clear_cache():
+    _cache.clear()
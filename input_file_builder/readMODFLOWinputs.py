@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Readers for the MODFLOW input files written by printMODFLOWInputs.py:
+discretization (.dis), basic (.ba6) and flow (.upw, .lpf) packages
+
+Each file is read into memory once and walked record by record; the values
+of each INTERNAL free-format array are parsed with one np.fromstring call.
+Arrays may also be given as CONSTANT records, in fixed Fortran formats, or
+in OPEN/CLOSE text or binary files (as written by writeMODFLOWarrays.py).
+Layered arrays are returned as [NROW x NCOL x NLAY], as used by the
+package writers.
+"""
+
+import os
+import re
+import numpy as np
+
+
+def fortran_format(FMTIN):
+    """
+    (values per line, field width, printf format) of a fixed Fortran array
+    format such as '(10E15.6)', '(20I4)' or '(8G12.5)'
+    """
+    m = re.match(r'^\(\s*(\d*)\s*(I|F|E|ES|EN|G)(\d+)(?:\.(\d+))?\s*\)$',
+                 FMTIN.strip().upper())
+    if m is None:
+        raise ValueError('array format ' + FMTIN + ' not supported')
+    nper_line = int(m.group(1)) if m.group(1) else 1
+    kind = m.group(2)
+    width = int(m.group(3))
+    ndec = int(m.group(4)) if m.group(4) else 0
+    if kind == 'I':
+        fmt = '%' + str(width) + 'd'
+    elif kind == 'F':
+        fmt = '%' + str(width) + '.' + str(ndec) + 'f'
+    elif kind == 'G':
+        fmt = '%' + str(width) + '.' + str(ndec) + 'G'
+    else:
+        fmt = '%' + str(width) + '.' + str(ndec) + 'E'
+    return nper_line, width, fmt
+
+def binary_header_dtype(prec):
+    """
+    Header record of a MODFLOW binary array (prec: bytes per real)
+    """
+    real = '<f%d' % prec
+    return np.dtype([('kstp', '<i4'), ('kper', '<i4'), ('pertim', real),
+                     ('totim', real), ('text', 'S16'), ('ncol', '<i4'),
+                     ('nrow', '<i4'), ('ilay', '<i4')])
+
+def read_binary_array(fname, shape, dtype=float):
+    """
+    nrow x ncol array from a MODFLOW binary array file: single or double
+    precision, with or without Fortran record markers (detected from the
+    file size)
+    """
+    nrow, ncol = shape
+    n = nrow * ncol
+    filesize = os.path.getsize(fname)
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        candidates = [(4, '<i4'), (8, '<i4')] # U2DINT
+    else:
+        candidates = [(4, '<f4'), (8, '<f8')] # U2DREL
+    for prec, vdtype in candidates:
+        hdr_dtype = binary_header_dtype(prec)
+        nbytes = hdr_dtype.itemsize + n * np.dtype(vdtype).itemsize
+        for nmarker in [0, 4]:
+            if nbytes + 4 * nmarker != filesize:
+                continue
+            f = open(fname, 'rb')
+            f.seek(nmarker)
+            hdr = np.fromfile(f, dtype=hdr_dtype, count=1)
+            f.seek(2 * nmarker, 1)
+            values = np.fromfile(f, dtype=vdtype, count=n)
+            f.close()
+            if hdr['ncol'][0] == ncol and hdr['nrow'][0] == nrow:
+                return values.reshape(nrow, ncol).astype(dtype)
+    raise ValueError(fname + ': not a ' + str(nrow) + ' x ' + str(ncol) +
+                     ' MODFLOW binary array')
+
+
+class PackageReader(object):
+    """
+    Walks the records of a MODFLOW free-format input file
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        f = open(fname, 'r')
+        self.lines = f.read().splitlines()
+        f.close()
+        self.pos = 0
+        # item 0: comment lines
+        self.comments = []
+        while self.pos < len(self.lines) and \
+              self.lines[self.pos].lstrip().startswith('#'):
+            self.comments.append(self.lines[self.pos])
+            self.pos += 1
+
+    def _error(self, msg):
+        return ValueError(self.fname + ', line ' + str(self.pos + 1) + ': '
+                          + msg)
+
+    def line(self):
+        """
+        Tokens of the next line
+        """
+        if self.pos >= len(self.lines):
+            raise self._error('unexpected end of file')
+        tokens = self.lines[self.pos].split()
+        self.pos += 1
+        return tokens
+
+    def record(self, n, dtype=float):
+        """
+        The first n values of the next line(s); the rest of the last line
+        (e.g., a label) is ignored
+        """
+        out = []
+        while len(out) < n:
+            for v in self.line()[:n-len(out)]:
+                try:
+                    out.append(float(v))
+                except ValueError:
+                    raise self._error('expected ' + str(n) + ' values')
+        return np.array(out).astype(dtype)
+
+    def values(self, n, dtype=float):
+        """
+        The next n values (one or more lines per array row)
+        """
+        # fast path: rows written one per line
+        nrow = n
+        if n > 1:
+            ntok = len(self.lines[self.pos].split()) if \
+                   self.pos < len(self.lines) else 0
+            nrow = max(1, n // max(1, ntok))
+        try:
+            out = np.fromstring(' '.join(self.lines[self.pos:self.pos+nrow]),
+                                dtype=float, sep=' ')
+        except ValueError:
+            out = np.zeros(0)
+        if out.size == n:
+            self.pos += nrow
+            return out.astype(dtype)
+        # any other line layout
+        out = []
+        while len(out) < n:
+            try:
+                out += [float(v) for v in self.line()]
+            except ValueError:
+                raise self._error('expected ' + str(n) + ' values')
+        if len(out) != n:
+            raise self._error('expected ' + str(n) + ' values')
+        return np.array(out).astype(dtype)
+
+    def fixed_values(self, nrow, ncol, nper_line, width):
+        """
+        nrow x ncol values in a fixed Fortran format: nper_line fields of
+        width characters per line, each row starting on a new line
+        """
+        nline = -(-ncol // nper_line) # lines per row
+        if self.pos + nrow * nline > len(self.lines):
+            raise self._error('unexpected end of file')
+        reclen = nper_line * width
+        text = ''.join([l.ljust(reclen)[:reclen] for l in
+                        self.lines[self.pos:self.pos + nrow * nline]])
+        self.pos += nrow * nline
+        if not isinstance(text, bytes):
+            text = text.encode('ascii')
+        fields = np.char.strip(np.frombuffer(text, dtype='S%d' % width))
+        fields = np.char.replace(np.char.upper(fields), b'D', b'E')
+        fields[fields == b''] = b'0' # blank fields read as 0
+        try:
+            out = fields.astype(float)
+        except ValueError:
+            raise self._error('unreadable value in fixed-format array')
+        return out.reshape(nrow, nline * nper_line)[:, :ncol]
+
+    def external_file(self, fname):
+        """
+        OPEN/CLOSE file: as given (relative to where MODFLOW runs, taken as
+        the working directory), or else next to this package file
+        """
+        if os.path.exists(fname):
+            return fname
+        alt = os.path.join(os.path.dirname(os.path.abspath(self.fname)),
+                           os.path.basename(fname.replace('\\', '/')))
+        if os.path.exists(alt):
+            return alt
+        raise self._error('array file ' + fname + ' not found')
+
+    def array(self, shape, dtype=float):
+        """
+        Array (U1DREL, U2DREL, U2DINT) from its control record and values:
+        CONSTANT, INTERNAL or OPEN/CLOSE, in free, fixed or binary format
+        """
+        tokens = self.line()
+        if len(tokens) == 0:
+            raise self._error('missing array control record')
+        n = int(np.prod(shape))
+        nrow, ncol = (1, shape[0]) if len(shape) == 1 else shape
+        locat = tokens[0].upper()
+        if locat == 'CONSTANT':
+            return (np.ones(shape) * float(tokens[1])).astype(dtype)
+        if locat == 'INTERNAL':
+            reader = self
+        elif locat == 'OPEN/CLOSE':
+            ext_fil = self.external_file(tokens[1])
+            tokens = tokens[1:]
+        else:
+            raise self._error('array control record ' + tokens[0] +
+                              ' not supported')
+        cnstnt = float(tokens[1])
+        fmtin = tokens[2].upper() if len(tokens) > 2 else '(FREE)'
+        if fmtin == '(BINARY)':
+            if locat != 'OPEN/CLOSE':
+                raise self._error('INTERNAL (BINARY) arrays not supported')
+            out = read_binary_array(ext_fil, (nrow, ncol), dtype)
+        else:
+            if locat == 'OPEN/CLOSE':
+                reader = PackageReader(ext_fil)
+            if fmtin == '(FREE)':
+                out = reader.values(n)
+            else:
+                nper_line, width, _fmt = fortran_format(fmtin)
+                out = reader.fixed_values(nrow, ncol, nper_line, width)
+        out = np.asarray(out, dtype=float).reshape(shape)
+        if cnstnt != 0:
+            out = out * cnstnt
+        return out.astype(dtype)
+
+    def layers(self, nrow, ncol, nlay, dtype=float):
+        out = np.zeros((nrow, ncol, nlay), dtype=dtype)
+        for ilay in range(nlay):
+            out[:,:,ilay] = self.array((nrow, ncol), dtype)
+        return out
+
+
+class DisFile(object):
+    """
+    Discretization package: NLAY, NROW, NCOL, NPER, ITMUNI, LENUNI, LAYCBD,
+    DELR [NCOL], DELC [NROW], TOP [NROW x NCOL], BOTM [NROW x NCOL x NLAY],
+    and PERLEN, NSTP, TSMULT, SsTr for each stress period
+    """
+
+    def __init__(self, fname):
+        r = PackageReader(fname)
+        line = r.line()
+        self.NLAY, self.NROW, self.NCOL, self.NPER, self.ITMUNI, \
+            self.LENUNI = [int(v) for v in line[:6]]
+        self.LAYCBD = r.record(self.NLAY, int)
+        self.DELR = r.array((self.NCOL,))
+        self.DELC = r.array((self.NROW,))
+        self.TOP = r.array((self.NROW, self.NCOL))
+        self.BOTM = np.zeros((self.NROW, self.NCOL, self.NLAY))
+        for ilay in range(self.NLAY):
+            self.BOTM[:,:,ilay] = r.array((self.NROW, self.NCOL))
+            if self.LAYCBD[ilay] != 0:
+                # bottom of the confining bed below the layer: not used
+                r.array((self.NROW, self.NCOL))
+        self.PERLEN = []
+        self.NSTP = []
+        self.TSMULT = []
+        self.SsTr = []
+        for iper in range(self.NPER):
+            line = r.line()
+            self.PERLEN.append(float(line[0]))
+            self.NSTP.append(int(line[1]))
+            self.TSMULT.append(float(line[2]))
+            self.SsTr.append(line[3].upper())
+
+    @property
+    def transient(self):
+        return 'TR' in self.SsTr
+
+
+class Ba6File(object):
+    """
+    Basic package: options, IBOUND [NROW x NCOL x NLAY], HNOFLO and the
+    initial heads STRT [NROW x NCOL x NLAY]
+    """
+
+    def __init__(self, fname, dis):
+        r = PackageReader(fname)
+        self.options = [v.upper() for v in r.line()]
+        self.IBOUND = r.layers(dis.NROW, dis.NCOL, dis.NLAY, int)
+        self.HNOFLO = float(r.line()[0])
+        self.STRT = r.layers(dis.NROW, dis.NCOL, dis.NLAY)
+
+
+class FlowFile(object):
+    """
+    Upstream-weighting (upw=True) or layer-property flow package: layer
+    flags (LAYTYP, LAYAVE, CHANI, LAYVKA, LAYWET) and the layer arrays HK,
+    VKA, SS and SY [NROW x NCOL x NLAY] (SS, SY 0 where not given: steady
+    state only, and SY in confined layers), HANI and WETDRY where given
+    """
+
+    def __init__(self, fname, dis, upw=True):
+        nrow, ncol, nlay = dis.NROW, dis.NCOL, dis.NLAY
+        r = PackageReader(fname)
+        line = r.line()
+        self.ILPFCB = int(line[0])
+        self.HDRY = float(line[1])
+        self.NPLPF = int(line[2])
+        if self.NPLPF != 0:
+            raise ValueError(fname + ': parameters (NPLPF > 0) not supported')
+        self.IPHDRY = int(line[3]) if upw and len(line) > 3 and \
+                      _is_int(line[3]) else 0
+        self.LAYTYP = r.record(nlay, int)
+        self.LAYAVE = r.record(nlay, int)
+        self.CHANI = r.record(nlay)
+        self.LAYVKA = r.record(nlay, int)
+        self.LAYWET = r.record(nlay, int)
+        if not upw and np.any(self.LAYWET != 0):
+            line = r.line()
+            self.WETFCT = float(line[0])
+            self.IWETIT = int(line[1])
+            self.IHDWET = int(line[2])
+        shape = (nrow, ncol, nlay)
+        self.HK = np.zeros(shape)
+        self.HANI = np.ones(shape)
+        self.VKA = np.zeros(shape)
+        self.SS = np.zeros(shape)
+        self.SY = np.zeros(shape)
+        self.WETDRY = np.zeros(shape)
+        for ilay in range(nlay):
+            self.HK[:,:,ilay] = r.array((nrow, ncol))
+            if self.CHANI[ilay] <= 0:
+                self.HANI[:,:,ilay] = r.array((nrow, ncol))
+            self.VKA[:,:,ilay] = r.array((nrow, ncol))
+            if dis.transient:
+                self.SS[:,:,ilay] = r.array((nrow, ncol))
+                if self.LAYTYP[ilay] != 0:
+                    self.SY[:,:,ilay] = r.array((nrow, ncol))
+            if dis.LAYCBD[ilay] != 0:
+                # vertical K of the confining bed: not used
+                r.array((nrow, ncol))
+            if not upw and self.LAYWET[ilay] != 0 and self.LAYTYP[ilay] != 0:
+                self.WETDRY[:,:,ilay] = r.array((nrow, ncol))
+
+
+def _is_int(s):
+    try:
+        int(s)
+    except ValueError:
+        return False
+    return True
+
+def read_dis(fname):
+    return DisFile(fname)
+
+def read_ba6(fname, dis):
+    return Ba6File(fname, dis)
+
+def read_upw(fname, dis):
+    return FlowFile(fname, dis, upw=True)
+
+def read_lpf(fname, dis):
+    return FlowFile(fname, dis, upw=False)
+
+def read_layered_arrays(fname, nrow, ncol, nlay):
+    """
+    [nrow x ncol x nlay] array from a file with one label line (e.g.,
+    'Layer 1') before the rows of each layer, as written by
+    createSpatialHydCond.py
+    """
+    r = PackageReader(fname)
+    out = np.zeros((nrow, ncol, nlay))
+    for ilay in range(nlay):
+        r.line()
+        out[:,:,ilay] = r.values(nrow * ncol).reshape(nrow, ncol)
+    return out
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Writes MODFLOW 2-D arrays (U2DREL, U2DINT) for the package writers of
+printMODFLOWInputs.py; MOD_data_write2file is the entry point
+
+Uniform arrays are written as CONSTANT records. Fields that are uniform by
+construction (e.g., a storage coefficient, or one value per layer) are set
+up with lazy_field, which never allocates the full grid.
+
+Values are formatted a block of rows at a time: one format string for the
+whole block is applied to the block's values in a single % operation, so
+no Python code runs per value. Arrays are written either after their
+control record (INTERNAL), in free or fixed Fortran format, or to separate
+files (OPEN/CLOSE), as text or as MODFLOW binary arrays ((BINARY)): a
+header record (KSTP, KPER, PERTIM, TOTIM, TEXT, NCOL, NROW, ILAY) followed
+by the single-precision values, without Fortran record markers (stream
+access, as opened by MODFLOW-NWT).
+"""
+
+import numpy as np
+from readMODFLOWinputs import fortran_format, binary_header_dtype
+
+# values formatted per block of rows
+_BLOCK_VALUES = 2**20
+
+
+def lazy_field(value, shape):
+    """
+    Read-only [shape] field of value, a scalar or an array broadcastable to
+    shape (e.g., one value per layer [NLAY] for [NROW x NCOL x NLAY]); the
+    full array is not allocated
+    """
+    return np.broadcast_to(np.asarray(value, dtype=float), tuple(shape))
+
+def uniform_value(data):
+    """
+    The value of every element of data, or None if they are not all equal
+    """
+    data = np.asarray(data)
+    if data.size == 0:
+        return None
+    if data.size == 1 or not any(data.strides):
+        # scalar, or a lazy_field layer
+        return data.flat[0]
+    if data.min() == data.max():
+        return data.flat[0]
+    return None
+
+def write_rows(fobj, data, fmt, nper_line=None, delimiter=' '):
+    """
+    Writes the rows of 2-D array data with the printf-style format fmt for
+    each value, a whole row per line (free format), or nper_line values per
+    line with each row starting on a new line (fixed format)
+    """
+    data = np.atleast_2d(data)
+    nrow, ncol = data.shape
+    if nper_line is None or nper_line >= ncol:
+        row_fmt = delimiter.join([fmt] * ncol) + '\n'
+    else:
+        nfull, nlast = divmod(ncol, nper_line)
+        line_fmt = delimiter.join([fmt] * nper_line) + '\n'
+        row_fmt = line_fmt * nfull
+        if nlast > 0:
+            row_fmt += delimiter.join([fmt] * nlast) + '\n'
+    nblock = max(1, _BLOCK_VALUES // max(1, ncol))
+    for i0 in range(0, nrow, nblock):
+        block = data[i0:i0+nblock]
+        fobj.write((row_fmt * block.shape[0]) % tuple(block.ravel().tolist()))
+
+def write_binary(fname, data, data_type, text='', ilay=1):
+    """
+    Writes 2-D array data as a MODFLOW binary array file
+    """
+    data = np.atleast_2d(data)
+    nrow, ncol = data.shape
+    hdr = np.zeros(1, dtype=binary_header_dtype(4))
+    hdr['kstp'] = 1
+    hdr['kper'] = 1
+    hdr['pertim'] = 1.
+    hdr['totim'] = 1.
+    hdr['text'] = text.lstrip('#').strip()[:16].upper().rjust(16)
+    hdr['ncol'] = ncol
+    hdr['nrow'] = nrow
+    hdr['ilay'] = ilay
+    if data_type == 'INT':
+        values = data.astype('<i4')
+    else:
+        values = data.astype('<f4')
+    f = open(fname, 'wb')
+    hdr.tofile(f)
+    values.tofile(f)
+    f.close()
+
+def _check_width(data, fmt, width, fname):
+    for v in [np.min(data), np.max(data)]:
+        if len(fmt % v) > width:
+            raise ValueError(fname + ': ' + (fmt % v) + ' does not fit the '
+                             'field width ' + str(width))
+
+def MOD_data_write2file(fobj, LOCAT, CNSTNT, IPRN, data_type, data, comment,
+                        fmt=None, FMTIN='(FREE)', ext_fil=None):
+    """
+    Writes one MODFLOW array (data_type 'INT': U2DINT, 'REAL': U2DREL) with
+    its control record to the open package file fobj
+
+    A scalar or uniform array is written as a CONSTANT record (value times
+    CNSTNT, with fmt). Otherwise LOCAT is
+      'INTERNAL':   values follow the control record, with FMTIN '(FREE)'
+                    (fmt per value, a row per line) or a fixed Fortran
+                    format such as '(10E15.6)'
+      'OPEN/CLOSE': values in a separate file; ext_fil = (path to write,
+                    path in the control record, as seen by MODFLOW); with
+                    FMTIN '(BINARY)' a binary array file, else text as for
+                    INTERNAL
+    """
+    if data_type == 'INT':
+        CNSTNT0 = str(int(CNSTNT))
+        fmt0 = '%7d'
+    elif data_type == 'REAL':
+        CNSTNT0 = str(float(CNSTNT))
+        fmt0 = '%7e'
+    else:
+        raise ValueError('data_type must be INT or REAL')
+    if fmt is None:
+        fmt = fmt0
+    if data_type == 'INT':
+        data = np.asarray(data).astype(int)
+    value = uniform_value(data)
+    if value is not None:
+        if CNSTNT != 0:
+            value = value * CNSTNT
+        str0 = 'CONSTANT     ' + fmt + ' %s \n'
+        fobj.write(str0 % (value, comment))
+        return
+    data = np.asarray(data)
+    FMTIN = FMTIN.upper()
+    nper_line = None
+    delimiter = ' '
+    if FMTIN not in ['(FREE)', '(BINARY)']:
+        # fixed format: fields of exactly the format's width
+        nper_line, width, fmt = fortran_format(FMTIN)
+        _check_width(data, fmt, width, FMTIN)
+        delimiter = ''
+    if LOCAT == 'INTERNAL':
+        if FMTIN == '(BINARY)':
+            raise ValueError('(BINARY) arrays must be OPEN/CLOSE files')
+        fobj.write('INTERNAL  %10s%20s%10s %s \n'
+                   % (CNSTNT0, FMTIN, str(IPRN), comment))
+        write_rows(fobj, data, fmt, nper_line, delimiter)
+    elif LOCAT == 'OPEN/CLOSE':
+        ext_fil_0, ext_fil_rel = ext_fil
+        fobj.write('OPEN/CLOSE  %s %10s%20s%10s %s \n'
+                   % (ext_fil_rel, CNSTNT0, FMTIN, str(IPRN), comment))
+        if FMTIN == '(BINARY)':
+            write_binary(ext_fil_0, data, data_type, comment)
+        else:
+            f = open(ext_fil_0, 'w')
+            write_rows(f, data, fmt, nper_line, delimiter)
+            f.close()
+    else:
+        raise ValueError('LOCAT must be INTERNAL or OPEN/CLOSE')
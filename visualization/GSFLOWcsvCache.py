@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar binary cache of the GSFLOW time-series output file gsflow.csv
+
+The CSV is parsed once and written next to it as <gsflow.csv>.cache.npz:
+one typed array per column (float32 where that stores the printed values
+exactly, float64 otherwise) plus the dates as int32 days since 1970-01-01.
+The cache records the size and modification time of the CSV it was built
+from and is rebuilt when either changes (e.g., after a new run).
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+CACHE_SUFFIX = '.cache.npz'
+_DATE_FORMAT = '%m/%d/%Y'
+
+
+def cache_file_name(gsflow_csv_fil):
+    return gsflow_csv_fil + CACHE_SUFFIX
+
+def _source_stamp(gsflow_csv_fil):
+    st = os.stat(gsflow_csv_fil)
+    return np.array([st.st_size, st.st_mtime], dtype=np.float64)
+
+def _column_array(values):
+    """
+    float32 if it represents every value exactly, float64 otherwise
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values32 = values.astype(np.float32)
+    if np.array_equal(values32.astype(np.float64), values):
+        return values32
+    return values
+
+def parse_gsflow_csv(gsflow_csv_fil):
+    """
+    Parses gsflow.csv with the pandas C engine and vectorized date parsing
+
+    Returns (data, days): data is a DataFrame of the numeric columns and
+    days is an int32 array of days since 1970-01-01
+    """
+    data = pd.read_csv(gsflow_csv_fil, engine='c')
+    dates = pd.to_datetime(data['Date'], format=_DATE_FORMAT)
+    days = dates.values.astype('datetime64[D]').astype(np.int32)
+    data = data.drop('Date', axis=1)
+    return data, days
+
+def write_cache(gsflow_csv_fil):
+    """
+    (Re)builds the binary cache of gsflow.csv; returns (data, days)
+    """
+    data, days = parse_gsflow_csv(gsflow_csv_fil)
+    stamp = _source_stamp(gsflow_csv_fil)
+    arrays = {'__columns__': np.array(list(data.columns), dtype=str),
+              '__days__': days,
+              '__source__': stamp}
+    columns = list(data.columns)
+    for ii, name in enumerate(columns):
+        arrays['c%d' % ii] = _column_array(data[name].values)
+    data = pd.DataFrame(dict((name, arrays['c%d' % ii])
+                             for ii, name in enumerate(columns)),
+                        columns=columns)
+    cache_fil = cache_file_name(gsflow_csv_fil)
+    # write to a temporary file first, so an interrupted write never leaves
+    # a truncated cache behind
+    tmp_fil = cache_fil + '.tmp.npz'
+    np.savez(tmp_fil, **arrays)
+    if os.path.exists(cache_fil):
+        os.remove(cache_fil)
+    os.rename(tmp_fil, cache_fil)
+    return data, days
+
+def read_cache(gsflow_csv_fil):
+    """
+    Returns (data, days) from the cache, or None if it is missing or stale
+    """
+    cache_fil = cache_file_name(gsflow_csv_fil)
+    if not os.path.exists(cache_fil):
+        return None
+    try:
+        npz = np.load(cache_fil)
+        try:
+            if not np.array_equal(npz['__source__'],
+                                  _source_stamp(gsflow_csv_fil)):
+                return None
+            columns = [str(name) for name in npz['__columns__']]
+            data = pd.DataFrame(dict((name, npz['c%d' % ii])
+                                     for ii, name in enumerate(columns)),
+                                columns=columns)
+            days = npz['__days__']
+        finally:
+            npz.close()
+    except (IOError, OSError, KeyError, ValueError):
+        # unreadable or from an older layout: rebuild
+        return None
+    return data, days
+
+def read_gsflow_csv(gsflow_csv_fil, use_cache=True):
+    """
+    Reads gsflow.csv through its binary cache, building the cache if it is
+    missing or out of date. With use_cache=False the CSV is parsed directly
+    and no cache is written (e.g., for a file that is still being written).
+
+    Returns (data, dateList): data is a DataFrame of all numeric columns
+    (named as in gsflow.csv) and dateList the list of datetime.date.
+    """
+    if use_cache:
+        out = read_cache(gsflow_csv_fil)
+        if out is None:
+            out = write_cache(gsflow_csv_fil)
+    else:
+        out = parse_gsflow_csv(gsflow_csv_fil)
+    data, days = out
+    dateList = list(days.astype('datetime64[D]').astype(object))
+    return data, dateList
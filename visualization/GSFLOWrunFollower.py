@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental readers for the outputs of a GSFLOW run that is in progress
+
+CSVFollower keeps its byte offset into gsflow.csv and parses only the rows
+appended since the previous poll; read_last_line reads only the end of
+gsflow.log to check for termination. Neither rereads a whole file, so
+polling costs the same at the end of a long simulation as at its start.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.dates as mdates
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+NORMAL_TERMINATION = '  Normal termination of simulation'
+_DATE_FORMAT = '%m/%d/%Y'
+
+
+class CSVFollower(object):
+    """
+    Follows a growing gsflow.csv; poll() returns only the new complete rows
+    """
+
+    def __init__(self, gsflow_csv_fil, on_reset=None):
+        self.fname = gsflow_csv_fil
+        self.offset = 0
+        self.columns = None
+        # text of a partially written last line, completed at the next poll
+        self._partial = ''
+        # called when the file is restarted (e.g., LiveLines.clear)
+        self.on_reset = on_reset
+
+    def reset(self):
+        self.offset = 0
+        self.columns = None
+        self._partial = ''
+        if self.on_reset is not None:
+            self.on_reset()
+
+    def poll(self):
+        """
+        Returns (data, dateList) for the rows appended since the last call:
+        data is a DataFrame of the numeric columns and dateList the list of
+        datetime.date. Both are empty if nothing new has been written.
+        """
+        if not os.path.exists(self.fname):
+            return self._empty()
+        if os.path.getsize(self.fname) < self.offset:
+            # file was restarted (e.g., a new run): start over
+            self.reset()
+        f = open(self.fname, 'rb')
+        f.seek(self.offset)
+        text = f.read().decode('ascii', 'replace')
+        self.offset = f.tell()
+        f.close()
+
+        text = self._partial + text
+        end = text.rfind('\n')
+        if end < 0:
+            self._partial = text
+            return self._empty()
+        self._partial = text[end+1:]
+        text = text[:end+1]
+
+        if self.columns is None:
+            header_end = text.index('\n')
+            self.columns = [c.strip() for c in text[:header_end].split(',')]
+            text = text[header_end+1:]
+        if not text.strip():
+            return self._empty()
+
+        data = pd.read_csv(StringIO(text), header=None, names=self.columns,
+                           engine='c')
+        dates = pd.to_datetime(data['Date'], format=_DATE_FORMAT)
+        dateList = list(dates.values.astype('datetime64[D]').astype(object))
+        return data.drop('Date', axis=1), dateList
+
+    def _empty(self):
+        columns = [c for c in (self.columns or []) if c != 'Date']
+        return pd.DataFrame(columns=columns), []
+
+
+def read_last_line(fname, blocksize=4096):
+    """
+    Last non-empty line of a text file (trailing whitespace removed), read
+    by seeking to the end of the file; '' if the file does not exist yet
+    """
+    if not os.path.exists(fname):
+        return ''
+    f = open(fname, 'rb')
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(max(0, size - blocksize))
+    lines = f.read().decode('ascii', 'replace').splitlines()
+    f.close()
+    for line in reversed(lines):
+        if line.strip():
+            return line.rstrip()
+    return ''
+
+def run_finished(logfile):
+    """
+    True once gsflow.log reports normal termination of the simulation
+    """
+    return read_last_line(logfile) == NORMAL_TERMINATION
+
+
+class LiveLines(object):
+    """
+    Matplotlib lines that grow as new rows arrive: new points are copied
+    into preallocated buffers (doubled in size when full), and each line is
+    given views of the filled part, without replotting the history
+    """
+
+    def __init__(self, size=1024):
+        self.lines = {}
+        self.n = 0
+        self._x = np.zeros(size) # matplotlib date numbers
+        self._y = {}
+
+    def add(self, name, line):
+        self.lines[name] = line
+        self._y[name] = np.zeros(len(self._x))
+
+    def clear(self):
+        """
+        Removes all points (e.g., when a new run restarts gsflow.csv)
+        """
+        self.n = 0
+        for name, line in self.lines.items():
+            line.set_data(self._x[:0], self._y[name][:0])
+
+    def _grow(self, n):
+        size = len(self._x)
+        while size < n:
+            size *= 2
+        if size == len(self._x):
+            return
+        x = np.zeros(size)
+        x[:self.n] = self._x[:self.n]
+        self._x = x
+        for name in self._y:
+            y = np.zeros(size)
+            y[:self.n] = self._y[name][:self.n]
+            self._y[name] = y
+
+    def extend(self, data, dateList):
+        if len(dateList) == 0:
+            return
+        n0 = self.n
+        n1 = n0 + len(dateList)
+        self._grow(n1)
+        self._x[n0:n1] = mdates.date2num(dateList)
+        for name, line in self.lines.items():
+            self._y[name][n0:n1] = np.asarray(data[name], dtype=float)
+            line.set_data(self._x[:n1], self._y[name][:n1])
+        self.n = n1
+        for ax in set(line.axes for line in self.lines.values()):
+            ax.relim()
+            ax.autoscale_view()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Frame-parallel movie rendering
+
+The frames of a movie are split into contiguous blocks of time steps, one
+per worker process. Each worker builds its own figure and either
+rasterizes its frames to numbered PNG files ('png') or pipes them as raw
+RGB into its own ffmpeg process, writing one movie segment ('segments').
+The PNGs or segments are then joined in order into the output movie by a
+single ffmpeg call.
+
+Scripts supply two module-level functions (so that they can be sent to
+the worker processes):
+
+    make_figure()           -> (fig, state): builds the figure and artists
+    draw_frame(state, ii)   -> updates the artists for frame ii
+
+With nworkers=1, frames are rendered serially in this process. They are
+also rendered serially where worker processes are not forked (Windows, and
+Mac OS X on Python 3): spawned workers re-import the calling script, and
+the plotting scripts run their main code at import.
+"""
+
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import multiprocessing
+from matplotlib import pyplot as plt
+import matplotlib.animation as manimation
+
+
+def frame_blocks(nframes, nworkers):
+    """
+    Splits frames 0..nframes-1 into at most nworkers contiguous blocks
+    """
+    nworkers = max(1, min(nworkers, nframes))
+    bounds = [nframes * ii // nworkers for ii in range(nworkers + 1)]
+    return [range(bounds[ii], bounds[ii+1]) for ii in range(nworkers)
+            if bounds[ii+1] > bounds[ii]]
+
+def _render_png(args):
+    make_figure, draw_frame, frames, outdir, dpi = args
+    plt.switch_backend('Agg')
+    fig, state = make_figure()
+    for ii in frames:
+        draw_frame(state, ii)
+        fig.savefig(os.path.join(outdir, 'frame_%07d.png' % ii), dpi=dpi)
+    plt.close(fig)
+    return len(frames)
+
+def _render_segment(args):
+    make_figure, draw_frame, frames, outfile, dpi, fps = args
+    plt.switch_backend('Agg')
+    fig, state = make_figure()
+    writer = manimation.writers['ffmpeg'](fps=fps)
+    with writer.saving(fig, outfile, dpi):
+        for ii in frames:
+            draw_frame(state, ii)
+            writer.grab_frame()
+    plt.close(fig)
+    return len(frames)
+
+def _forked_workers():
+    """
+    True if multiprocessing starts worker processes by forking this one
+    """
+    if hasattr(multiprocessing, 'get_start_method'):
+        return multiprocessing.get_start_method() == 'fork'
+    return platform.system() != 'Windows' # Python 2: fork except on Windows
+
+def _map(func, tasks, nworkers):
+    if nworkers > 1 and len(tasks) > 1 and _forked_workers():
+        pool = multiprocessing.Pool(processes=min(nworkers, len(tasks)))
+        try:
+            return pool.map(func, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    return [func(task) for task in tasks]
+
+def render_movie(make_figure, draw_frame, nframes, moviefile_name,
+                 nworkers=None, fps=10, dpi=100, mode='png',
+                 ffmpeg='ffmpeg'):
+    """
+    Renders frames 0..nframes-1 with nworkers processes (default: number of
+    CPUs) and writes them, in order, to moviefile_name (e.g., mp4).
+    mode is 'png' (numbered PNG frames) or 'segments' (one movie segment per
+    worker, from raw RGB frames piped to ffmpeg).
+    """
+    if nworkers is None:
+        nworkers = multiprocessing.cpu_count()
+    blocks = frame_blocks(nframes, nworkers)
+    tmpdir = tempfile.mkdtemp(prefix='gsflow_movie_')
+    try:
+        if mode == 'png':
+            _map(_render_png, [(make_figure, draw_frame, frames, tmpdir, dpi)
+                               for frames in blocks], nworkers)
+            cmd = [ffmpeg, '-y', '-framerate', str(fps),
+                   '-i', os.path.join(tmpdir, 'frame_%07d.png'),
+                   '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                   '-pix_fmt', 'yuv420p', moviefile_name]
+        elif mode == 'segments':
+            ext = os.path.splitext(moviefile_name)[1] or '.mp4'
+            segments = [os.path.join(tmpdir, 'segment_%04d%s' % (ii, ext))
+                        for ii in range(len(blocks))]
+            _map(_render_segment,
+                 [(make_figure, draw_frame, frames, segment, dpi, fps)
+                  for frames, segment in zip(blocks, segments)], nworkers)
+            listfile = os.path.join(tmpdir, 'segments.txt')
+            f = open(listfile, 'w')
+            for segment in segments:
+                f.write("file '" + segment + "'\n")
+            f.close()
+            cmd = [ffmpeg, '-y', '-f', 'concat', '-safe', '0',
+                   '-i', listfile, '-c', 'copy', moviefile_name]
+        else:
+            raise ValueError("mode must be 'png' or 'segments'")
+        subprocess.check_call(cmd)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
@@ -20,6 +20,7 @@ import pandas as pd
 import datetime as dt
 import matplotlib.dates as mdates
 import GSFLOWcsvTable as gvar  # all variable names, units, and descriptions
+from GSFLOWcsvCache import read_gsflow_csv
 
 if platform.system() == 'Linux':
     slashstr = '/'
@@ -103,9 +104,8 @@ for jj in range(len(PlotVar)):
 
 # header{1,NVars}: variable name
 # data{NVars}: all data 
-data = pd.read_csv(gsflow_csv_fil);   # 
-    
-dateList = [dt.datetime.strptime(date, '%m/%d/%Y').date() for date in data['Date']]
+# (parsed once and then read from its binary cache)
+data, dateList = read_gsflow_csv(gsflow_csv_fil)
 
 
 # - plot data
@@ -20,6 +20,7 @@ import pandas as pd
 import datetime as dt
 import matplotlib.dates as mdates
 import GSFLOWcsvTable as gvar  # all variable names, units, and descriptions
+from GSFLOWrunFollower import CSVFollower, LiveLines, run_finished
 import time
 
 if platform.system() == 'Linux':
@@ -78,100 +79,82 @@ fig = plt.figure(figsize=(12,6))
 ax1 = plt.subplot(1,1,1)
 ax2 = ax1.twinx()
 
+# make sure basinppt and basinacet are listed last, because of twin y-axis
+PlotVar0 = PlotVar[:]
+ctr = 1
+ctr_end = len(PlotVar)
+for ii in range(len(PlotVar)):
+    if (PlotVar[ii] == 'basinppt') or (PlotVar[ii] == 'basinactet'):
+        PlotVar0[ctr_end-1] = PlotVar[ii]
+        ctr_end = ctr_end - 1
+    else:
+        PlotVar0[ctr-1] = PlotVar[ii]
+        ctr = ctr + 1
+PlotVar = PlotVar0[:]
+
+descr = []
+unit_prev = []
+for jj in range(len(PlotVar)):
+    for ii in range(len(gvar.varname)):
+        if gvar.varname[ii] == PlotVar[jj]:
+            unit = gvar.unit[ii]
+            descr.append(gvar.descr[ii])
+            if (jj > 0) and (unit != unit_prev):
+                    print "Error! Plot variables do not have same units.  Exiting..."
+                    sys.exit()
+            unit_prev = unit
+            break
+
+# convert volume units [m^3] to length [mm]
+if unit[0:2] == 'm^3':
+    conv = 1. / basin_area * 1000.
+    unit0 = 'mm' 
+    if len(unit) > 3:
+        unit0 + unit[3:]
+    unit = unit0[:]
+#plotunit = unit.replace('^', '$^$') # powers
+
+# - set up (initially empty) lines; new rows are appended as they arrive
+lines = LiveLines()
+for ii in range(len(PlotVar)):
+    
+    if (PlotVar[ii] == 'basinppt') or (PlotVar[ii] == 'basinactet'):
+        ln0 = ax2.plot([], [], '--', color='blue')
+        ax2.set_ylabel(PlotVar[ii] + ' [' + unit + ']', fontsize=16, color='blue')
+    else:
+        ln0 = ax1.plot([], [], 'r-')   
+        ax1.set_ylabel(PlotVar[ii] + ' [' + unit + ']', fontsize=16, color='red')
+    lines.add(PlotVar[ii], ln0[0])
+
+ax1.xaxis_date()
+ax1.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d/%y'))
+plt.gcf().autofmt_xdate()    
+plt.title(plot_title, fontsize=16)
+plt.tight_layout()
+
+# follows gsflow.csv from the last byte read; gsflow.log is only read at
+# its end to check for termination
+# (a restarted gsflow.csv clears the lines)
+csv_follower = CSVFollower(gsflow_csv_fil, on_reset=lines.clear)
+logfile = Settings.control_dir + slashstr + 'gsflow.log'
+
 while True:
     # loop over time
-    #time.sleep(2) # wait 10 seconds
-    
-    # make sure basinppt and basinacet are listed last, because of twin y-axis
-    PlotVar0 = PlotVar[:]
-    ctr = 1
-    ctr_end = len(PlotVar)
-    for ii in range(len(PlotVar)):
-        if (PlotVar[ii] == 'basinppt') or (PlotVar[ii] == 'basinactet'):
-            PlotVar0[ctr_end-1] = PlotVar[ii]
-            ctr_end = ctr_end - 1
-        else:
-            PlotVar0[ctr-1] = PlotVar[ii]
-            ctr = ctr + 1
-    PlotVar = PlotVar0[:]
-    
-    descr = []
-    unit_prev = []
-    for jj in range(len(PlotVar)):
-        for ii in range(len(gvar.varname)):
-            if gvar.varname[ii] == PlotVar[jj]:
-                unit = gvar.unit[ii]
-                descr.append(gvar.descr[ii])
-                if (jj > 0) and (unit != unit_prev):
-                        print "Error! Plot variables do not have same units.  Exiting..."
-                        sys.exit()
-                unit_prev = unit
-                break
-        
     
-    ## Read in data
+    ## Read in new data
     
     # header{1,NVars}: variable name
-    # data{NVars}: all data 
-    data = pd.read_csv(gsflow_csv_fil);   # 
-        
-    dateList = [dt.datetime.strptime(date, '%m/%d/%Y').date() for date in data['Date']]
-    
-    
-    # - plot data
-    
-    # clear axes
-    ax1.cla()
-    ax2.cla()
-    
-    # convert volume units [m^3] to length [mm]
-    if unit[0:2] == 'm^3':
-        conv = 1. / basin_area * 1000.
-        unit0 = 'mm' 
-        if len(unit) > 3:
-            unit0 + unit[3:]
-        unit = unit0[:]
-    #plotunit = unit.replace('^', '$^$') # powers
-    
-    #plt.close("all")
-    for ii in range(len(PlotVar)):
-        
-        if (PlotVar[ii] == 'basinppt') or (PlotVar[ii] == 'basinactet'):
-            ln0 = ax2.plot(dateList, data[PlotVar[ii]], '--', color='blue')
-            ax2.set_ylabel(PlotVar[ii] + ' [' + unit + ']', fontsize=16, color='blue')
-        else:
-            ln0 = ax1.plot(dateList, data[PlotVar[ii]], 'r-')   
-            ax1.set_ylabel(PlotVar[ii] + ' [' + unit + ']', fontsize=16, color='red')
-    
-        if ii == 0:
-            lns = ln0
-        else:
-            lns = lns + ln0
-         
-    #    plt.plot(range(len(data)), data[PlotVar[ii]])
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%m/%d/%y'))
-    #    plt.gca().xaxis.set_major_locator(mdates.DayLocator())
-        plt.gcf().autofmt_xdate()    
-    
-    #lns = lns1+lns2+lns3
-    #labs = [l.get_label() for l in lns]
-    #ax1.legend(lns, PlotVar, loc=0)
-        
-    #plt.legend(PlotVar)
-    plt.title(plot_title, fontsize=16)
-    
-    plt.tight_layout()
+    # data{NVars}: data appended since the last loop
+    data, dateList = csv_follower.poll()
+    lines.extend(data, dateList)
     
     plt.pause(2)
     
     # check if run is finished
-    logfile = Settings.control_dir + slashstr + 'gsflow.log'
-    f = open(logfile, 'r')
-    last_line = f.readlines()
-    last_line = last_line[-1].rstrip()
-    f.close()       
-    
-    if last_line == '  Normal termination of simulation':
+    if run_finished(logfile):
+        # pick up any rows written since the last poll
+        data, dateList = csv_follower.poll()
+        lines.extend(data, dateList)
         plt.show()
         break
     
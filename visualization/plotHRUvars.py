@@ -1,6 +1,5 @@
 #! /usr/bin/env python
 
-from osgeo import ogr
 from matplotlib import pyplot as plt
 from matplotlib import cm
 import numpy as np
@@ -10,7 +9,9 @@ import matplotlib as mpl
 import matplotlib.animation as manimation
 import platform
 import sys
-import re
+import readPRMSanimation
+import shapeCollections
+import parallelMovie
 
 if platform.system() == 'Linux':
     slashstr = '/'
@@ -40,6 +41,13 @@ plotting_variable = 'hru_ppt'
 # *** Save movie to following file
 moviefile_name = 'testmovie_HRUs.mp4'
 
+# *** Number of processes rendering movie frames in parallel (optional
+# second command-line argument; 1 renders serially, with on-screen preview)
+if len(sys.argv) < 3:
+    nworkers = 1
+else:
+    nworkers = int(sys.argv[2])
+
 
 #%% *** CHANGE FILE NAMES AS NEEDED *******************************************
 # (default is to use entries from Settings File) 
@@ -56,81 +64,68 @@ print '******************************************\n'
 
 inches_to_mm = 25.4
 
-for filename in [HRUout_fil]:
-    infile = file(filename, 'r')
-    outfile = file(filename + '.corrected', 'w')
-    for line in infile:
-        if line[0] == ' ':
-            p = re.compile("\-[0-9]{2}\-")
-            for m in p.finditer(line):
-                if m.start():
-                    break
-            _start = m.start() - 4 # space for the year
-            outfile.write(line[_start:])
-        else:
-            outfile.write(line)
-
-HRUout_fil2 = HRUout_fil + '.corrected'
-HRU_outputs = pd.read_csv(HRUout_fil2, comment='#', delim_whitespace=True, error_bad_lines=False, warn_bad_lines=False, skiprows=[11])
-
-_shapefile = ogr.Open(HRUshp_fil)
-_shape = _shapefile.GetLayer(0)
-
-dates = sorted(list(set(list(HRU_outputs.timestamp))))
-
-
-_min = np.min(HRU_outputs[plotting_variable]) * inches_to_mm
-_max = np.max(HRU_outputs[plotting_variable]) * inches_to_mm
-
-fig = plt.figure(figsize=(8,6))
-#plt.ion()
-
-ax = plt.subplot(111)
-
-cax, _ = mpl.colorbar.make_axes(ax, location='right')
-cbar = mpl.colorbar.ColorbarBase(cax, cmap=cm.jet,
-               norm=mpl.colors.Normalize(vmin=_min, vmax=_max))
-cbar.set_label('Precipitation [mm/day water equivalent]', fontsize=16)
-
-FFMpegWriter = manimation.writers['ffmpeg']
-metadata = dict(title='Movie Test', artist='Matplotlib',
-                comment='Movie support!')
-writer = FFMpegWriter(fps=10, metadata=metadata)
-
-with writer.saving(fig, moviefile_name, 100):
-    for date in dates:
-        print date
-        _HRU_outputs_on_date = HRU_outputs.loc[HRU_outputs['timestamp'] == date]
-        _values = []
-        for i in range(_shape.GetFeatureCount()):
-            _feature = _shape.GetFeature(i)
-            _nhru = _feature['id']
-            #print _nhru
-            _row = _HRU_outputs_on_date.loc[_HRU_outputs_on_date['nhru'] == _nhru]
-            try:
-                _values.append(float(_row[plotting_variable].values))
-            except:
-                _values.append(np.nan)
-                #continue
-        _values = np.array(_values) * inches_to_mm
-        # Floating colorbar
-        #colors = cm.jet(plt.Normalize( min(_values), max(_values)) (_values) )
-        colors = cm.jet(plt.Normalize( _min, _max) (_values) )
-        ax.cla()
-        _polys = []
-        for i in range(_shape.GetFeatureCount()):
-            _feature = _shape.GetFeature(i)
-            _geometry = _feature.geometry()
-            _boundary = _geometry.GetBoundary()
-            _boundary_points = np.array(_boundary.GetPoints())
-            _x = _boundary_points[:,0]/1000.
-            _y = _boundary_points[:,1]/1000.
-            #plt.plot(_x, _y, 'k-')
-            _polys.append(ax.fill(_x, _y, facecolor=colors[i], edgecolor='k')[0])
-        ax.set_title(plotting_variable+': '+date)
-        ax.set_xlabel('E [km]', fontsize=16)
-        ax.set_ylabel('N [km]', fontsize=16)
-        #plt.tight_layout()
-        writer.grab_frame()
-        plt.pause(0.1)
+# [time x nhru] values, streamed from the animation file once and then
+# read from its binary cache
+dates, HRU_outputs = readPRMSanimation.read_cache(HRUout_fil, plotting_variable)
+
+_min = np.nanmin(HRU_outputs) * inches_to_mm
+_max = np.nanmax(HRU_outputs) * inches_to_mm
+
+# HRU polygons, read once and drawn as a single collection; each frame only
+# updates the face colors
+HRUs = shapeCollections.polygon_collection(HRUshp_fil, cmap=cm.jet,
+           norm=mpl.colors.Normalize(vmin=_min, vmax=_max), edgecolor='k')
+# HRU id of each feature, in feature order
+_nhru = HRUs.ids
+
+def make_figure():
+    """
+    Movie figure with the HRU collection and a fixed colorbar; returns
+    (fig, ax)
+    """
+    fig = plt.figure(figsize=(8,6))
+    #plt.ion()
+
+    ax = plt.subplot(111)
+
+    cax, _ = mpl.colorbar.make_axes(ax, location='right')
+    cbar = mpl.colorbar.ColorbarBase(cax, cmap=cm.jet,
+                   norm=mpl.colors.Normalize(vmin=_min, vmax=_max))
+    cbar.set_label('Precipitation [mm/day water equivalent]', fontsize=16)
+
+    ax.add_collection(HRUs.collection)
+    ax.autoscale_view()
+    ax.set_xlabel('E [km]', fontsize=16)
+    ax.set_ylabel('N [km]', fontsize=16)
+    return fig, ax
+
+def draw_frame(ax, _t):
+    """
+    Updates the HRU colors and title to time step _t
+    """
+    _values = readPRMSanimation.values_by_id(HRU_outputs[_t], _nhru) * inches_to_mm
+    # Fixed colorbar: colors from the collection's norm (_min, _max)
+    HRUs.set_values(_values)
+    ax.set_title(plotting_variable+': '+dates[_t])
+
+if nworkers > 1:
+    # frames rendered in parallel, split over time, and joined in order
+    parallelMovie.render_movie(make_figure, draw_frame, len(dates),
+                               moviefile_name, nworkers=nworkers, fps=10,
+                               dpi=100)
+else:
+    fig, ax = make_figure()
+
+    FFMpegWriter = manimation.writers['ffmpeg']
+    metadata = dict(title='Movie Test', artist='Matplotlib',
+                    comment='Movie support!')
+    writer = FFMpegWriter(fps=10, metadata=metadata)
+
+    with writer.saving(fig, moviefile_name, 100):
+        for _t, date in enumerate(dates):
+            print date
+            draw_frame(ax, _t)
+            #plt.tight_layout()
+            writer.grab_frame()
+            plt.pause(0.1)
     
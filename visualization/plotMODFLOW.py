@@ -36,6 +36,9 @@ requiredArgs.add_argument('-p', '--plot', type=str, default='wtd',
 # OPTIONAL
 parser.add_argument('-o', '--outmovie', type=str, default=None,
                     help='Output file (mp4) for movie, if desired')
+parser.add_argument('-w', '--workers', type=int, default=1,
+                    help='Number of processes rendering movie frames in \
+                          parallel (with -o)')
 
 args = parser.parse_args()
 args = vars(args)
@@ -43,6 +46,7 @@ args = vars(args)
 settings_input_file = args['infile']
 plotvar = args['plot']
 moviefile_name = args['outmovie']
+nworkers = args['workers']
 
 
 ###################
@@ -51,11 +55,12 @@ moviefile_name = args['outmovie']
 
 import sys
 import platform
-import struct
 import numpy as np
 from matplotlib import pyplot as plt
 import matplotlib.animation as manimation
 import matplotlib as mpl
+import readMODFLOWbinary
+import parallelMovie
 
 
 ###############
@@ -80,25 +85,6 @@ def datasink(writer, fig, moviefile_name=None):
     else:
         return Dummysink()
 
-# function for parsing ASCII grid header in GIS data files
-############################################################
-
-def read_grid_file_header(fname):
-    f = open(fname, 'r')
-    sdata = {}
-    for i in range(6):
-        line = f.readline()
-        line = line.rstrip() # remove newline characters
-        key, value = line.split(': ')
-        try:
-          value = int(value)
-        except:
-          value = float(value)
-        sdata[key] = value
-    f.close()
-
-    return sdata
-    
 # Truncate colormap
 #####################
 
@@ -121,9 +107,13 @@ else:
 
 # add path containing readSettings.py
 sys.path.append('..' + slashstr + 'Run')
+# add path containing readASCIIgrid.py
+sys.path.append('..' + slashstr + 'input_file_builder')
 
 # Read in user-specified settings
 from readSettings import Settings
+from readASCIIgrid import read_grid_file_header, read_grid
+from readMODFLOWinputs import read_dis, read_ba6, read_upw
 Settings = Settings(settings_input_file)
 
 # Entiries from Settings File
@@ -144,16 +134,13 @@ print '******************************************\n'
 
 # Information on domain
 #########################
-f = open(dis_fil, 'r')
-for i in range(3): # first 2 lines are comments
-    line = f.readline().rstrip()
-line = line.split()
-NLAY = int(line[0]) 
-NROW = int(line[1]) 
-NCOL = int(line[2]) 
-NPER = int(line[3]) 
-ITMUNI = int(line[4]) 
-LENUNI = int(line[5])    
+dis = read_dis(dis_fil)
+NLAY = dis.NLAY
+NROW = dis.NROW
+NCOL = dis.NCOL
+NPER = dis.NPER
+ITMUNI = dis.ITMUNI
+LENUNI = dis.LENUNI
 
 sdata = read_grid_file_header(surfz_fil)
 NSEW = [sdata['north'], sdata['south'], sdata['east'], sdata['west']]
@@ -161,111 +148,23 @@ NSEW = [sdata['north'], sdata['south'], sdata['east'], sdata['west']]
 #NROW = sdata['rows'] 
 #NCOL = sdata['cols']
 
-# Only ONE can be 1, others 0
-if sys.platform[:3] == 'win':
-    nread = 0
-elif (platform.linux_distribution()[0] == 'Ubuntu') or (platform.linux_distribution()[0] == 'debian'):
-    nread = 1
-elif platform.linux_distribution()[0][:3] == 'Red':
-    # Hope this works; haven't tried Red Hat here
-    nread = 2
-else:
-    sys.exit("You should add your OS binary formatting to this script!")
-
 # -- get surface elevations [m] (to plot WTD)
-TOP = np.genfromtxt(surfz_fil, skip_header=6, delimiter=' ', dtype=float)
+TOP = read_grid(surfz_fil)
 
 # =========================================================================
 
-if platform.system() == 'Linux':
-    slashstr = '/'
-else:
-    slashstr = '\\'
-
-
-fl_binary = 1;  # 1 for binary
-fl_dble = 0;  # 1 for dble prec, 0 for single prec
-
-dry_cell = 1e30;
-inactive_cell = -999.99;
-
-
-# Save precision to variables;
-if fl_dble:
-    prec = 8
-else:
-    prec = 4
-
-
 # -- Get head data and plot it as contour image plots
-fid = open(head_file, 'rb')
-
-#fid.read(4)
-#struct.unpack('i', fid.read(4)) 
-#fid.close()
-
-def binbuild(nitems, nbytes, typecode, infile):
-    outdata = []
-    for i in range(nitems):
-        x = infile.read(nbytes)
-        if len(x) == 0:
-            return ''
-        outdata.append( struct.unpack(typecode, x) )
-    return np.squeeze(np.array(outdata))
-
-data_head_all = np.zeros([NROW,NCOL,0])
-time_info = np.zeros([4,0])
-lay_info = np.zeros([1,0])
-ii = 0
-while True:
-    # NOTE: for some reason, int w/ bit-length info is trailed by 0!!!
-    a_info = binbuild( nitems=nread, nbytes=prec, typecode='i', infile=fid )
-    kstp = binbuild(nitems=1, nbytes=prec, typecode='i', infile=fid ) # FIX THESE TO SCALAR
-    if not kstp:
-        break
-    kper = binbuild(nitems=1, nbytes=prec, typecode='i', infile=fid ) # FIX THESE TO SCALAR
-    pertim = binbuild(nitems=1, nbytes=prec, typecode='f', infile=fid ) # FIX THESE TO SCALAR
-    totim = binbuild(nitems=1, nbytes=prec, typecode='f', infile=fid ) # FIX THESE TO SCALAR
-    label = binbuild(nitems=16, nbytes=1, typecode='c', infile=fid ) # FIX TO CHAR ARRAY
-    ncol = binbuild(nitems=1, nbytes=prec, typecode='i', infile=fid ) # FIX THESE TO SCALAR
-    nrow = binbuild(nitems=1, nbytes=prec, typecode='i', infile=fid ) # FIX THESE TO SCALAR
-    ilay = binbuild(nitems=1, nbytes=prec, typecode='i', infile=fid ) # FIX THESE TO SCALAR
-    a_info = binbuild(nitems=nread, nbytes=prec, typecode='i', infile=fid )
-    
-    a_data = binbuild(nitems=nread, nbytes=prec, typecode='i', infile=fid )
-    if nread == 0:
-        nn = ncol*nrow
-    else:
-        nn = a_data/prec # is floor divide OK? Also, shouldn't it just be nlay?
-    
-    data = binbuild(nitems=nn, nbytes=prec, typecode='f', infile=fid)
-    a_data = binbuild(nitems=nread, nbytes=prec, typecode='i', infile=fid )
-    
-    if ii % 100 == 0:  # mod 100
-        data_head_all2 = np.zeros([NROW,NCOL,ii+100])
-        data_head_all2[:,:,:ii] = data_head_all
-        data_head_all = data_head_all2
-        time_info2 = np.zeros([4,ii+100])
-        time_info2[:,:ii] = time_info
-        time_info = time_info2
-        lay_info2 = np.zeros([1,ii+100],int)
-        lay_info2[:,:ii] = lay_info
-        lay_info = lay_info2        
-    
-    data_head_all[:,:,ii] = np.reshape(data, (nrow,ncol), order='C') 
-    time_info[:,ii] = [kstp, kper, pertim, totim]
-    lay_info[0,ii] = int(ilay)
-    
-    ii = ii + 1
-
-fid.close()    
+# (precision and record layout are detected from the file; records are
+#  memory-mapped and only read when plotted)
+heads = readMODFLOWbinary.HeadFile(head_file)
+head_header = heads.header
 
-data_head_all = data_head_all[:,:,:ii]
-time_info = time_info[:,:ii]
-lay_info = lay_info[:,:ii]
-ntimeslay = ii # ntimes x nlay
+time_info = np.vstack((head_header['kstp'], head_header['kper'],
+                       head_header['pertim'], head_header['totim']))
+lay_info = head_header['ilay'][np.newaxis, :].astype(int)
+ntimeslay = heads.nrecords # ntimes x nlay
 
-NLAY = np.max(lay_info)
+NLAY = heads.nlay
 ntimes = ntimeslay / NLAY
 
 
@@ -283,46 +182,60 @@ X, Y = np.meshgrid(x,y)
 # VARIABLES
 #############
 
-# Head
-data_head_all_NaN = data_head_all
-data_head_all_NaN[(data_head_all_NaN > 1e29) + 
-                  (data_head_all_NaN <= -999)] = np.nan # 1E30: dry cell
-                                                        # -999.99: inactive cell
-
-# WTD:
-WTD_all = np.tile(TOP[:,:,np.newaxis], (1,1,ntimeslay)) - data_head_all_NaN
-
-# change in head (i - (i-1)): 0's at first time
-dhead_all = np.zeros((NROW,NCOL,ntimeslay))
-dhead_all[:,:,1:] = data_head_all_NaN[:,:,1:] - data_head_all_NaN[:,:,:-1]
+# Head, WTD, and change in head are computed one record at a time from
+# the memory-mapped head file
+def head_NaN(ctr):
+    """
+    Head of record ctr, with dry and inactive cells set to NaN
+    """
+    _head = np.array(heads.get_record(ctr), dtype=float)
+    _head[(_head > 1e29) + (_head <= -999)] = np.nan # 1E30: dry cell
+                                                     # -999.99: inactive cell
+    return _head
+
+def plot_data(ctr):
+    """
+    Plotted variable (head, WTD, or change in head) for record ctr
+    """
+    if plotvar == 'head':
+        return head_NaN(ctr)
+    elif plotvar == 'wtd':
+        # WTD:
+        return TOP - head_NaN(ctr)
+    elif plotvar == 'dhead':
+        # change in head (i - (i-1)) in the same layer: 0's at first time
+        if ctr < NLAY:
+            return np.zeros((NROW,NCOL))
+        return head_NaN(ctr) - head_NaN(ctr-NLAY)
+
+def plot_data_range(lay):
+    """
+    Min and max of the plotted variable over all times in one layer
+    (1-based), streamed through the file one record at a time
+    """
+    _min = np.inf
+    _max = -np.inf
+    for _ctr in heads.layer_records(lay):
+        _col = plot_data(_ctr)
+        _col = _col[~np.isnan(_col)]
+        if len(_col):
+            _min = min(_min, np.min(_col))
+            _max = max(_max, np.max(_col))
+    return _min, _max
 
 # Active cells
-IBOUND = np.genfromtxt(ba6_fil, skip_header=3, max_rows=NROW, dtype=float)
+IBOUND = read_ba6(ba6_fil, dis).IBOUND[:,:,0].astype(float)
 
 # Topography in basin only
 TOP_in_basin = TOP * (IBOUND == 1)
 TOP_in_basin[TOP_in_basin == 0] = np.nan
 
 # Hydraulic conductivity, specific storage, and specific yield
-hydraulic_conductivity = np.zeros((NROW, NCOL, NLAY), float)
-hydraulic_conductivity__vertical = np.zeros((NROW, NCOL, NLAY), float)
-specific_storage = np.zeros((NROW, NCOL, NLAY), float)
-specific_yield = np.zeros((NROW, NCOL), float)
-_ctr = 7+1
-for ii in range(NLAY):
-    hydraulic_conductivity[:,:,ii] = np.genfromtxt(flo_fil, skip_header=_ctr, \
-        max_rows=NROW, dtype=float)
-    _ctr = _ctr + NROW + 1
-    hydraulic_conductivity__vertical[:,:,ii] = np.genfromtxt(flo_fil, \
-        skip_header=_ctr, max_rows=NROW, dtype=float)
-    _ctr = _ctr + NROW + 1
-    specific_storage[:,:,ii] = np.genfromtxt(flo_fil, skip_header=_ctr, \
-        max_rows=NROW, dtype=float)
-    _ctr = _ctr + NROW + 1
-    if ii == 0:
-        specific_yield[:,:] = np.genfromtxt(flo_fil, skip_header=_ctr, \
-            max_rows=NROW, dtype=float)
-        _ctr = _ctr + NROW + 1
+flo = read_upw(flo_fil, dis)
+hydraulic_conductivity = flo.HK
+hydraulic_conductivity__vertical = flo.VKA
+specific_storage = flo.SS
+specific_yield = flo.SY[:,:,0]
 
 # -- find boundary cells
 IBOUND0 = np.copy(IBOUND)
@@ -375,8 +288,75 @@ if plotvar in ['topo', 'hydcond', 'hydcond', 'ss', 'sy']:
 else:
     static_plot = False
 
+# Movie frames
+################
+
+if plotvar == 'head':
+    # head:
+    cbl = 'Hydraulic head [m]'
+    #ti = 'head [m], '
+elif plotvar == 'wtd':        
+    # WTD:
+    cbl = 'Water table depth [m]'
+elif plotvar == 'dhead':
+    # change in head:
+    cbl = 'Change in hydraulic head [m]'
+
+def make_figure():
+    """
+    Figure with one panel per layer, drawn for the first time step; returns
+    (fig, (av, pv)) for draw_frame
+    """
+    fig = plt.figure()
+    av = []
+    pv = []
+    cv = []
+    for lay_i in range(NLAY):
+        ctr = lay_i
+        data = plot_data(ctr)
+        av.append(plt.subplot(nrows, ncols, lay_info[0,ctr]))
+        pv.append(av[lay_i].imshow(data, interpolation='nearest', 
+                                   extent=_extent))
+        pv[lay_i].set_cmap(plt.cm.cool)
+        cv.append(plt.colorbar(pv[lay_i]))
+        _min, _max = clims[lay_i]
+        cv[lay_i].set_label(cbl, fontsize=20)
+        cv[lay_i].ax.tick_params(labelsize=14) 
+        pv[lay_i].set_clim(vmin=_min, vmax=_max)
+        av[lay_i].set_xlabel('E [km]', fontsize=20)
+        av[lay_i].set_ylabel('N [km]', fontsize=20)
+        av[lay_i].yaxis.set_major_formatter(y_formatter)
+        av[lay_i].xaxis.set_major_formatter(x_formatter)
+        av[lay_i].tick_params(axis='both', which='major',
+                              labelsize=14)
+        cs = av[lay_i].contour(TOP_in_basin, colors='k', 
+                               extent=_extent_countour)
+        plt.clabel(cs, inline=1, fontsize=16, fmt='%d')
+        av[lay_i].set_aspect('equal', 'datalim')
+        im2 = av[lay_i].imshow(outline, interpolation='nearest',
+                               extent=_extent)
+        im2.set_clim(0, 1)
+        cmap = plt.get_cmap('binary',2)
+        im2.set_cmap(cmap)   
+    return fig, (av, pv)
+
+def draw_frame(state, ii):
+    """
+    Updates all layer panels to time step ii
+    """
+    av, pv = state
+    for lay_i in range(NLAY):
+        ctr = ii*NLAY + lay_i
+        pv[lay_i].set_data(plot_data(ctr))
+        titlestr = '%d' %time_info[0,ctr] + ' days; layer ' + \
+                       str(int(lay_info[0,ctr])) + \
+                       '\nwith topographic contours [m]'
+        av[lay_i].set_title(titlestr, fontsize=20)
+
 # Plot
-fig = plt.figure()
+if not static_plot:
+    # color limits over all times, per layer
+    clims = [plot_data_range(lay_i+1) for lay_i in range(NLAY)]
 
 if moviefile_name:
     FFMpegWriter = manimation.writers['ffmpeg']
@@ -388,68 +368,16 @@ else:
     metadata = None
     writer = None
 
-if not static_plot:
+if not static_plot and moviefile_name and nworkers > 1:
+    # frames rendered in parallel, split over time, and joined in order
+    parallelMovie.render_movie(make_figure, draw_frame, ntimes,
+                               moviefile_name, nworkers=nworkers, fps=10,
+                               dpi=100)
+elif not static_plot:
+    fig, state = make_figure()
     with datasink(writer=writer, fig=fig, moviefile_name=moviefile_name):
-        ctr = 0
         for ii in range(ntimes):
-            for lay_i in range(NLAY):
-                if plotvar == 'head':
-                    # head:
-                    cbl = 'Hydraulic head [m]'
-                    #ti = 'head [m], '
-                    data_all = data_head_all_NaN
-                elif plotvar == 'wtd':        
-                    # WTD:
-                    cbl = 'Water table depth [m]'
-                    data_all = WTD_all
-                elif plotvar == 'dhead':
-                    # change in head:
-                    cbl = 'Change in hydraulic head [m]'
-                    data_all = dhead_all
-
-                data = data_all[:,:,ctr]    
-                
-                if ii == 0:
-                    print ii
-                    if lay_i == 0:
-                        av = []
-                        pv = []
-                        cv = []
-                    av.append(plt.subplot(nrows, ncols, lay_info[0,ctr]))
-                    pv.append(av[lay_i].imshow(data, interpolation='nearest', 
-                                               extent=_extent))
-                    pv[lay_i].set_cmap(plt.cm.cool)
-                    cv.append(plt.colorbar(pv[lay_i]))
-                    _col = data_all[:,:,lay_i::2]
-                    _col = _col[~np.isnan(_col)]
-                    cv[lay_i].set_label(cbl, fontsize=20)
-                    cv[lay_i].ax.tick_params(labelsize=14) 
-                    pv[lay_i].set_clim(vmin=np.min(_col), vmax=np.max(_col))
-                    av[lay_i].set_xlabel('E [km]', fontsize=20)
-                    av[lay_i].set_ylabel('N [km]', fontsize=20)
-                    av[lay_i].yaxis.set_major_formatter(y_formatter)
-                    av[lay_i].xaxis.set_major_formatter(x_formatter)
-                    av[lay_i].tick_params(axis='both', which='major',
-                                          labelsize=14)
-                    cs = av[lay_i].contour(TOP_in_basin, colors='k', 
-                                           extent=_extent_countour)
-                    plt.clabel(cs, inline=1, fontsize=16, fmt='%d')
-                    av[lay_i].set_aspect('equal', 'datalim')
-                    
-                else:
-                    pv[lay_i].set_data(data)        
-                titlestr = '%d' %time_info[0,ctr] + ' days; layer ' + \
-                               str(int(lay_info[0,ctr])) + \
-                               '\nwith topographic contours [m]'
-                av[lay_i].set_title(titlestr, fontsize=20)
-                im2 = av[lay_i].imshow(outline, interpolation='nearest',
-                                       extent=_extent)
-                im2.set_clim(0, 1)
-                cmap = plt.get_cmap('binary',2)
-                im2.set_cmap(cmap)   
-
-                ctr = ctr + 1
-            #    plt.show()
+            draw_frame(state, ii)
             #plt.tight_layout()
             plt.pause(0.5)
             
@@ -458,12 +386,9 @@ if not static_plot:
                 writer.grab_frame()
                 
             # Optional write figure to file
-            
-            #for _axis in av:
-            #    _axis.cla()
-                    
             #plt.savefig("myplot.png", dpi = 300)
 else:
+    fig = plt.figure()
     av = []
     pv = []
     cv = []
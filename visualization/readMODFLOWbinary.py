@@ -0,0 +1,541 @@
+# -*- coding: utf-8 -*-
+"""
+Readers for MODFLOW binary output files: heads (<PROJ>_head.bhd) and
+cell-by-cell budgets (<PROJ>.bud, <PROJ>_uzf.dat).
+
+Record headers are parsed with NumPy structured dtypes and each record's
+payload is read with a single np.fromfile call. Precision (single or double)
+and the presence of Fortran sequential-record markers (4-byte record lengths
+written around every record by gfortran "unformatted sequential" files, but
+not by "stream"/"binary" files) are detected from the file itself.
+
+HeadFile and BudgetFile index the byte offset of every record when opened
+and return np.memmap views on demand, for files too large to load whole.
+"""
+
+import os
+import numpy as np
+
+# Fortran record marker
+_MARKER = [('_m', '<i4')]
+
+# dry and inactive cell flags written by MODFLOW
+dry_cell = 1e30
+inactive_cell = -999.99
+
+
+###########
+## HEADS ##
+###########
+
+def head_header_dtype(prec, markers):
+    """
+    Structured dtype of a head-file record header (KSTP, KPER, PERTIM,
+    TOTIM, TEXT, NCOL, NROW, ILAY), optionally wrapped in record markers
+    """
+    real = '<f%d' % prec
+    fields = [('kstp', '<i4'), ('kper', '<i4'), ('pertim', real),
+              ('totim', real), ('text', 'S16'), ('ncol', '<i4'),
+              ('nrow', '<i4'), ('ilay', '<i4')]
+    if markers:
+        fields = [('_m0', '<i4')] + fields + [('_m1', '<i4')]
+    return np.dtype(fields)
+
+def _is_text(label):
+    """
+    True if the 16-character record label is printable ASCII
+    """
+    return len(label) > 0 and all(32 <= c <= 126 for c in bytearray(label))
+
+def _valid_head_header(hdr, prec, markers, filesize):
+    if hdr['kstp'] < 1 or hdr['kper'] < 1 or hdr['ilay'] < 1:
+        return False
+    if hdr['ncol'] < 1 or hdr['nrow'] < 1:
+        return False
+    if not _is_text(hdr['text']):
+        return False
+    if markers and (hdr['_m0'] != hdr['_m1'] or
+                    hdr['_m0'] != hdr.dtype.itemsize - 8):
+        return False
+    if not np.isfinite(hdr['pertim']) or not np.isfinite(hdr['totim']):
+        return False
+    return head_record_size(hdr, prec, markers) <= filesize
+
+def head_record_size(hdr, prec, markers):
+    """
+    Size [bytes] of one head record (header + one layer of data)
+    """
+    nbytes = hdr.dtype.itemsize + int(hdr['ncol']) * int(hdr['nrow']) * prec
+    if markers:
+        nbytes += 8
+    return nbytes
+
+def detect_head_format(fname):
+    """
+    Returns (prec, markers): bytes per real (4 or 8) and whether the file
+    has Fortran sequential-record markers
+    """
+    filesize = os.path.getsize(fname)
+    with open(fname, 'rb') as f:
+        raw = f.read(head_header_dtype(8, True).itemsize)
+    for markers in (True, False):
+        for prec in (4, 8):
+            hdt = head_header_dtype(prec, markers)
+            if len(raw) < hdt.itemsize:
+                continue
+            hdr = np.frombuffer(raw[:hdt.itemsize], dtype=hdt)[0]
+            if not _valid_head_header(hdr, prec, markers, filesize):
+                continue
+            if markers:
+                # check the data record's leading marker as well
+                with open(fname, 'rb') as f:
+                    f.seek(hdt.itemsize)
+                    m = np.fromfile(f, dtype='<i4', count=1)
+                if len(m) == 0 or \
+                   m[0] != int(hdr['ncol']) * int(hdr['nrow']) * prec:
+                    continue
+            return prec, markers
+    raise ValueError('Could not determine the binary layout of ' + fname)
+
+def head_record_dtype(prec, markers, nrow, ncol):
+    """
+    Structured dtype of one complete head record: header + [nrow, ncol] data
+    """
+    fields = head_header_dtype(prec, markers).descr
+    if markers:
+        fields.append(('_m2', '<i4'))
+    fields.append(('data', '<f%d' % prec, (nrow, ncol)))
+    if markers:
+        fields.append(('_m3', '<i4'))
+    return np.dtype(fields)
+
+class HeadFile(object):
+    """
+    Lazily indexed, memory-mapped MODFLOW binary head file
+
+    Opening the file only reads the first record header; all records of a
+    head file have the same size, so the byte offset of every
+    (kstp, kper, layer) record follows from it. Data are returned as
+    np.memmap views, so reading one time slice, one cell's time series or a
+    subset of layers does not touch the rest of the file. A partially
+    written trailing record (e.g., from a run in progress) is ignored.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.prec, self.markers = detect_head_format(fname)
+        hdt = head_header_dtype(self.prec, self.markers)
+        with open(fname, 'rb') as f:
+            hdr0 = np.fromfile(f, dtype=hdt, count=1)[0]
+        self.nrow = int(hdr0['nrow'])
+        self.ncol = int(hdr0['ncol'])
+        self.record_size = head_record_size(hdr0, self.prec, self.markers)
+        self.nrecords = os.path.getsize(fname) // self.record_size
+        self._dtype = head_record_dtype(self.prec, self.markers,
+                                        self.nrow, self.ncol)
+        self._records = np.memmap(fname, dtype=self._dtype, mode='r',
+                                  shape=(self.nrecords,))
+        # header fields only (copied: small)
+        names = [n for n in hdt.names if not n.startswith('_')]
+        self.header = np.array(self._records[names])
+        # byte offset of each record's data
+        self.offsets = np.arange(self.nrecords, dtype=np.int64) * \
+                       self.record_size + self._dtype.fields['data'][1]
+        self._index = {}
+        for ii in range(self.nrecords):
+            key = (int(self.header['kstp'][ii]), int(self.header['kper'][ii]),
+                   int(self.header['ilay'][ii]))
+            self._index[key] = ii
+        self.nlay = int(np.max(self.header['ilay'])) if self.nrecords else 0
+        kstpkper = []
+        for ii in range(self.nrecords):
+            key = (int(self.header['kstp'][ii]), int(self.header['kper'][ii]))
+            if not kstpkper or kstpkper[-1] != key:
+                kstpkper.append(key)
+        self.kstpkper = kstpkper
+        self.ntimes = len(kstpkper)
+
+    @property
+    def data(self):
+        """
+        [nrecords, NROW, NCOL] memmap view of all records, in file order
+        """
+        return self._records['data']
+
+    def get_record(self, ii):
+        """
+        [NROW, NCOL] memmap view of record ii (file order)
+        """
+        return self._records['data'][ii]
+
+    def get_index(self, kstp, kper, layer):
+        """
+        Record number of (kstp, kper, layer); layer is 1-based
+        """
+        return self._index[(kstp, kper, layer)]
+
+    def get_data(self, kstpkper=None, idx=None, layers=None):
+        """
+        [nlayers, NROW, NCOL] memmap view of one time, chosen by
+        (kstp, kper) or by time index idx (default: last time). `layers` is
+        an optional list of 1-based layer numbers.
+        """
+        if kstpkper is None:
+            if idx is None:
+                idx = self.ntimes - 1
+            kstpkper = self.kstpkper[idx]
+        if layers is None:
+            layers = range(1, self.nlay + 1)
+        irec = [self._index[(kstpkper[0], kstpkper[1], lay)]
+                for lay in layers]
+        if irec == list(range(irec[0], irec[0] + len(irec))):
+            # contiguous: stay a view
+            return self._records['data'][irec[0]:irec[-1]+1]
+        return self._records['data'][irec]
+
+    def get_ts(self, row, col, layer=1):
+        """
+        Time series of head at (row, col, layer) (0-based row and column,
+        1-based layer); touches one value per time step
+        """
+        irec = np.nonzero(self.header['ilay'] == layer)[0]
+        return self._records['data'][irec, row, col]
+
+    def layer_records(self, layer):
+        """
+        Record numbers of all times for one (1-based) layer
+        """
+        return np.nonzero(self.header['ilay'] == layer)[0]
+
+    def close(self):
+        """
+        Releases the memory map
+        """
+        self._records = None
+
+def read_head_file(fname):
+    """
+    Reads a complete MODFLOW binary head file into memory
+
+    Returns (data, header): data is a [nrecords, NROW, NCOL] array (one
+    record per time step and layer, in file order) and header is a
+    structured array with fields kstp, kper, pertim, totim, text, ncol,
+    nrow, ilay. A partially written trailing record (e.g., from a run in
+    progress) is ignored.
+    """
+    prec, markers = detect_head_format(fname)
+    hdt = head_header_dtype(prec, markers)
+    real = np.dtype('<f%d' % prec)
+    filesize = os.path.getsize(fname)
+
+    with open(fname, 'rb') as f:
+        hdr0 = np.fromfile(f, dtype=hdt, count=1)[0]
+        nrow = int(hdr0['nrow'])
+        ncol = int(hdr0['ncol'])
+        nn = nrow * ncol
+        # all records in a head file have the same size: pre-size outputs
+        nrec = filesize // head_record_size(hdr0, prec, markers)
+        data = np.empty((nrec, nrow, ncol), dtype=real)
+        header = np.empty(nrec, dtype=hdt)
+        f.seek(0)
+        for ii in range(nrec):
+            header[ii] = np.fromfile(f, dtype=hdt, count=1)[0]
+            if markers:
+                f.seek(4, 1)
+            data[ii] = np.fromfile(f, dtype=real, count=nn).reshape(nrow, ncol)
+            if markers:
+                f.seek(4, 1)
+
+    names = [n for n in hdt.names if not n.startswith('_')]
+    return data, header[names]
+
+
+#############
+## BUDGETS ##
+#############
+
+_BUD_HEADER = [('kstp', '<i4'), ('kper', '<i4'), ('text', 'S16'),
+               ('ncol', '<i4'), ('nrow', '<i4'), ('nlay', '<i4')]
+
+def _read_record(f, dtype, count, markers):
+    """
+    Reads one Fortran record of `count` items; returns None on EOF or if
+    the record markers do not match
+    """
+    dtype = np.dtype(dtype)
+    if markers:
+        m0 = np.fromfile(f, dtype='<i4', count=1)
+        if len(m0) == 0 or m0[0] != dtype.itemsize * count:
+            return None
+    out = np.fromfile(f, dtype=dtype, count=count)
+    if len(out) != count:
+        return None
+    if markers:
+        m1 = np.fromfile(f, dtype='<i4', count=1)
+        if len(m1) == 0 or m1[0] != dtype.itemsize * count:
+            return None
+    return out
+
+def _skip_record(f, dtype, count, markers, filesize):
+    """
+    Seeks past one Fortran record of `count` items without reading it;
+    returns the byte offset of its payload, or None on EOF / bad markers
+    """
+    nbytes = np.dtype(dtype).itemsize * count
+    if markers:
+        m0 = np.fromfile(f, dtype='<i4', count=1)
+        if len(m0) == 0 or m0[0] != nbytes:
+            return None
+    offset = f.tell()
+    if offset + nbytes > filesize:
+        return None
+    f.seek(nbytes, 1)
+    if markers:
+        m1 = np.fromfile(f, dtype='<i4', count=1)
+        if len(m1) == 0 or m1[0] != nbytes:
+            return None
+    return offset
+
+def _skip_list(f, dtype, count, markers, filesize):
+    """
+    Seeks past `count` list entries (node, value[, aux...]); each entry is
+    a separate Fortran record in sequential files. Returns (offset, dtype)
+    of the list as stored on disk, or None.
+    """
+    if markers:
+        dtype = np.dtype(_MARKER + np.dtype(dtype).descr + [('_m1', '<i4')])
+    else:
+        dtype = np.dtype(dtype)
+    offset = f.tell()
+    nbytes = dtype.itemsize * count
+    if offset + nbytes > filesize:
+        return None
+    if markers and count > 0:
+        m0 = np.fromfile(f, dtype='<i4', count=1)
+        if m0[0] != dtype.itemsize - 8:
+            return None
+    f.seek(offset + nbytes)
+    return offset, dtype
+
+def _scan_budget_record(f, prec, markers, filesize):
+    """
+    Indexes one budget term (UBUDSV, UBDSV1-4 formats) starting at the
+    current file position, reading only its headers. Returns a dict whose
+    'payload' entry lists (name, offset, dtype, shape) of each data array,
+    or None at EOF / on a malformed record.
+    """
+    real = '<f%d' % prec
+    hdr = _read_record(f, _BUD_HEADER, 1, markers)
+    if hdr is None:
+        return None
+    hdr = hdr[0]
+    if not _is_text(hdr['text']) or hdr['ncol'] < 1 or hdr['nrow'] < 1 \
+       or hdr['nlay'] == 0:
+        return None
+    rec = {'kstp': int(hdr['kstp']), 'kper': int(hdr['kper']),
+           'text': hdr['text'].decode('ascii').strip(),
+           'ncol': int(hdr['ncol']), 'nrow': int(hdr['nrow']),
+           'nlay': abs(int(hdr['nlay'])), 'imeth': 0,
+           'delt': None, 'pertim': None, 'totim': None, 'payload': []}
+    nrow, ncol, nlay = rec['nrow'], rec['ncol'], rec['nlay']
+    nn = nrow * ncol
+    if hdr['nlay'] > 0:
+        # full 3D array, UBUDSV
+        off = _skip_record(f, real, nn * nlay, markers, filesize)
+        if off is None:
+            return None
+        rec['payload'].append(('data', off, np.dtype(real), (nlay, nrow, ncol)))
+        return rec
+
+    # compact budget: second header
+    hdr2 = _read_record(f, [('imeth', '<i4'), ('delt', real),
+                            ('pertim', real), ('totim', real)], 1, markers)
+    if hdr2 is None:
+        return None
+    hdr2 = hdr2[0]
+    imeth = int(hdr2['imeth'])
+    if imeth < 0 or imeth > 5 or not np.isfinite(hdr2['totim']) or \
+       hdr2['delt'] < 0 or hdr2['pertim'] < 0 or hdr2['totim'] < 0:
+        return None
+    rec['imeth'] = imeth
+    rec['delt'] = float(hdr2['delt'])
+    rec['pertim'] = float(hdr2['pertim'])
+    rec['totim'] = float(hdr2['totim'])
+    if imeth in (0, 1):
+        off = _skip_record(f, real, nn * nlay, markers, filesize)
+        if off is None:
+            return None
+        rec['payload'].append(('data', off, np.dtype(real), (nlay, nrow, ncol)))
+    elif imeth == 2:
+        nlist = _read_record(f, '<i4', 1, markers)
+        if nlist is None:
+            return None
+        lst = _skip_list(f, [('node', '<i4'), ('q', real)], int(nlist[0]),
+                         markers, filesize)
+        if lst is None:
+            return None
+        rec['payload'].append(('data', lst[0], lst[1], (int(nlist[0]),)))
+    elif imeth == 3:
+        off_lay = _skip_record(f, '<i4', nn, markers, filesize)
+        if off_lay is None:
+            return None
+        off = _skip_record(f, real, nn, markers, filesize)
+        if off is None:
+            return None
+        rec['payload'].append(('layer', off_lay, np.dtype('<i4'), (nrow, ncol)))
+        rec['payload'].append(('data', off, np.dtype(real), (nrow, ncol)))
+    elif imeth == 4:
+        off = _skip_record(f, real, nn, markers, filesize)
+        if off is None:
+            return None
+        rec['payload'].append(('data', off, np.dtype(real), (nrow, ncol)))
+    elif imeth == 5:
+        nval = _read_record(f, '<i4', 1, markers)
+        if nval is None:
+            return None
+        nval = int(nval[0])
+        auxnames = []
+        if nval > 1:
+            ctmp = _read_record(f, 'S16', nval - 1, markers)
+            if ctmp is None:
+                return None
+            auxnames = [c.decode('ascii').strip() for c in ctmp]
+        nlist = _read_record(f, '<i4', 1, markers)
+        if nlist is None:
+            return None
+        fields = [('node', '<i4'), ('q', real)] + \
+                 [(name, real) for name in auxnames]
+        lst = _skip_list(f, fields, int(nlist[0]), markers, filesize)
+        if lst is None:
+            return None
+        rec['payload'].append(('data', lst[0], lst[1], (int(nlist[0]),)))
+    return rec
+
+def detect_budget_format(fname):
+    """
+    Returns (prec, markers) for a MODFLOW cell-by-cell budget file by
+    trying each layout on the first two budget terms
+    """
+    filesize = os.path.getsize(fname)
+    with open(fname, 'rb') as f:
+        for markers in (True, False):
+            for prec in (4, 8):
+                f.seek(0)
+                ok = True
+                for ii in range(2):
+                    if f.tell() == filesize and ii > 0:
+                        break
+                    if _scan_budget_record(f, prec, markers, filesize) is None:
+                        ok = False
+                        break
+                if ok:
+                    return prec, markers
+    raise ValueError('Could not determine the binary layout of ' + fname)
+
+class BudgetFile(object):
+    """
+    Lazily indexed, memory-mapped MODFLOW cell-by-cell budget file (e.g.,
+    <PROJ>.bud or the UZF output <PROJ>_uzf.dat)
+
+    Opening the file walks the record headers once, seeking past the data,
+    and stores the byte offset of every term. Data are returned as np.memmap
+    views on demand.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.prec, self.markers = detect_budget_format(fname)
+        filesize = os.path.getsize(fname)
+        self.records = []
+        with open(fname, 'rb') as f:
+            while True:
+                rec = _scan_budget_record(f, self.prec, self.markers, filesize)
+                if rec is None:
+                    break
+                self.records.append(rec)
+        self._index = {}
+        kstpkper = []
+        textlist = []
+        for ii, rec in enumerate(self.records):
+            key = (rec['kstp'], rec['kper'])
+            self._index[(rec['text'],) + key] = ii
+            if key not in kstpkper:
+                kstpkper.append(key)
+            if rec['text'] not in textlist:
+                textlist.append(rec['text'])
+        self.kstpkper = kstpkper
+        self.textlist = textlist
+
+    def _map(self, offset, dtype, shape):
+        if np.prod(shape) == 0:
+            out = np.empty(shape, dtype=dtype)
+        else:
+            out = np.memmap(self.fname, dtype=dtype, mode='r', offset=offset,
+                            shape=shape)
+        if dtype.names is not None and self.markers:
+            out = out[[n for n in dtype.names if not n.startswith('_')]]
+        return out
+
+    def get_record(self, ii):
+        """
+        Budget term ii (file order) as a dict with memmap views of its data
+        """
+        rec = dict((k, v) for k, v in self.records[ii].items()
+                   if k != 'payload')
+        for name, offset, dtype, shape in self.records[ii]['payload']:
+            rec[name] = self._map(offset, dtype, shape)
+        return rec
+
+    def get_data(self, text, kstpkper=None, idx=None):
+        """
+        Data array (memmap view) of the term labeled `text` (e.g.,
+        'UZF RECHARGE') at (kstp, kper) or time index idx; with neither
+        given, a list over all times
+        """
+        text = text.strip()
+        if kstpkper is None and idx is None:
+            return [self.get_record(ii)['data']
+                    for ii, rec in enumerate(self.records)
+                    if rec['text'] == text]
+        if kstpkper is None:
+            kstpkper = self.kstpkper[idx]
+        return self.get_record(self._index[(text,) + tuple(kstpkper)])['data']
+
+    def get_ts(self, text, row, col, layer=1):
+        """
+        Time series of a full-array budget term at (row, col, layer) (0-based
+        row and column, 1-based layer)
+        """
+        text = text.strip()
+        out = []
+        for ii, rec in enumerate(self.records):
+            if rec['text'] != text:
+                continue
+            data = self.get_record(ii)['data']
+            if data.ndim == 3:
+                out.append(data[layer-1, row, col])
+            elif data.ndim == 2:
+                out.append(data[row, col])
+            else:
+                raise ValueError(text + ' is stored as a list, not an array')
+        return np.array(out)
+
+def read_budget_file(fname, text=None):
+    """
+    Reads all terms of a MODFLOW cell-by-cell budget file (e.g., <PROJ>.bud
+    or the UZF output <PROJ>_uzf.dat) into memory
+
+    Returns a list of dicts with keys kstp, kper, text, ncol, nrow, nlay,
+    imeth, delt, pertim, totim and data (plus layer for IMETH=3). If `text`
+    is given, only terms with that label (e.g., 'UZF RECHARGE') are kept.
+    """
+    bud = BudgetFile(fname)
+    out = []
+    for ii, rec in enumerate(bud.records):
+        if text is None or rec['text'] == text.strip():
+            rec = bud.get_record(ii)
+            for name in ('data', 'layer'):
+                if name in rec:
+                    rec[name] = np.array(rec[name])
+            out.append(rec)
+    return out
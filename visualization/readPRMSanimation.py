@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming reader for PRMS animation output files (<PROJ>.ani.nhru,
+<PROJ>.ani.nsegment)
+
+The file is read in blocks of lines; the timestamp column is repaired on
+the fly (lines starting with a blank carry extra characters before the
+year) and each block is parsed with the pandas C engine. iter_timesteps()
+yields one (timestamp, values) pair per time step, with values indexed by
+element id - 1 (nhru or nsegment), so no corrected copy of the file is
+written and no per-date search of the whole table is needed.
+
+build_cache() / read_cache() store one variable as a binary 2-D array
+[time x element] next to the animation file for random access; the cache
+is rebuilt when the animation file's size or modification time changes.
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+_DATE_IN_LINE = re.compile(r"\-[0-9]{2}\-")
+
+
+def _fix_line(line):
+    """
+    Drops the characters before the year on lines that start with a blank
+    """
+    if line[0] == ' ':
+        for m in _DATE_IN_LINE.finditer(line):
+            if m.start():
+                return line[m.start()-4:] # space for the year
+    return line
+
+def _bad_lines_kwargs():
+    version = tuple(int(v) for v in pd.__version__.split('.')[:2])
+    if version >= (1, 3):
+        return {'on_bad_lines': 'skip'}
+    return {'error_bad_lines': False, 'warn_bad_lines': False}
+
+def read_header(fname):
+    """
+    Returns (columns, nskip): the column names and the number of lines
+    before the first data line (comments, names, and field-format lines)
+    """
+    f = open(fname, 'r')
+    nskip = 0
+    columns = None
+    for line in f:
+        nskip += 1
+        if line[0] == '#' or not line.strip():
+            continue
+        if columns is None:
+            columns = line.split()
+        else:
+            # field-format line below the column names
+            break
+    f.close()
+    if columns is None:
+        raise ValueError('No column names found in ' + fname)
+    return columns, nskip
+
+def _read_blocks(fname, columns, nskip, usecols, block_lines):
+    """
+    Yields DataFrames of (timestamp, id, variable) for successive blocks of
+    data lines
+    """
+    kwargs = _bad_lines_kwargs()
+    f = open(fname, 'r')
+    for ii in range(nskip):
+        f.readline()
+    while True:
+        lines = []
+        for line in f:
+            if line[0] == '#' or not line.strip():
+                continue
+            lines.append(_fix_line(line))
+            if len(lines) == block_lines:
+                break
+        if not lines:
+            break
+        yield pd.read_csv(StringIO(''.join(lines)), sep=r'\s+',
+                          header=None, names=columns, usecols=usecols,
+                          engine='c', **kwargs)
+        if len(lines) < block_lines:
+            break
+    f.close()
+
+def iter_timesteps(fname, variable, nelements=None, block_lines=200000):
+    """
+    Yields (timestamp, values) for each time step in an animation file:
+    values is a float array of `variable` indexed by element id - 1 (NaN
+    for elements not listed at that time). If nelements is not given, it
+    is taken as the largest id seen in the first time step.
+    """
+    columns, nskip = read_header(fname)
+    tcol, idcol = columns[0], columns[1]
+    usecols = [tcol, idcol, variable]
+    pending = None
+    for block in _read_blocks(fname, columns, nskip, usecols, block_lines):
+        if pending is not None:
+            block = pd.concat((pending, block), ignore_index=True)
+        ts = block[tcol].values
+        ids = block[idcol].values.astype(int)
+        vals = block[variable].values.astype(float)
+        # boundaries between time steps (rows are in time order)
+        starts = np.hstack((0, np.nonzero(ts[1:] != ts[:-1])[0] + 1))
+        # the last time step may continue in the next block
+        pending = block.iloc[starts[-1]:]
+        for jj in range(len(starts) - 1):
+            _s, _e = starts[jj], starts[jj+1]
+            if nelements is None:
+                nelements = int(np.max(ids[_s:_e]))
+            yield ts[_s], _values_on_step(ids[_s:_e], vals[_s:_e], nelements)
+    if pending is not None and len(pending):
+        ids = pending[idcol].values.astype(int)
+        vals = pending[variable].values.astype(float)
+        if nelements is None:
+            nelements = int(np.max(ids))
+        yield pending[tcol].values[0], _values_on_step(ids, vals, nelements)
+
+def values_by_id(values, ids):
+    """
+    Values of one time step for the given element ids (e.g., the 'id' of
+    each shapefile feature, in feature order); NaN for ids not in the file
+    """
+    ids = np.asarray(ids, dtype=int)
+    out = np.nan * np.ones(len(ids))
+    inrange = (ids >= 1) * (ids <= len(values))
+    out[inrange] = values[ids[inrange] - 1]
+    return out
+
+def _values_on_step(ids, vals, nelements):
+    out = np.nan * np.ones(nelements)
+    inrange = (ids >= 1) * (ids <= nelements)
+    out[ids[inrange] - 1] = vals[inrange]
+    return out
+
+
+###########
+## CACHE ##
+###########
+
+def cache_file_names(fname, variable):
+    """
+    (values, index) file names of the binary cache of one variable
+    """
+    base = fname + '.' + variable
+    return base + '.f32', base + '.index.npz'
+
+def _source_stamp(fname):
+    st = os.stat(fname)
+    return np.array([st.st_size, st.st_mtime], dtype=np.float64)
+
+def build_cache(fname, variable, nelements=None):
+    """
+    Streams the animation file once and writes `variable` as a float32
+    [time x element] binary array plus an index of timestamps
+    """
+    values_fil, index_fil = cache_file_names(fname, variable)
+    stamp = _source_stamp(fname)
+    timestamps = []
+    fout = open(values_fil + '.tmp', 'wb')
+    for ts, values in iter_timesteps(fname, variable, nelements):
+        values.astype('<f4').tofile(fout)
+        timestamps.append(str(ts))
+        nelements = len(values)
+    fout.close()
+    if os.path.exists(values_fil):
+        os.remove(values_fil)
+    os.rename(values_fil + '.tmp', values_fil)
+    np.savez(index_fil, timestamps=np.array(timestamps, dtype=str),
+             shape=np.array([len(timestamps), nelements or 0]), source=stamp)
+
+def read_cache(fname, variable, nelements=None):
+    """
+    Returns (timestamps, values) for one variable: values is a memory-mapped
+    [time x element] float32 array. The cache is built first if it is
+    missing or out of date.
+    """
+    values_fil, index_fil = cache_file_names(fname, variable)
+    index = None
+    if os.path.exists(index_fil) and os.path.exists(values_fil):
+        index = np.load(index_fil)
+        if not np.array_equal(index['source'], _source_stamp(fname)):
+            index.close()
+            index = None
+    if index is None:
+        build_cache(fname, variable, nelements)
+        index = np.load(index_fil)
+    timestamps = [str(ts) for ts in index['timestamps']]
+    shape = tuple(int(n) for n in index['shape'])
+    index.close()
+    if shape[0] * shape[1] == 0:
+        return timestamps, np.zeros(shape, dtype='<f4')
+    return timestamps, np.memmap(values_fil, dtype='<f4', mode='r',
+                                 shape=shape)
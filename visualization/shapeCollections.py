@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Shapefile geometry loaded once into matplotlib collections, for movies
+
+The HRU polygons or stream-segment lines are read from OGR a single time
+and drawn as one PolyCollection / LineCollection. Each frame then only
+updates the collection's values (face or line colors, through the
+colormap) and line widths, instead of re-reading every feature and adding
+one artist per feature.
+"""
+
+import numpy as np
+from osgeo import ogr
+from matplotlib.collections import PolyCollection, LineCollection
+
+
+def _parts(geometry):
+    """
+    Sub-geometries of a multi-part geometry, or the geometry itself
+    """
+    if geometry.GetGeometryCount() > 0 and geometry.GetPointCount() == 0:
+        return [geometry.GetGeometryRef(i)
+                for i in range(geometry.GetGeometryCount())]
+    return [geometry]
+
+def _read_features(shp_fil, get_points, scale):
+    """
+    Returns (ids, vertices, part_feature): the 'id' of each feature, the
+    [npoints, 2] vertex array of each part (scaled, e.g. m -> km), and the
+    feature number each part belongs to
+    """
+    _shapefile = ogr.Open(shp_fil)
+    _shape = _shapefile.GetLayer(0)
+    ids = []
+    vertices = []
+    part_feature = []
+    for i in range(_shape.GetFeatureCount()):
+        _feature = _shape.GetFeature(i)
+        ids.append(_feature['id'])
+        for _points in get_points(_feature.geometry()):
+            vertices.append(np.array(_points)[:,:2] / scale)
+            part_feature.append(i)
+    return np.array(ids), vertices, np.array(part_feature, dtype=int)
+
+def _polygon_points(geometry):
+    _boundary = geometry.GetBoundary()
+    out = []
+    for _part in _parts(_boundary):
+        _points = _part.GetPoints()
+        if _points:
+            out.append(_points)
+    return out
+
+def _line_points(geometry):
+    out = []
+    for _part in _parts(geometry.GetLinearGeometry()):
+        _points = _part.GetPoints()
+        if _points:
+            out.append(_points)
+    return out
+
+
+class FeatureCollection(object):
+    """
+    One matplotlib collection for all features of a shapefile
+
+    ids holds the 'id' attribute of each feature in feature order; per-
+    feature values passed to set_values / set_linewidths are in that order.
+    """
+
+    def __init__(self, ids, vertices, part_feature, collection):
+        self.ids = ids
+        self.vertices = vertices
+        self.part_feature = part_feature
+        self.collection = collection
+
+    def set_values(self, values):
+        """
+        Colors each feature by its value through the collection's colormap
+        and norm (NaN: no color)
+        """
+        values = np.asarray(values, dtype=float)[self.part_feature]
+        self.collection.set_array(np.ma.masked_invalid(values))
+
+    def set_linewidths(self, linewidths):
+        linewidths = np.asarray(linewidths, dtype=float)[self.part_feature]
+        self.collection.set_linewidths(linewidths)
+
+    def extent(self):
+        """
+        (xmin, xmax, ymin, ymax) of all vertices
+        """
+        allv = np.vstack(self.vertices)
+        return (np.min(allv[:,0]), np.max(allv[:,0]),
+                np.min(allv[:,1]), np.max(allv[:,1]))
+
+
+def polygon_collection(shp_fil, scale=1000., **kwargs):
+    """
+    FeatureCollection of the polygon boundaries in shp_fil (e.g., HRUs);
+    kwargs (cmap, norm, edgecolor, ...) go to PolyCollection
+    """
+    ids, vertices, part_feature = _read_features(shp_fil, _polygon_points,
+                                                 scale)
+    return FeatureCollection(ids, vertices, part_feature,
+                             PolyCollection(vertices, **kwargs))
+
+def line_collection(shp_fil, scale=1000., **kwargs):
+    """
+    FeatureCollection of the lines in shp_fil (e.g., stream segments);
+    kwargs (cmap, norm, ...) go to LineCollection
+    """
+    ids, vertices, part_feature = _read_features(shp_fil, _line_points,
+                                                 scale)
+    return FeatureCollection(ids, vertices, part_feature,
+                             LineCollection(vertices, **kwargs))